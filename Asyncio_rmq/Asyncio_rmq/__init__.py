@@ -3,5 +3,42 @@ from .asyncio_rmq import TalkRole
 from .asyncio_rmq import ListenRole
 from .asyncio_rmq import createConnection
 from .asyncio_rmq import closeConnection
+from .asyncio_rmq import openConnection
+from .rpc import RPCClient
+from .rpc import RPCServer
+from .rpc import RPCError
+from .serializers import make_message
+from .serializers import decode_message
+from .serializers import register_serializer
+from .metrics import enable_metrics
+from .metrics import get_metrics
+from .consumer import Consumer
+from .consumer import consume
+from .flowcontrol import FlowControlledPublisher
+from .flowcontrol import CreditGranter
+from .flowcontrol import DepthThrottle
+from .topology import Topology
+from .retry import RetryPolicy
 
-__all__ = ["TalkRole", "ListenRole", "createConnection", "closeConnection"]
+__all__ = [
+    "TalkRole",
+    "ListenRole",
+    "createConnection",
+    "closeConnection",
+    "openConnection",
+    "RPCClient",
+    "RPCServer",
+    "RPCError",
+    "make_message",
+    "decode_message",
+    "register_serializer",
+    "enable_metrics",
+    "get_metrics",
+    "Consumer",
+    "consume",
+    "FlowControlledPublisher",
+    "CreditGranter",
+    "DepthThrottle",
+    "Topology",
+    "RetryPolicy",
+]
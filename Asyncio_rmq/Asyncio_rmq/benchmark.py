@@ -0,0 +1,454 @@
+"""
+Benchmarks for the Asyncio RabbitMQ package.
+
+Parameters
+----------
+benchmark: string
+    Benchmark to run.
+    Option 1: "serializers" (encode/decode cost per MB)
+    Option 2: "throughput" (publish/consume messages per second, MB/s and latency percentiles)
+    Option 3: "loops" (the throughput benchmark on the default asyncio loop and on uvloop)
+
+size (-size or -s): float
+    serializers: payload sizes in MB. Several can be given.
+    throughput: message size in bytes.
+
+repeat (-repeat or -n): integer
+    serializers: number of timed repetitions per case. The best time is reported.
+
+count (-count or -c): integer
+    throughput: number of messages.
+
+concurrency (-concurrency or -j): integer
+    throughput: number of publisher tasks, and of concurrent handlers for the "consume" mode.
+
+prefetch (-prefetch or -p): integer
+    throughput: consumer prefetch window.
+
+url (-url or -u): string
+    throughput: broker URL. Defaults to the in-memory stand-in broker.
+
+loop (-loop or -l): string
+    throughput: event loop, "auto" (uvloop when installed), "asyncio" or "uvloop".
+
+save / compare: string
+    throughput: write the result as a JSON baseline, or compare against one and exit with status 1 on a
+    regression larger than --tolerance.
+
+Return: None
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import numpy as np
+import Asyncio_rmq
+from Asyncio_rmq import asyncio_rmq
+from Asyncio_rmq import consumer
+from Asyncio_rmq import eventloop
+from Asyncio_rmq import metrics
+from Asyncio_rmq import serializers
+
+MB = 1024 * 1024
+
+# First and longest sleep (seconds) between polls of an empty queue in "get" mode.
+GET_BACKOFF = (0.0005, 0.05)
+
+
+def _best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _sample_payloads(size_bytes):
+    """Payloads of roughly `size_bytes`: a noisy float64 frame, the same frame as bytes, and a zero frame."""
+    rng = np.random.default_rng(0)
+    frame = rng.normal(0, 0.4, size_bytes // 8)
+    payloads = {
+        "numpy-noise": (frame, "numpy"),
+        "numpy-zeros": (np.zeros_like(frame), "numpy"),
+        "raw-noise": (frame.tobytes(), "raw"),
+    }
+    if serializers.msgpack is not None:
+        payloads["msgpack-noise"] = (frame.tobytes(), "msgpack")
+    return payloads
+
+
+def serializer_benchmark(sizes_mb=(1,), compressions=(None, "auto", "zlib"), repeat=5):
+    """
+    Measure encode and decode cost per MB for each serializer and compression setting.
+
+    Parameters
+    ----------
+    sizes_mb: List[float]
+        Payload sizes in MB.
+
+    compressions: List[string]
+        Compression settings to try (see serializers.encode).
+
+    repeat: int
+        Number of timed repetitions per case. The best time is kept.
+
+    Return: List[dict]
+        One result per case with payload, serializer, compression, size, encoded size and the encode and
+        decode cost in ms/MB.
+    """
+    results = []
+    for size_mb in sizes_mb:
+        size_bytes = int(size_mb * MB)
+        for payload_name, (payload, serializer) in _sample_payloads(size_bytes).items():
+            for compression in compressions:
+                if compression == "lz4" and "lz4" not in serializers._compressors:
+                    continue
+                body, properties = serializers.encode(payload, serializer, compression)
+                # Messages hold a bytes body, so decode from bytes as a consumer would.
+                body = bytes(body)
+
+                encode_s = _best_time(lambda: serializers.encode(payload, serializer, compression), repeat)
+                decode_s = _best_time(
+                    lambda: serializers.decode(
+                        body, properties["content_type"], properties.get("content_encoding"), properties["headers"]
+                    ),
+                    repeat,
+                )
+                mb = size_bytes / MB
+                results.append(
+                    {
+                        "payload": payload_name,
+                        "serializer": serializer,
+                        "compression": compression,
+                        "applied_compression": properties.get("content_encoding"),
+                        "size_bytes": size_bytes,
+                        "encoded_bytes": len(body),
+                        "encode_ms_per_mb": 1e3 * encode_s / mb,
+                        "decode_ms_per_mb": 1e3 * decode_s / mb,
+                    }
+                )
+    return results
+
+
+def _print_serializer_results(results):
+    print(
+        "%-14s %-12s %-12s %10s %10s %12s %12s"
+        % ("payload", "compression", "applied", "MB", "ratio", "enc ms/MB", "dec ms/MB")
+    )
+    for r in results:
+        print(
+            "%-14s %-12s %-12s %10.2f %10.3f %12.4f %12.4f"
+            % (
+                r["payload"],
+                r["compression"],
+                r["applied_compression"],
+                r["size_bytes"] / MB,
+                r["encoded_bytes"] / r["size_bytes"],
+                r["encode_ms_per_mb"],
+                r["decode_ms_per_mb"],
+            )
+        )
+
+
+class _RecordingQueue:
+    """Queue wrapper passing each message fetched by `_RMQConsume` to a callback, which times it."""
+
+    def __init__(self, queue, callback):
+        self.queue = queue
+        self.callback = callback
+
+    @property
+    def name(self):
+        return self.queue.name
+
+    async def get(self, *args, **kwargs):
+        message = await self.queue.get(*args, **kwargs)
+        if message is not None:
+            self.callback(message)
+        return message
+
+
+async def _wait_until(received, deadline, latencies, count):
+    try:
+        await asyncio.wait_for(received.wait(), max(deadline - time.monotonic(), 0))
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError("%d of %d messages received" % (len(latencies), count))
+
+
+async def throughput_benchmark(
+    count=10000,
+    size=1024,
+    concurrency=8,
+    prefetch=256,
+    mode="consume",
+    url="memory:///benchmark",
+    queue_name="BenchQueue",
+    timeout=60,
+):
+    """
+    Measure end-to-end message throughput and latency.
+
+    A connection is set up with `createConnection`, `concurrency` publisher tasks send `count` messages of
+    `size` bytes through `_RMQPublish`, and they are received either by the `Consumer` runtime ("consume",
+    push with a prefetch window) or by polling `_RMQConsume` ("get", one basic.get per message).
+
+    Parameters
+    ----------
+    count: int
+        Number of messages.
+
+    size: int
+        Message size in bytes.
+
+    concurrency: int
+        Publisher tasks, and concurrent handlers in "consume" mode.
+
+    prefetch: int
+        Consumer prefetch window ("consume" mode).
+
+    mode: string
+        "consume" or "get".
+
+    url: string
+        Broker URL.
+
+    queue_name: string
+        Queue used for the run. It is purged first.
+
+    timeout: float
+        Seconds before the run is abandoned with asyncio.TimeoutError if not every message has arrived.
+
+    Return: dict
+        Parameters of the run (including the event loop used) plus elapsed_s, msgs_per_s, mb_per_s and
+        latency_ms (p50, p95, p99, max).
+    """
+    # Publish-to-consume latency needs the publish timestamp header, which is only stamped while metrics are on.
+    registry = metrics.get_metrics()
+    was_enabled = registry.enabled
+    registry.enabled = True
+    latencies = []
+    body = bytes(size)
+
+    [connection, channel, exchange, queueList] = await Asyncio_rmq.createConnection([queue_name], [queue_name], url=url)
+    await queueList[0].purge()
+    received = asyncio.Event()
+
+    def record(message):
+        latencies.append(time.time() - message.headers[metrics.PUBLISHED_AT_HEADER])
+        if len(latencies) == count:
+            received.set()
+
+    async def handler(message):
+        record(message)
+
+    async def publisher(n):
+        for _ in range(n):
+            await asyncio_rmq._RMQPublish(connection, channel, queue_name, [body], 0, serializer="raw")
+
+    async def getter(deadline):
+        # basic.get answers at once, so an empty queue (e.g. before the publishers start) is polled with backoff.
+        queue = _RecordingQueue(queueList[0], record)
+        delay = GET_BACKOFF[0]
+        while len(latencies) < count:
+            if await asyncio_rmq._RMQConsume(connection, channel, queue, queue_name) is None:
+                if time.monotonic() >= deadline:
+                    raise asyncio.TimeoutError("%d of %d messages received" % (len(latencies), count))
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, GET_BACKOFF[1])
+                continue
+            delay = GET_BACKOFF[0]
+
+    shares = [count // concurrency + (1 if i < count % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    try:
+        if mode == "consume":
+            # The queue was declared auto-delete by createConnection; the consumer must declare it the same way.
+            worker = await consumer.consume(
+                connection, queue_name, handler, concurrency=concurrency, prefetch=prefetch, queue_auto_delete=True
+            )
+            try:
+                await asyncio.gather(*[publisher(n) for n in shares])
+                await _wait_until(received, deadline, latencies, count)
+                elapsed = time.perf_counter() - start
+            finally:
+                await worker.close()
+        elif mode == "get":
+            await asyncio.gather(getter(deadline), *[publisher(n) for n in shares])
+            elapsed = time.perf_counter() - start
+        else:
+            raise ValueError("mode must be 'consume' or 'get', not %r" % mode)
+    finally:
+        registry.enabled = was_enabled
+        await Asyncio_rmq.closeConnection(connection)
+
+    latency_ms = 1e3 * np.asarray(latencies)
+    return {
+        "mode": mode,
+        "loop": "uvloop" if type(asyncio.get_running_loop()).__module__.startswith("uvloop") else "asyncio",
+        "url": url.split("@")[-1],
+        "count": count,
+        "size": size,
+        "concurrency": concurrency,
+        "prefetch": prefetch,
+        "elapsed_s": elapsed,
+        "msgs_per_s": count / elapsed,
+        "mb_per_s": count * size / elapsed / MB,
+        "latency_ms": {
+            "p50": float(np.percentile(latency_ms, 50)),
+            "p95": float(np.percentile(latency_ms, 95)),
+            "p99": float(np.percentile(latency_ms, 99)),
+            "max": float(latency_ms.max()),
+        },
+    }
+
+
+def loop_benchmark(loops=("asyncio", "uvloop"), **kwargs):
+    """
+    Run the throughput benchmark once per event loop.
+
+    Parameters
+    ----------
+    loops: List[string]
+        Event loops to compare. "uvloop" is skipped when it is not installed.
+
+    kwargs:
+        `throughput_benchmark` parameters.
+
+    Return: List[dict]
+        One `throughput_benchmark` result per loop.
+    """
+    results = []
+    for loop in loops:
+        if loop == "uvloop" and eventloop.uvloop is None:
+            continue
+        results.append(eventloop.run(throughput_benchmark(**kwargs), loop))
+    return results
+
+
+def compare_to_baseline(result, baseline, tolerance=0.2):
+    """
+    Compare a throughput result against a stored baseline.
+
+    Parameters
+    ----------
+    result: dict
+        Result of `throughput_benchmark`.
+
+    baseline: dict
+        Earlier result for the same parameters.
+
+    tolerance: float
+        Allowed relative regression, e.g. 0.2 for 20%.
+
+    Return: List[string]
+        Description of each regression. Empty when within tolerance.
+    """
+    regressions = []
+    for key in ("msgs_per_s", "mb_per_s"):
+        if result[key] < (1 - tolerance) * baseline[key]:
+            regressions.append("%s: %.1f < %.1f (baseline)" % (key, result[key], baseline[key]))
+    for key in ("p50", "p99"):
+        current, reference = result["latency_ms"][key], baseline["latency_ms"][key]
+        if current > (1 + tolerance) * reference:
+            regressions.append("latency %s: %.3fms > %.3fms (baseline)" % (key, current, reference))
+    return regressions
+
+
+def _print_throughput_result(r):
+    print(
+        "%(mode)s: %(count)d x %(size)dB, concurrency %(concurrency)d, prefetch %(prefetch)d on %(url)s, %(loop)s loop"
+        % r
+    )
+    print("  %.0f msg/s, %.2f MB/s in %.3fs" % (r["msgs_per_s"], r["mb_per_s"], r["elapsed_s"]))
+    print("  latency ms: p50 %(p50).3f  p95 %(p95).3f  p99 %(p99).3f  max %(max).3f" % r["latency_ms"])
+
+
+def main(argv=None):
+    """
+    Benchmark command line entry point.
+
+    Parameters
+    ----------
+    argv: List[string]
+        Command line arguments. sys.argv is used when None.
+
+    Return: None
+    """
+    ap = argparse.ArgumentParser(description="Asyncio RabbitMQ benchmarks")
+    sub = ap.add_subparsers(dest="benchmark", required=True)
+
+    ap_ser = sub.add_parser("serializers", help="Encode/decode cost per MB")
+    ap_ser.add_argument("-s", "--size", type=float, nargs="+", default=[1.0], help="Payload sizes in MB")
+    ap_ser.add_argument("-n", "--repeat", type=int, default=5, help="Timed repetitions per case")
+    ap_ser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_tp = sub.add_parser("throughput", help="Messages per second, MB/s and latency percentiles")
+    ap_loops = sub.add_parser("loops", help="Throughput on the default asyncio loop and on uvloop")
+    for ap_run in (ap_tp, ap_loops):
+        ap_run.add_argument("-c", "--count", type=int, default=10000, help="# messages")
+        ap_run.add_argument("-s", "--size", type=int, default=1024, help="Message size in bytes")
+        ap_run.add_argument("-j", "--concurrency", type=int, default=8, help="Publisher tasks / consumer handlers")
+        ap_run.add_argument("-p", "--prefetch", type=int, default=256, help="Consumer prefetch window")
+        ap_run.add_argument("-m", "--mode", choices=["consume", "get"], default="consume", help="Consume path")
+        ap_run.add_argument("-u", "--url", type=str, default="memory:///benchmark", help="Broker URL")
+        ap_run.add_argument("--json", action="store_true", help="Print results as JSON")
+    ap_tp.add_argument("-l", "--loop", choices=eventloop.LOOPS, default="auto", help="Event loop implementation")
+    ap_tp.add_argument("--save", type=str, default=None, help="Write the result as a JSON baseline")
+    ap_tp.add_argument("--compare", type=str, default=None, help="Compare against a JSON baseline")
+    ap_tp.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+
+    args = ap.parse_args(argv)
+
+    if args.benchmark == "serializers":
+        compressions = [None, "auto", "zlib"] + (["lz4"] if "lz4" in serializers._compressors else [])
+        results = serializer_benchmark(args.size, compressions, args.repeat)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            _print_serializer_results(results)
+
+    elif args.benchmark == "throughput":
+        result = eventloop.run(
+            throughput_benchmark(args.count, args.size, args.concurrency, args.prefetch, args.mode, args.url),
+            args.loop,
+        )
+        if args.json:
+            print(json.dumps(result, indent=2))
+        else:
+            _print_throughput_result(result)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(result, f, indent=2)
+        if args.compare:
+            with open(args.compare) as f:
+                regressions = compare_to_baseline(result, json.load(f), args.tolerance)
+            for regression in regressions:
+                print("REGRESSION " + regression)
+            if regressions:
+                sys.exit(1)
+
+    elif args.benchmark == "loops":
+        results = loop_benchmark(
+            count=args.count,
+            size=args.size,
+            concurrency=args.concurrency,
+            prefetch=args.prefetch,
+            mode=args.mode,
+            url=args.url,
+        )
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            for result in results:
+                _print_throughput_result(result)
+            if len(results) == 2:
+                print("uvloop speedup: %.2fx" % (results[1]["msgs_per_s"] / results[0]["msgs_per_s"]))
+            else:
+                print("uvloop is not installed; only the default loop was measured")
+
+
+if __name__ == "__main__":
+    main()
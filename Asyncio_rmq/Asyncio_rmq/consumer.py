@@ -0,0 +1,322 @@
+"""
+Concurrent consumer runtime.
+
+A `Consumer` runs a message handler over a queue with bounded concurrency and acknowledges each message only
+after its handler has succeeded. A failed handler nacks the message (requeued or dead-lettered), or hands
+it to a `retry.RetryPolicy` for a delayed retry, so a crash or error never loses a message that was fetched
+but not processed.
+
+Handlers
+--------
+A coroutine function is awaited on the event loop. A plain function is offloaded to a thread pool of
+`concurrency` threads so blocking or numpy-heavy work does not stall the loop.
+
+Acknowledgement modes
+---------------------
+"unordered": each message is acked on its own as soon as its handler finishes.
+"ordered": acks are issued in delivery order as a single `multiple=True` ack covering the longest run of
+    finished messages, once `ack_batch` messages are waiting or `ack_interval` seconds have passed. This
+    cuts the number of ack frames by up to `ack_batch` times. Delivery tags are per channel, so the consumer
+    always opens its own channel.
+
+Per-key ordering
+----------------
+With `ordering_key`, messages that map to the same key are handled one after another in delivery order,
+while messages with different keys still run concurrently.
+"""
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Asyncio_rmq import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Consumer:
+    """
+    Consume a queue with a bounded pool of handlers.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection. The consumer opens its own channel on it.
+
+    queue_name: string
+        Queue to consume. It is declared if it does not exist (see queue_auto_delete and queue_arguments).
+
+    handler: callable
+        Called as `handler(message)` for each aio_pika.IncomingMessage. Coroutine functions are awaited,
+        plain functions run in a thread pool. The return value is ignored.
+
+    concurrency: int
+        Maximum number of handlers running at once.
+
+    prefetch: int
+        Broker prefetch window. Defaults to 2 * concurrency (plus ack_batch in ordered mode) so the pool never
+        starves while acks are batched.
+
+    ack_mode: string
+        "unordered" or "ordered" (see module docstring).
+
+    ack_batch: int
+        Ordered mode: acknowledge once this many finished messages are waiting.
+
+    ack_interval: float
+        Ordered mode: acknowledge waiting messages at least this often (seconds).
+
+    ordering_key: callable
+        Optional `ordering_key(message) -> key`. Messages with the same key are handled sequentially.
+
+    requeue_on_error: bool
+        Requeue a message whose handler failed (True) or reject it so it is dead-lettered (False).
+
+    queue_arguments: dict
+        Arguments used if the queue has to be declared.
+
+    queue_auto_delete: bool
+        auto_delete flag of the queue declaration. It must match an existing queue, which RabbitMQ otherwise
+        refuses with PRECONDITION_FAILED: pass True for the queues of `createConnection`.
+
+    credit: flowcontrol.CreditGranter
+        Optional credit granter. Each message that is settled for good (acked, rejected without requeue or
+        dead-lettered) returns credit to a flow-controlled publisher. Requeued and retried messages come back,
+        so they only return credit once they are settled.
+
+    retry: retry.RetryPolicy
+        Optional retry policy. Failed messages are retried with backoff instead of nacked, and messages that
+        have used up their attempts are dead-lettered without running the handler. Its topology is declared
+        on start.
+    """
+
+    def __init__(
+        self,
+        connection,
+        queue_name,
+        handler,
+        concurrency=16,
+        prefetch=None,
+        ack_mode="unordered",
+        ack_batch=32,
+        ack_interval=0.05,
+        ordering_key=None,
+        requeue_on_error=False,
+        queue_arguments=None,
+        credit=None,
+        retry=None,
+        queue_auto_delete=False,
+    ):
+        if ack_mode not in ("unordered", "ordered"):
+            raise ValueError("ack_mode must be 'unordered' or 'ordered', not %r" % ack_mode)
+        self.connection = connection
+        self.queue_name = queue_name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.ack_mode = ack_mode
+        self.ack_batch = ack_batch if ack_mode == "ordered" else 1
+        self.ack_interval = ack_interval
+        self.prefetch = prefetch or 2 * concurrency + (self.ack_batch if ack_mode == "ordered" else 0)
+        self.ordering_key = ordering_key
+        self.requeue_on_error = requeue_on_error
+        self.queue_arguments = queue_arguments
+        self.queue_auto_delete = queue_auto_delete
+        self.credit = credit
+        self.retry = retry
+
+        self.channel = None
+        self.queue = None
+        self.processed = 0
+        self.failed = 0
+        self._is_async = asyncio.iscoroutinefunction(handler)
+        self._executor = None
+        self._consumer_tag = None
+        self._semaphore = None
+        self._tasks = set()
+        self._key_tails = {}
+        # Ordered mode bookkeeping: messages in delivery order, and the delivery tags that have finished.
+        self._delivered = deque()
+        self._finished = set()
+        self._ack_ready = None
+        self._ack_count = 0
+        self._flush_handle = None
+
+    async def start(self):
+        """
+        Open the channel and start consuming.
+
+        Return: Consumer
+            The started consumer.
+        """
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if not self._is_async:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.channel = await self.connection.channel()
+        await self.channel.set_qos(prefetch_count=self.prefetch)
+        self.queue = await self.channel.declare_queue(
+            self.queue_name, auto_delete=self.queue_auto_delete, arguments=self.queue_arguments
+        )
+        if self.retry is not None:
+            await self.retry.declare(self.connection, self.channel)
+        self._consumer_tag = await self.queue.consume(self._on_message)
+        return self
+
+    async def close(self):
+        """
+        Stop consuming, wait for running handlers, flush pending acks and close the channel.
+
+        Return: None
+        """
+        if self._consumer_tag is not None:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._flush()
+        if self.credit is not None:
+            await self.credit.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.channel is not None:
+            await self.channel.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def in_flight(self):
+        """Number of delivered messages that have not finished their handler."""
+        return len(self._tasks)
+
+    async def _on_message(self, message):
+        metrics.get_metrics().record_consume(self.queue_name, message)
+        if self.ack_mode == "ordered":
+            self._delivered.append(message)
+        task = asyncio.ensure_future(self._run(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, message):
+        key = self.ordering_key(message) if self.ordering_key is not None else None
+        if key is None:
+            await self._process(message)
+            return
+
+        previous = self._key_tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self._key_tails[key] = done
+        try:
+            if previous is not None:
+                await previous
+            await self._process(message)
+        finally:
+            done.set_result(None)
+            if self._key_tails.get(key) is done:
+                del self._key_tails[key]
+
+    async def _process(self, message):
+        registry = metrics.get_metrics()
+        if self.retry is not None and self.retry.exhausted(message):
+            logger.warning("Message %s on %s has no attempts left", message.delivery_tag, self.queue_name)
+            await self._fail(message, None)
+            return
+        async with self._semaphore:
+            try:
+                with registry.time_handler(self.queue_name):
+                    if self._is_async:
+                        await self.handler(message)
+                    else:
+                        await asyncio.get_running_loop().run_in_executor(self._executor, self.handler, message)
+            except Exception as exc:
+                logger.exception("Handler failed for message %s on %s", message.delivery_tag, self.queue_name)
+                await self._fail(message, exc)
+                return
+
+        self.processed += 1
+        if self.ack_mode == "unordered":
+            await message.ack()
+            registry.record_ack(self.queue_name)
+        else:
+            self._finished.add(message.delivery_tag)
+            await self._advance()
+        await self._settled(message)
+
+    async def _fail(self, message, exc):
+        self.failed += 1
+        if self.retry is not None:
+            # The policy acks the message and records it as retried or dead-lettered.
+            attempt = await self.retry.reject(self.channel, message, exc)
+            # A retried copy is still in flight for its publisher; only a dead-lettered message is settled.
+            terminal = attempt >= self.retry.max_attempts
+        else:
+            await message.nack(requeue=self.requeue_on_error)
+            metrics.get_metrics().record_nack(self.queue_name)
+            terminal = not self.requeue_on_error
+        if self.ack_mode == "ordered":
+            self._finished.add(message.delivery_tag)
+            await self._advance()
+        if terminal:
+            await self._settled(message)
+
+    async def _settled(self, message):
+        if self.credit is not None:
+            await self.credit.settled(message)
+
+    async def _advance(self):
+        # Move past every finished message at the head of the delivery order. Nacked messages are already
+        # settled, so a later multiple ack over them is harmless.
+        while self._delivered and self._delivered[0].delivery_tag in self._finished:
+            message = self._delivered.popleft()
+            self._finished.discard(message.delivery_tag)
+            if not message.processed:
+                self._ack_ready = message
+                self._ack_count += 1
+
+        if self._ack_count >= self.ack_batch:
+            await self._flush()
+        elif self._ack_count and self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.ack_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        task = asyncio.ensure_future(self._flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._ack_ready is None:
+            return
+        message, count = self._ack_ready, self._ack_count
+        self._ack_ready = None
+        self._ack_count = 0
+        await message.ack(multiple=True)
+        metrics.get_metrics().record_ack(self.queue_name, count)
+
+
+async def consume(connection, queue_name, handler, **kwargs):
+    """
+    Start a `Consumer`.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection.
+
+    queue_name: string
+        Queue to consume.
+
+    handler: callable
+        Message handler.
+
+    kwargs:
+        Other `Consumer` parameters.
+
+    Return: Consumer
+        The started consumer. Await `close()` to stop it.
+    """
+    return await Consumer(connection, queue_name, handler, **kwargs).start()
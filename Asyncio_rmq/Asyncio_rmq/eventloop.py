@@ -0,0 +1,67 @@
+"""
+Event loop selection.
+
+`run()` is the package's entry point for coroutines: it runs them with `asyncio.run` semantics on either the
+default asyncio loop or uvloop. uvloop is optional; "auto" uses it when it is installed and falls back to the
+default loop otherwise. Nothing in the package takes an explicit loop, so the same code runs on either.
+"""
+import asyncio
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover - optional dependency
+    uvloop = None
+
+LOOPS = ("auto", "asyncio", "uvloop")
+
+
+def loop_name(loop="auto"):
+    """
+    Resolve a loop choice to the loop that will actually be used.
+
+    Parameters
+    ----------
+    loop: string
+        "auto", "asyncio" or "uvloop".
+
+    Return: string
+        "asyncio" or "uvloop".
+    """
+    if loop not in LOOPS:
+        raise ValueError("loop must be one of %s, not %r" % (", ".join(LOOPS), loop))
+    if loop == "uvloop" and uvloop is None:
+        raise RuntimeError("uvloop is not installed")
+    if loop == "auto":
+        return "uvloop" if uvloop is not None else "asyncio"
+    return loop
+
+
+def run(main, loop="auto", debug=None):
+    """
+    Run a coroutine to completion on a new event loop.
+
+    Parameters
+    ----------
+    main: coroutine
+        Coroutine to run.
+
+    loop: string
+        "auto" (uvloop when installed), "asyncio" or "uvloop".
+
+    debug: bool
+        Event loop debug mode. None keeps the default.
+
+    Return: object
+        The coroutine's result.
+    """
+    if loop_name(loop) == "asyncio":
+        return asyncio.run(main, debug=debug)
+    if hasattr(asyncio, "Runner"):
+        with asyncio.Runner(debug=debug, loop_factory=uvloop.new_event_loop) as runner:
+            return runner.run(main)
+    # Python < 3.11: select uvloop through the event loop policy for the duration of the run.
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    try:
+        return asyncio.run(main, debug=debug)
+    finally:
+        asyncio.set_event_loop_policy(None)
@@ -0,0 +1,354 @@
+"""
+Flow control between publishers and slow consumers.
+
+Credit-based windows
+--------------------
+A `FlowControlledPublisher` may have at most `window` messages in flight (published but not yet processed
+by the far side). Every message names the publisher's exclusive credit queue in the CREDIT_TO_HEADER header.
+The consumer side uses a `CreditGranter` to hand credit back once messages are settled; credits are batched
+into one small message per `batch` settled messages (or per `interval` seconds). When the window is full
+`publish()` suspends until credit arrives, so a slow consumer slows the publisher down instead of letting the
+queue (and broker memory) grow without limit. Keep the grant batch smaller than the window.
+
+Queue-depth throttling
+----------------------
+A `DepthThrottle` samples a queue's depth (at most once per `poll_interval`, unless the messages let through
+since the last sample could reach the high watermark) and suspends publishing once it reaches `high_watermark`
+until it has drained to `low_watermark`. Only one task samples at a time; every other task publishing through
+the throttle waits for that sample (and for the drain, when throttled). This also protects queues shared with
+publishers or consumers that do not take part in the credit scheme.
+"""
+import asyncio
+import time
+from collections import deque
+import aio_pika
+
+CREDIT_TO_HEADER = "x-credit-to"
+CREDIT_HEADER = "x-credit"
+
+
+class CreditWindow:
+    """
+    Bounded number of in-flight messages.
+
+    Parameters
+    ----------
+    size: int
+        Maximum number of messages in flight.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def full(self):
+        return self.in_flight >= self.size
+
+    async def acquire(self, timeout=None):
+        """
+        Take one slot, suspending while the window is full.
+
+        Parameters
+        ----------
+        timeout: float
+            Seconds to wait for a slot before raising asyncio.TimeoutError. None waits forever.
+
+        Return: None
+        """
+        while self.in_flight >= self.size:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, count=1):
+        """
+        Return slots to the window and wake waiting publishers.
+
+        Parameters
+        ----------
+        count: int
+            Number of slots to return. Surplus credit is ignored.
+
+        Return: None
+        """
+        self.in_flight = max(self.in_flight - count, 0)
+        free = self.size - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class DepthThrottle:
+    """
+    Suspend publishing while a queue is too deep.
+
+    Parameters
+    ----------
+    channel:
+        Declared channel for use.
+
+    queue_name: string
+        Queue to watch. It must already exist.
+
+    high_watermark: int
+        Depth at which publishing is suspended.
+
+    low_watermark: int
+        Depth the queue must drain to before publishing resumes. Defaults to half the high watermark.
+
+    poll_interval: float
+        Minimum seconds between depth samples.
+    """
+
+    def __init__(self, channel, queue_name, high_watermark=1000, low_watermark=None, poll_interval=0.05):
+        self.channel = channel
+        self.queue_name = queue_name
+        self.high_watermark = high_watermark
+        self.low_watermark = high_watermark // 2 if low_watermark is None else low_watermark
+        self.poll_interval = poll_interval
+        self.depth = 0
+        self.throttled_count = 0
+        self._last_poll = float("-inf")
+        # Publishes let through since the last sample.
+        self._admitted = 0
+        # Held by the task sampling the depth, and by it for the whole drain while throttled.
+        self._lock = None
+
+    async def sample(self):
+        """
+        Sample the queue depth.
+
+        Return: int
+            Number of ready messages.
+        """
+        queue = await self.channel.declare_queue(self.queue_name, passive=True)
+        self.depth = queue.declaration_result.message_count
+        self._last_poll = time.monotonic()
+        self._admitted = 0
+        return self.depth
+
+    async def wait(self):
+        """
+        Return immediately below the high watermark, otherwise once the queue has drained to the low watermark.
+
+        Concurrent callers share one sample: while a task samples or waits for the drain, the others wait for
+        it instead of publishing.
+
+        Return: None
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if not self._lock.locked() and self._admit():
+            return
+        async with self._lock:
+            # Another task may have sampled (or waited for the drain) while this one waited for the lock.
+            if self._admit():
+                return
+            if await self.sample() < self.high_watermark:
+                self._admitted += 1
+                return
+            self.throttled_count += 1
+            while self.depth > self.low_watermark:
+                await asyncio.sleep(self.poll_interval)
+                await self.sample()
+            self._admitted += 1
+
+    def _admit(self):
+        # Let a publish through on the last sample while it is recent and cannot reach the high watermark.
+        if time.monotonic() - self._last_poll >= self.poll_interval:
+            return False
+        if self.depth + self._admitted >= self.high_watermark:
+            return False
+        self._admitted += 1
+        return True
+
+
+class FlowControlledPublisher:
+    """
+    Publisher with a credit window and optional queue-depth throttling.
+
+    Parameters
+    ----------
+    channel:
+        Declared channel for use.
+
+    routing_key: string
+        Default routing key (queue name) to publish to.
+
+    window: int
+        Maximum number of messages in flight.
+
+    throttle: DepthThrottle
+        Optional queue-depth throttle checked before each publish.
+
+    credit_timeout: float
+        Seconds to wait for credit before raising asyncio.TimeoutError. None waits forever.
+    """
+
+    def __init__(self, channel, routing_key, window=64, throttle=None, credit_timeout=None):
+        self.channel = channel
+        self.routing_key = routing_key
+        self.window = CreditWindow(window)
+        self.throttle = throttle
+        self.credit_timeout = credit_timeout
+        self.credit_queue = None
+        self.published = 0
+        self._consumer_tag = None
+
+    async def start(self):
+        """
+        Declare the exclusive credit queue and start listening for credit.
+
+        Return: FlowControlledPublisher
+            The started publisher.
+        """
+        self.credit_queue = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+        self._consumer_tag = await self.credit_queue.consume(self._on_credit, no_ack=True)
+        return self
+
+    async def close(self):
+        """
+        Stop listening for credit.
+
+        Return: None
+        """
+        if self._consumer_tag is not None:
+            await self.credit_queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def publish(self, message, routing_key=None):
+        """
+        Publish a message once the throttle and the credit window allow it.
+
+        Parameters
+        ----------
+        message: aio_pika.Message
+            Message to publish. The credit queue is added to its headers.
+
+        routing_key: string
+            Routing key to use instead of the publisher default.
+
+        Return:
+        res: Result of publish
+        """
+        if self.throttle is not None:
+            await self.throttle.wait()
+        await self.window.acquire(self.credit_timeout)
+        message.headers[CREDIT_TO_HEADER] = self.credit_queue.name
+        try:
+            res = await self.channel.default_exchange.publish(message, routing_key=routing_key or self.routing_key)
+        except BaseException:
+            self.window.release()
+            raise
+        self.published += 1
+        return res
+
+    async def _on_credit(self, message):
+        self.window.release(int((message.headers or {}).get(CREDIT_HEADER, 0)))
+
+
+class CreditGranter:
+    """
+    Consumer-side credit return.
+
+    Parameters
+    ----------
+    channel:
+        Declared channel for use.
+
+    batch: int
+        Grant credit once this many messages for the same publisher have settled.
+
+    interval: float
+        Grant any outstanding credit at least this often (seconds).
+    """
+
+    def __init__(self, channel, batch=16, interval=0.05):
+        self.channel = channel
+        self.batch = batch
+        self.interval = interval
+        self.granted = 0
+        self._owed = {}
+        self._flush_handle = None
+        self._flush_tasks = set()
+
+    async def settled(self, message):
+        """
+        Record that a message has been settled for good (acked, rejected without requeue or dead-lettered).
+
+        Do not call this for a message that is requeued or sent for a retry: it is delivered again and would
+        return its credit twice.
+
+        Parameters
+        ----------
+        message: aio_pika.IncomingMessage
+            The settled message. Messages without a credit header are ignored.
+
+        Return: None
+        """
+        credit_to = (message.headers or {}).get(CREDIT_TO_HEADER)
+        if credit_to is None:
+            return
+        owed = self._owed[credit_to] = self._owed.get(credit_to, 0) + 1
+        if owed >= self.batch:
+            await self._grant(credit_to)
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        task = asyncio.ensure_future(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """
+        Grant all outstanding credit now.
+
+        Return: None
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for credit_to in list(self._owed):
+            await self._grant(credit_to)
+
+    async def close(self):
+        """
+        Cancel scheduled flushes and grant the credit that is still owed.
+
+        Return: None
+        """
+        tasks = list(self._flush_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.flush()
+
+    async def _grant(self, credit_to):
+        count = self._owed.pop(credit_to, 0)
+        if count:
+            try:
+                await self.channel.default_exchange.publish(
+                    aio_pika.Message(body=b"", headers={CREDIT_HEADER: count}), routing_key=credit_to
+                )
+            except BaseException:
+                # Not granted (e.g. a cancelled flush): keep it owed.
+                self._owed[credit_to] = self._owed.get(credit_to, 0) + count
+                raise
+            self.granted += count
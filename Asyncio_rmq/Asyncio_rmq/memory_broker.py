@@ -0,0 +1,554 @@
+"""
+In-memory stand-in for a RabbitMQ broker.
+
+This implements the subset of the aio_pika API used by this package (connections, channels, exchanges,
+queues, publish, get, consume, ack/nack, prefetch, message TTL and dead-lettering) inside a single event
+loop. It allows the package to be exercised, tested and benchmarked without a running broker. Connect with
+a "memory://" URL through `createConnection`, or call `connect` directly.
+
+Note: every "memory://" URL refers to the same process-wide broker unless a different virtual host is
+given, e.g. "memory:///bench".
+"""
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from aio_pika.exceptions import ChannelPreconditionFailed
+from aio_pika.exceptions import QueueEmpty
+from aio_pika import ExchangeType
+from aio_pika import Message
+
+_brokers = {}
+
+
+def get_broker(url="memory://"):
+    """
+    Get (or create) the broker for a "memory://" URL.
+
+    Parameters
+    ----------
+    url: string
+        Broker URL. The path selects the virtual host.
+
+    Return: MemoryBroker
+        Broker shared by every connection to the same virtual host.
+    """
+    vhost = urlparse(url).path or "/"
+    if vhost not in _brokers:
+        _brokers[vhost] = MemoryBroker()
+    return _brokers[vhost]
+
+
+async def connect(url="memory://", **kwargs):
+    """
+    Open a connection to the in-memory broker.
+
+    Parameters
+    ----------
+    url: string
+        Broker URL. The path selects the virtual host.
+
+    Return: MemoryConnection
+        Open connection.
+    """
+    return MemoryConnection(get_broker(url))
+
+
+class MemoryBroker:
+    """Process-wide broker state: exchanges and queues."""
+
+    def __init__(self):
+        self.exchanges = {}
+        self.queues = {}
+        self._names = itertools.count()
+        self._consumer_tags = itertools.count(1)
+        self.exchanges[""] = _ExchangeState("", ExchangeType.DIRECT)
+
+    def route(self, exchange_name, routing_key, message):
+        """
+        Route a message through an exchange into its bound queues.
+
+        Parameters
+        ----------
+        exchange_name: string
+            Name of the exchange. The empty string is the default exchange.
+
+        routing_key: string
+            Routing key of the message.
+
+        message: aio_pika.Message
+            Message to deliver.
+
+        Return: int
+            Number of queues the message was delivered to.
+        """
+        if exchange_name == "":
+            targets = [routing_key] if routing_key in self.queues else []
+        else:
+            exchange = self.exchanges.get(exchange_name)
+            if exchange is None:
+                return 0
+            targets = exchange.match(routing_key)
+
+        for name in targets:
+            self.queues[name].put(message, exchange_name, routing_key)
+        return len(targets)
+
+    def delete_queue(self, name):
+        queue = self.queues.pop(name, None)
+        if queue is not None:
+            queue.close()
+        for exchange in self.exchanges.values():
+            exchange.unbind_queue(name)
+
+
+class _ExchangeState:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = ExchangeType(type) if isinstance(type, str) else type
+        self.bindings = {}
+
+    def bind(self, queue_name, routing_key):
+        self.bindings.setdefault(routing_key, set()).add(queue_name)
+
+    def unbind(self, queue_name, routing_key):
+        self.bindings.get(routing_key, set()).discard(queue_name)
+
+    def unbind_queue(self, queue_name):
+        for queues in self.bindings.values():
+            queues.discard(queue_name)
+
+    def match(self, routing_key):
+        if self.type == ExchangeType.FANOUT:
+            return sorted(set().union(*self.bindings.values())) if self.bindings else []
+        return sorted(self.bindings.get(routing_key, ()))
+
+
+class _QueueState:
+    def __init__(self, broker, name, arguments, durable=False, auto_delete=False):
+        self.broker = broker
+        self.name = name
+        self.arguments = dict(arguments or {})
+        self.flags = (durable, auto_delete)
+        self.ready = deque()
+        self.consumers = {}
+        self._rr = deque()
+        self.closed = False
+
+    def put(self, message, exchange_name, routing_key, redelivered=False):
+        ttl = self._ttl(message)
+        if ttl is not None and ttl <= 0:
+            self.dead_letter(message, exchange_name, routing_key, "expired")
+            return
+        item = [message, exchange_name, routing_key, redelivered, None]
+        if ttl is not None:
+            item[4] = asyncio.get_running_loop().call_later(ttl, self._expire, item)
+        self.ready.append(item)
+        self.dispatch()
+
+    def _ttl(self, message):
+        # The shorter of the message expiration (seconds) and the queue's x-message-ttl (milliseconds) wins.
+        values = []
+        if message.expiration is not None:
+            expiration = message.expiration
+            values.append(expiration.total_seconds() if hasattr(expiration, "total_seconds") else float(expiration))
+        if "x-message-ttl" in self.arguments:
+            values.append(float(self.arguments["x-message-ttl"]) / 1000)
+        return min(values) if values else None
+
+    def _expire(self, item):
+        try:
+            self.ready.remove(item)
+        except ValueError:
+            return
+        self.dead_letter(item[0], item[1], item[2], "expired")
+
+    def dead_letter(self, message, exchange_name, routing_key, reason):
+        dlx = self.arguments.get("x-dead-letter-exchange")
+        if dlx is None:
+            return
+        dl_key = self.arguments.get("x-dead-letter-routing-key", routing_key)
+        headers = dict(message.headers or {})
+        death = {"queue": self.name, "reason": reason, "exchange": exchange_name, "routing-keys": [routing_key]}
+        headers["x-death"] = [death] + list(headers.get("x-death", []))
+        dead = _copy_message(message, headers=headers, expiration=None)
+        self.broker.route(dlx, dl_key, dead)
+
+    def take(self):
+        item = self.ready.popleft()
+        if item[4] is not None:
+            item[4].cancel()
+        return item
+
+    def dispatch(self):
+        while self.ready and self._rr:
+            for _ in range(len(self._rr)):
+                tag = self._rr[0]
+                self._rr.rotate(-1)
+                consumer = self.consumers[tag]
+                if consumer.channel.has_capacity():
+                    consumer.deliver(self.take())
+                    break
+            else:
+                return
+
+    def close(self):
+        self.closed = True
+        for item in self.ready:
+            if item[4] is not None:
+                item[4].cancel()
+        self.ready.clear()
+
+
+class _Consumer:
+    def __init__(self, queue_state, channel, callback, no_ack):
+        self.queue_state = queue_state
+        self.channel = channel
+        self.callback = callback
+        self.no_ack = no_ack
+
+    def deliver(self, item):
+        message = self.channel.wrap(self.queue_state, item, self.no_ack)
+        asyncio.get_running_loop().create_task(self.callback(message))
+
+
+class MemoryConnection:
+    """In-memory equivalent of an aio_pika robust connection."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.channels = []
+        self.is_closed = False
+        self.reconnect_callbacks = _CallbackCollection()
+        self.close_callbacks = _CallbackCollection()
+
+    async def channel(self, publisher_confirms=True, **kwargs):
+        channel = MemoryChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self, exc=None):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for channel in self.channels:
+            await channel.close()
+        self.close_callbacks(self, exc)
+
+    async def reconnect(self):
+        """Simulate a robust reconnect: unacked messages are requeued and reconnect callbacks fire."""
+        for channel in self.channels:
+            channel.requeue_unacked()
+        self.reconnect_callbacks(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class MemoryChannel:
+    """In-memory equivalent of an aio_pika channel."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.prefetch_count = 0
+        self.unacked = {}
+        self.is_closed = False
+        self._tags = itertools.count(1)
+        self.default_exchange = MemoryExchange(self, "", ExchangeType.DIRECT)
+
+    async def set_qos(self, prefetch_count=0, prefetch_size=0, global_=False, **kwargs):
+        self.prefetch_count = prefetch_count
+        self._redispatch()
+
+    def has_capacity(self):
+        return self.prefetch_count == 0 or len(self.unacked) < self.prefetch_count
+
+    async def declare_exchange(self, name, type=ExchangeType.DIRECT, durable=False, auto_delete=False, **kwargs):
+        if name not in self.broker.exchanges:
+            if kwargs.get("passive"):
+                raise LookupError("exchange %r does not exist" % name)
+            self.broker.exchanges[name] = _ExchangeState(name, type)
+        return MemoryExchange(self, name, self.broker.exchanges[name].type)
+
+    async def get_exchange(self, name, ensure=True):
+        # Like aio_pika, ensure=False returns an exchange object without a declaration.
+        if ensure or name not in self.broker.exchanges:
+            return await self.declare_exchange(name, passive=ensure)
+        return MemoryExchange(self, name, self.broker.exchanges[name].type)
+
+    async def declare_queue(
+        self, name=None, durable=False, exclusive=False, passive=False, auto_delete=False, arguments=None, **kwargs
+    ):
+        if not name:
+            name = "amq.gen-%d" % next(self.broker._names)
+        if name not in self.broker.queues:
+            if passive:
+                raise LookupError("queue %r does not exist" % name)
+            self.broker.queues[name] = _QueueState(self.broker, name, arguments, durable, auto_delete)
+        elif not passive and self.broker.queues[name].flags != (durable, auto_delete):
+            # RabbitMQ refuses to redeclare a queue with different flags (406 PRECONDITION_FAILED).
+            raise ChannelPreconditionFailed(
+                "inequivalent arg for queue %r: (durable, auto_delete) %r != %r"
+                % (name, (durable, auto_delete), self.broker.queues[name].flags)
+            )
+        return MemoryQueue(self, self.broker.queues[name])
+
+    async def get_queue(self, name, ensure=True):
+        if ensure or name not in self.broker.queues:
+            return await self.declare_queue(name, passive=ensure)
+        return MemoryQueue(self, self.broker.queues[name])
+
+    async def queue_delete(self, name, **kwargs):
+        self.broker.delete_queue(name)
+
+    async def exchange_delete(self, name, **kwargs):
+        self.broker.exchanges.pop(name, None)
+
+    def wrap(self, queue_state, item, no_ack):
+        message, exchange_name, routing_key, redelivered, _ = item
+        tag = next(self._tags)
+        incoming = MemoryIncomingMessage(self, queue_state, tag, message, exchange_name, routing_key, redelivered)
+        if no_ack:
+            incoming.processed = True
+        else:
+            self.unacked[tag] = incoming
+        return incoming
+
+    def settle(self, delivery_tag, multiple, requeue=None):
+        if multiple:
+            tags = [tag for tag in self.unacked if tag <= delivery_tag]
+        else:
+            tags = [delivery_tag] if delivery_tag in self.unacked else []
+        for tag in tags:
+            incoming = self.unacked.pop(tag)
+            incoming.processed = True
+            if requeue is True:
+                incoming.queue_state.put(incoming.message, incoming.exchange, incoming.routing_key, redelivered=True)
+            elif requeue is False:
+                incoming.queue_state.dead_letter(incoming.message, incoming.exchange, incoming.routing_key, "rejected")
+        self._redispatch()
+
+    def requeue_unacked(self):
+        self.settle(max(self.unacked, default=0), multiple=True, requeue=True)
+
+    def _redispatch(self):
+        for queue_state in list(self.broker.queues.values()):
+            if queue_state.ready and any(c.channel is self for c in queue_state.consumers.values()):
+                queue_state.dispatch()
+
+    async def close(self, exc=None):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for queue_state in list(self.broker.queues.values()):
+            for tag in [tag for tag, c in queue_state.consumers.items() if c.channel is self]:
+                queue_state.consumers.pop(tag)
+                queue_state._rr.remove(tag)
+        self.requeue_unacked()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class MemoryExchange:
+    """In-memory equivalent of an aio_pika exchange."""
+
+    def __init__(self, channel, name, type):
+        self.channel = channel
+        self.name = name
+        self.type = type
+
+    async def publish(self, message, routing_key, mandatory=True, timeout=None, **kwargs):
+        # Hand control back to the loop like a real network write would.
+        await asyncio.sleep(0)
+        self.channel.broker.route(self.name, routing_key, _copy_message(message))
+        return True
+
+
+class MemoryQueue:
+    """In-memory equivalent of an aio_pika queue."""
+
+    def __init__(self, channel, state):
+        self.channel = channel
+        self.state = state
+        self.name = state.name
+        self.arguments = state.arguments
+
+    @property
+    def declaration_result(self):
+        return _DeclarationResult(len(self.state.ready), len(self.state.consumers))
+
+    async def bind(self, exchange, routing_key=None, **kwargs):
+        name = exchange if isinstance(exchange, str) else exchange.name
+        self.channel.broker.exchanges[name].bind(self.name, self.name if routing_key is None else routing_key)
+
+    async def unbind(self, exchange, routing_key=None, **kwargs):
+        name = exchange if isinstance(exchange, str) else exchange.name
+        self.channel.broker.exchanges[name].unbind(self.name, self.name if routing_key is None else routing_key)
+
+    async def get(self, no_ack=False, fail=True, timeout=5):
+        # Like basic.get: an empty queue answers at once (`timeout` only bounds the RPC on a real broker).
+        if not self.state.ready:
+            if fail:
+                raise QueueEmpty()
+            return None
+        return self.channel.wrap(self.state, self.state.take(), no_ack)
+
+    async def consume(self, callback, no_ack=False, exclusive=False, arguments=None, consumer_tag=None, **kwargs):
+        tag = consumer_tag or "ctag.%s.%d" % (self.name, next(self.channel.broker._consumer_tags))
+        self.state.consumers[tag] = _Consumer(self.state, self.channel, callback, no_ack)
+        self.state._rr.append(tag)
+        self.state.dispatch()
+        return tag
+
+    async def cancel(self, consumer_tag, **kwargs):
+        if self.state.consumers.pop(consumer_tag, None) is not None:
+            self.state._rr.remove(consumer_tag)
+
+    def iterator(self, **kwargs):
+        return _MemoryQueueIterator(self, **kwargs)
+
+    async def purge(self, **kwargs):
+        count = len(self.state.ready)
+        while self.state.ready:
+            self.state.take()
+        return count
+
+    async def delete(self, **kwargs):
+        self.channel.broker.delete_queue(self.name)
+
+
+class _MemoryQueueIterator:
+    """Async iterator over a queue. Messages still buffered on close are requeued, as in aio_pika."""
+
+    def __init__(self, queue, **kwargs):
+        self.queue = queue
+        self._kwargs = kwargs
+        self._buffer = asyncio.Queue()
+        self._consumer_tag = None
+
+    async def _on_message(self, message):
+        await self._buffer.put(message)
+
+    async def consume(self):
+        self._consumer_tag = await self.queue.consume(self._on_message, **self._kwargs)
+
+    async def close(self):
+        if self._consumer_tag is not None:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        while not self._buffer.empty():
+            message = self._buffer.get_nowait()
+            if not message.processed:
+                await message.nack(requeue=True)
+
+    async def __aenter__(self):
+        await self.consume()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._consumer_tag is None:
+            await self.consume()
+        return await self._buffer.get()
+
+
+class MemoryIncomingMessage:
+    """In-memory equivalent of an aio_pika incoming message."""
+
+    def __init__(self, channel, queue_state, delivery_tag, message, exchange, routing_key, redelivered):
+        self.channel = channel
+        self.queue_state = queue_state
+        self.delivery_tag = delivery_tag
+        self.message = message
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.redelivered = redelivered
+        self.processed = False
+
+    def __getattr__(self, name):
+        # Message properties (body, headers, correlation_id, reply_to, ...) come from the published message.
+        return getattr(self.__dict__["message"], name)
+
+    def _check(self):
+        if self.processed:
+            raise RuntimeError("Message already processed")
+
+    async def ack(self, multiple=False):
+        self._check()
+        self.channel.settle(self.delivery_tag, multiple)
+
+    async def nack(self, multiple=False, requeue=True):
+        self._check()
+        self.channel.settle(self.delivery_tag, multiple, requeue=requeue)
+
+    async def reject(self, requeue=False):
+        self._check()
+        self.channel.settle(self.delivery_tag, False, requeue=requeue)
+
+    @asynccontextmanager
+    async def process(self, requeue=False, reject_on_redelivered=False, ignore_processed=False):
+        try:
+            yield self
+        except BaseException:
+            if not self.processed:
+                await self.reject(requeue=requeue and not (reject_on_redelivered and self.redelivered))
+            raise
+        else:
+            if not self.processed:
+                await self.ack()
+
+
+class _DeclarationResult:
+    def __init__(self, message_count, consumer_count):
+        self.message_count = message_count
+        self.consumer_count = consumer_count
+
+
+class _CallbackCollection(list):
+    def add(self, callback):
+        self.append(callback)
+
+    def discard(self, callback):
+        if callback in self:
+            self.remove(callback)
+
+    def __call__(self, *args):
+        for callback in list(self):
+            result = callback(*args)
+            if asyncio.iscoroutine(result):
+                asyncio.get_running_loop().create_task(result)
+
+
+def _copy_message(message, **overrides):
+    properties = dict(
+        body=message.body,
+        headers=dict(message.headers or {}),
+        content_type=message.content_type,
+        content_encoding=message.content_encoding,
+        delivery_mode=message.delivery_mode,
+        priority=message.priority,
+        correlation_id=message.correlation_id,
+        reply_to=message.reply_to,
+        expiration=message.expiration,
+        message_id=message.message_id,
+        timestamp=message.timestamp,
+        type=message.type,
+        user_id=message.user_id,
+        app_id=message.app_id,
+    )
+    properties.update(overrides)
+    return Message(**properties)
@@ -0,0 +1,442 @@
+"""
+Messaging metrics.
+
+A small in-process instrumentation layer for the package: counters for published, consumed, acked, nacked
+and redelivered messages, histograms for publish-to-consume latency and handler time, and sampled queue
+depths. Everything can be exported in the Prometheus text format.
+
+Metrics are disabled by default. Every record_* method returns as soon as it sees that `enabled` is off, so
+the disabled cost per message is the get_metrics() and record_* calls at the call site and nothing more. Enable
+them with:
+
+    registry = Asyncio_rmq.metrics.enable_metrics()
+    ...
+    print(registry.prometheus_text())
+
+Publish-to-consume latency uses the wall clock timestamp the publisher puts in the PUBLISHED_AT_HEADER
+header, so across hosts it is only as good as their clock synchronisation.
+"""
+import asyncio
+import bisect
+import time
+from contextlib import contextmanager
+
+PUBLISHED_AT_HEADER = "x-published-at"
+
+# Seconds: 100us .. 10s.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+COUNTERS = {
+    "published": "Messages published.",
+    "consumed": "Messages received from a queue.",
+    "acked": "Messages acknowledged.",
+    "nacked": "Messages negatively acknowledged or rejected.",
+    "redelivered": "Messages received with the redelivered flag set.",
+    "retried": "Failed messages scheduled for a delayed retry.",
+    "dead_lettered": "Failed messages dead-lettered after exhausting their retries.",
+}
+HISTOGRAMS = {
+    "publish_to_consume_seconds": "Time from publish to consume.",
+    "handler_seconds": "Time spent in message handlers.",
+}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Parameters
+    ----------
+    buckets: List[float]
+        Upper bounds of the buckets, in increasing order. A +Inf bucket is implied.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile from the bucket counts (upper bound of the bucket holding it).
+
+        Parameters
+        ----------
+        q: float
+            Quantile in [0, 1].
+
+        Return: float
+            Estimated quantile. inf when it falls in the +Inf bucket, nan when empty.
+        """
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Metrics registry.
+
+    Parameters
+    ----------
+    enabled: bool
+        Whether instrumented code records anything.
+
+    prefix: string
+        Prefix for exported metric names.
+    """
+
+    def __init__(self, enabled=True, prefix="rmq"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.counters = {name: {} for name in COUNTERS}
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.queue_depth = {}
+
+    def inc(self, name, label, value=1):
+        """
+        Increment a counter.
+
+        Parameters
+        ----------
+        name: string
+            Counter name (see COUNTERS).
+
+        label: string
+            Queue or routing key the message belongs to.
+
+        value: int
+            Amount to add.
+
+        Return: None
+        """
+        counter = self.counters[name]
+        counter[label] = counter.get(label, 0) + value
+
+    def observe(self, name, label, value):
+        """
+        Record a value in a histogram.
+
+        Parameters
+        ----------
+        name: string
+            Histogram name (see HISTOGRAMS).
+
+        label: string
+            Queue or routing key the message belongs to.
+
+        value: float
+            Observed value in seconds.
+
+        Return: None
+        """
+        histogram = self.histograms[name].get(label)
+        if histogram is None:
+            histogram = self.histograms[name][label] = Histogram()
+        histogram.observe(value)
+
+    def stamp(self, headers):
+        """
+        Add the publish timestamp to message headers (only when enabled).
+
+        Parameters
+        ----------
+        headers: dict
+            Message headers, updated in place.
+
+        Return: dict
+            The headers.
+        """
+        if self.enabled:
+            headers[PUBLISHED_AT_HEADER] = time.time()
+        return headers
+
+    def record_publish(self, routing_key):
+        """
+        Count a published message.
+
+        Parameters
+        ----------
+        routing_key: string
+            Routing key the message was published with.
+
+        Return: None
+        """
+        if self.enabled:
+            self.inc("published", routing_key)
+
+    def record_consume(self, queue_name, message):
+        """
+        Count a received message and record its publish-to-consume latency.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the message was received from.
+
+        message: aio_pika.IncomingMessage
+            Received message.
+
+        Return: None
+        """
+        if not self.enabled:
+            return
+        self.inc("consumed", queue_name)
+        if message.redelivered:
+            self.inc("redelivered", queue_name)
+        published_at = (message.headers or {}).get(PUBLISHED_AT_HEADER)
+        if published_at is not None:
+            self.observe("publish_to_consume_seconds", queue_name, max(time.time() - published_at, 0.0))
+
+    def record_ack(self, queue_name, count=1):
+        """
+        Count acknowledged messages.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the messages came from.
+
+        count: int
+            Number of messages acknowledged.
+
+        Return: None
+        """
+        if self.enabled:
+            self.inc("acked", queue_name, count)
+
+    def record_nack(self, queue_name, count=1):
+        """
+        Count negatively acknowledged or rejected messages.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the messages came from.
+
+        count: int
+            Number of messages nacked.
+
+        Return: None
+        """
+        if self.enabled:
+            self.inc("nacked", queue_name, count)
+
+    def record_retry(self, queue_name):
+        """
+        Count a failed message scheduled for a delayed retry.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the message came from.
+
+        Return: None
+        """
+        if self.enabled:
+            self.inc("retried", queue_name)
+
+    def record_dead_letter(self, queue_name):
+        """
+        Count a failed message dead-lettered after exhausting its retries.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the message came from.
+
+        Return: None
+        """
+        if self.enabled:
+            self.inc("dead_lettered", queue_name)
+
+    @contextmanager
+    def time_handler(self, queue_name):
+        """
+        Time the body of a `with` block as handler time.
+
+        Parameters
+        ----------
+        queue_name: string
+            Queue the handled message came from.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("handler_seconds", queue_name, time.perf_counter() - start)
+
+    async def sample_queue_depth(self, channel, queue_name):
+        """
+        Sample the number of ready messages in a queue.
+
+        Parameters
+        ----------
+        channel:
+            Declared channel for use.
+
+        queue_name: string
+            Queue to sample. It must already exist.
+
+        Return: int
+            Number of ready messages.
+        """
+        queue = await channel.declare_queue(queue_name, passive=True)
+        depth = queue.declaration_result.message_count
+        self.queue_depth[queue_name] = depth
+        return depth
+
+    async def sample_queue_depths(self, channel, queue_names, interval=1.0):
+        """
+        Sample queue depths every `interval` seconds until cancelled. Run this as a task.
+
+        Parameters
+        ----------
+        channel:
+            Declared channel for use.
+
+        queue_names: List[string]
+            Queues to sample.
+
+        interval: float
+            Seconds between samples.
+
+        Return: None
+        """
+        while True:
+            if self.enabled:
+                for name in queue_names:
+                    await self.sample_queue_depth(channel, name)
+            await asyncio.sleep(interval)
+
+    def reset(self):
+        """
+        Clear all counters, histograms and queue depths. `enabled` is left unchanged.
+
+        Return: None
+        """
+        self.counters = {name: {} for name in COUNTERS}
+        self.histograms = {name: {} for name in HISTOGRAMS}
+        self.queue_depth = {}
+
+    def snapshot(self):
+        """
+        Return the current values as plain Python objects.
+
+        Return: dict
+            counters, queue depths, and per histogram the count, sum, p50, p95 and p99.
+        """
+        histograms = {}
+        for name, series in self.histograms.items():
+            histograms[name] = {
+                label: {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                    "p99": h.quantile(0.99),
+                }
+                for label, h in series.items()
+            }
+        return {
+            "counters": {name: dict(series) for name, series in self.counters.items()},
+            "histograms": histograms,
+            "queue_depth": dict(self.queue_depth),
+        }
+
+    def prometheus_text(self):
+        """
+        Export all metrics in the Prometheus text exposition format.
+
+        Return: string
+        """
+        lines = []
+        for name, series in self.counters.items():
+            metric = "%s_messages_%s_total" % (self.prefix, name)
+            lines.append("# HELP %s %s" % (metric, COUNTERS[name]))
+            lines.append("# TYPE %s counter" % metric)
+            for label, value in sorted(series.items()):
+                lines.append('%s{queue="%s"} %d' % (metric, _escape(label), value))
+
+        for name, series in self.histograms.items():
+            metric = "%s_%s" % (self.prefix, name)
+            lines.append("# HELP %s %s" % (metric, HISTOGRAMS[name]))
+            lines.append("# TYPE %s histogram" % metric)
+            for label, h in sorted(series.items()):
+                label = _escape(label)
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append('%s_bucket{queue="%s",le="%s"} %d' % (metric, label, le, cumulative))
+                lines.append('%s_sum{queue="%s"} %r' % (metric, label, h.sum))
+                lines.append('%s_count{queue="%s"} %d' % (metric, label, h.count))
+
+        metric = "%s_queue_depth" % self.prefix
+        lines.append("# HELP %s Ready messages in the queue when last sampled." % metric)
+        lines.append("# TYPE %s gauge" % metric)
+        for label, value in sorted(self.queue_depth.items()):
+            lines.append('%s{queue="%s"} %d' % (metric, _escape(label), value))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write the Prometheus text export to a file (e.g. for the node exporter textfile collector).
+
+        Parameters
+        ----------
+        path: string
+            Output file path.
+
+        Return: None
+        """
+        with open(path, "w") as f:
+            f.write(self.prometheus_text())
+
+
+def _escape(label):
+    # Label values escape backslash, double quote and line feed in the text exposition format.
+    return str(label).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_registry = Metrics(enabled=False)
+
+
+def get_metrics():
+    """
+    Get the package-wide metrics registry.
+
+    Return: Metrics
+    """
+    return _registry
+
+
+def enable_metrics(enabled=True):
+    """
+    Enable (or disable) the package-wide metrics registry.
+
+    Parameters
+    ----------
+    enabled: bool
+        New state.
+
+    Return: Metrics
+        The package-wide registry.
+    """
+    _registry.enabled = enabled
+    return _registry
@@ -0,0 +1,215 @@
+"""
+Delayed retries with exponential backoff and dead-lettering.
+
+A failed message is not requeued in place (which would redeliver it immediately, in a hot loop). Instead it is
+republished to a retry queue for its attempt number and acked. Retry queues hold no consumers: each has an
+`x-message-ttl` equal to its backoff delay and dead-letters expired messages back to the work queue through the
+default exchange. One queue per delay keeps a long delay from holding up shorter ones.
+
+    work queue --fail--> <queue>.retry.1000 --1s--> work queue --fail--> <queue>.retry.2000 --2s--> ...
+               --fail after max_attempts--> <queue>.dlx --> <queue>.dead
+
+The attempt number travels in the ATTEMPT_HEADER header, together with the last error in ERROR_HEADER. A
+quorum queue's `x-delivery-count` (redeliveries after consumer crashes) counts towards the attempts too, and a
+message that has run out of attempts is dead-lettered before its handler runs, so a poison message occupies
+consumer capacity at most `max_attempts` times.
+
+Republishing and acking are two steps: a crash between them delivers the message once more (at least once).
+"""
+import aio_pika
+from Asyncio_rmq import metrics
+from Asyncio_rmq import topology
+
+ATTEMPT_HEADER = "x-attempt"
+ERROR_HEADER = "x-last-error"
+DELIVERY_COUNT_HEADER = "x-delivery-count"
+
+
+class RetryPolicy:
+    """
+    Retry and dead-letter policy for one work queue.
+
+    Parameters
+    ----------
+    queue_name: string
+        Work queue whose failed messages are retried.
+
+    max_attempts: int
+        Number of times a message is handled before it is dead-lettered.
+
+    base_delay: float
+        Delay (seconds) before the first retry.
+
+    multiplier: float
+        Backoff factor between retries.
+
+    max_delay: float
+        Upper bound on the delay (seconds).
+
+    dead_letter_exchange: string
+        Exchange for messages that ran out of attempts. Defaults to "<queue_name>.dlx".
+
+    dead_letter_queue: string
+        Queue bound to the dead-letter exchange. Defaults to "<queue_name>.dead".
+    """
+
+    def __init__(
+        self,
+        queue_name,
+        max_attempts=5,
+        base_delay=1.0,
+        multiplier=2.0,
+        max_delay=300.0,
+        dead_letter_exchange=None,
+        dead_letter_queue=None,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.queue_name = queue_name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.dead_letter_exchange = dead_letter_exchange or queue_name + ".dlx"
+        self.dead_letter_queue = dead_letter_queue or queue_name + ".dead"
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def delay(self, attempt):
+        """
+        Backoff delay after a failed attempt.
+
+        Parameters
+        ----------
+        attempt: int
+            Number of the attempt that failed, starting at 1.
+
+        Return: float
+            Delay in seconds.
+        """
+        return min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+
+    def retry_queue(self, attempt):
+        """
+        Name of the retry queue used after a failed attempt.
+
+        Parameters
+        ----------
+        attempt: int
+            Number of the attempt that failed, starting at 1.
+
+        Return: string
+        """
+        return "%s.retry.%d" % (self.queue_name, round(1000 * self.delay(attempt)))
+
+    def attempts(self, message):
+        """
+        Number of times a message has already been handled.
+
+        Parameters
+        ----------
+        message: aio_pika.IncomingMessage
+            Received message.
+
+        Return: int
+        """
+        headers = message.headers or {}
+        return int(headers.get(ATTEMPT_HEADER, 0)) + int(headers.get(DELIVERY_COUNT_HEADER, 0))
+
+    def exhausted(self, message):
+        """
+        Whether a message has used up its attempts and must not be handled again.
+
+        Return: bool
+        """
+        return self.attempts(message) >= self.max_attempts
+
+    def topology(self):
+        """
+        Retry queues, dead-letter exchange and dead-letter queue for this policy.
+
+        Return: topology.Topology
+        """
+        topo = topology.Topology()
+        for attempt in range(1, self.max_attempts):
+            topo.add_queue(
+                self.retry_queue(attempt),
+                durable=True,
+                arguments={
+                    "x-message-ttl": round(1000 * self.delay(attempt)),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.queue_name,
+                },
+            )
+        topo.add_exchange(self.dead_letter_exchange, "direct", durable=True)
+        topo.add_queue(self.dead_letter_queue, durable=True)
+        topo.add_binding(self.dead_letter_queue, self.dead_letter_exchange, self.queue_name)
+        return topo
+
+    async def declare(self, connection, channel):
+        """
+        Declare the retry and dead-letter topology (see topology.Topology.declare).
+
+        Parameters
+        ----------
+        connection:
+            RabbitMQ connection. Declarations are cached per connection, so declaring again is free.
+
+        channel:
+            Channel to declare on, e.g. the consumer's own channel.
+
+        Return: [channel, exchanges, queues]
+        """
+        return await self.topology().declare(connection, channel)
+
+    async def reject(self, channel, message, exc=None):
+        """
+        Send a failed message to its next retry queue, or dead-letter it, and ack the original.
+
+        Parameters
+        ----------
+        channel:
+            Channel to republish on.
+
+        message: aio_pika.IncomingMessage
+            The message that failed.
+
+        exc: Exception
+            The error, recorded in the ERROR_HEADER header.
+
+        Return: int
+            The attempt number that failed.
+        """
+        attempt = self.attempts(message) + 1
+        headers = dict(message.headers or {})
+        headers.pop(DELIVERY_COUNT_HEADER, None)
+        headers[ATTEMPT_HEADER] = attempt
+        if exc is not None:
+            headers[ERROR_HEADER] = ("%s: %s" % (type(exc).__name__, exc))[:256]
+        copy = aio_pika.Message(
+            body=message.body,
+            headers=headers,
+            content_type=message.content_type,
+            content_encoding=message.content_encoding,
+            delivery_mode=message.delivery_mode,
+            priority=message.priority,
+            correlation_id=message.correlation_id,
+            reply_to=message.reply_to,
+            message_id=message.message_id,
+            timestamp=message.timestamp,
+            type=message.type,
+            app_id=message.app_id,
+        )
+
+        registry = metrics.get_metrics()
+        if attempt >= self.max_attempts:
+            exchange = await channel.get_exchange(self.dead_letter_exchange, ensure=False)
+            await exchange.publish(copy, routing_key=self.queue_name)
+            self.dead_lettered += 1
+            registry.record_dead_letter(self.queue_name)
+        else:
+            await channel.default_exchange.publish(copy, routing_key=self.retry_queue(attempt))
+            self.retried += 1
+            registry.record_retry(self.queue_name)
+        await message.ack()
+        return attempt
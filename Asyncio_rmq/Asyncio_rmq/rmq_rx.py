@@ -1,32 +1,252 @@
 #!/usr/bin/env python
-"""Simple RMQ Receive."""
-import pika
+"""
+Simple RMQ Receive.
+
+Asyncio debug receiver built on the package's own connection code. Messages are fetched with a prefetch
+window, output is written in batches and acks are sent as one `multiple=True` ack per batch, so it can keep
+up with (and drain) a busy queue.
+
+Parameters
+----------
+queue (-queue or -q): string
+    Queue to read. Default is "MsgQueue".
+
+url (-url or -u): string
+    Broker URL. Default is the local RabbitMQ broker.
+
+prefetch (-prefetch or -p): integer
+    Prefetch window (unacknowledged messages in flight). Default is 1000.
+
+drain (--drain): flag
+    Consume and ack as fast as possible and exit once the queue has been idle for `idle-timeout` seconds.
+    Bodies are not printed unless an output file is given.
+
+sample (-sample or -s): integer
+    Only output every Nth message.
+
+count-only (--count-only): flag
+    Do not output message bodies, only the final statistics.
+
+output (-output or -o): string
+    Write the output to this file instead of stdout.
+
+loop (-loop or -l): string
+    Event loop: "auto" (uvloop when installed), "asyncio" or "uvloop". Default is "auto".
+
+Return: None
+"""
+
+import argparse
+import asyncio
 import sys
 import os
+import time
+import Asyncio_rmq
+from Asyncio_rmq import eventloop
 
 
-def main():
+class Receiver:
     """
-    Rabbitmq consume main body.
+    Batched message receiver.
 
     Parameters
     ----------
-    None. This is simply a debug receiver.
+    out: file object
+        Where message lines are written. None to count only.
 
-    Return: None
+    sample: int
+        Only output every Nth message.
+
+    batch_size: int
+        Number of messages per output write and per multiple-ack.
+
+    max_messages: int
+        Accept at most this many messages. Further deliveries (already prefetched) are nacked back to the queue
+        and `done` is set once the limit is reached.
+    """
+
+    def __init__(self, out=None, sample=1, batch_size=500, max_messages=None):
+        self.out = out
+        self.sample = max(sample, 1)
+        self.batch_size = batch_size
+        self.max_messages = max_messages
+        self.count = 0
+        self.bytes = 0
+        self.last_received = time.monotonic()
+        self.done = asyncio.Event()
+        self._lines = []
+        self._last_message = None
+        self._pending = 0
+
+    async def on_message(self, message):
+        if self.done.is_set():
+            # Only the messages up to the limit are acked (the multiple-ack stops at the last accepted tag).
+            await message.nack(requeue=True)
+            return
+        self.count += 1
+        self.bytes += len(message.body)
+        self.last_received = time.monotonic()
+        if self.out is not None and self.count % self.sample == 0:
+            self._lines.append(" [x] Received %r\n" % message.body)
+        self._last_message = message
+        self._pending += 1
+        if self.max_messages is not None and self.count >= self.max_messages:
+            self.done.set()
+            await self.flush()
+        elif self._pending >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Write buffered lines and ack everything received so far with one multiple-ack.
+
+        Return: None
+        """
+        if self._lines:
+            lines, self._lines = self._lines, []
+            self.out.write("".join(lines))
+        message, self._last_message = self._last_message, None
+        self._pending = 0
+        if message is not None and not message.processed:
+            await message.ack(multiple=True)
+
+
+async def receive(
+    queue_name="MsgQueue",
+    url=Asyncio_rmq.asyncio_rmq.RMQ_URL,
+    prefetch=1000,
+    drain=False,
+    sample=1,
+    count_only=False,
+    out=sys.stdout,
+    batch_size=500,
+    flush_interval=0.1,
+    idle_timeout=1.0,
+    max_messages=None,
+):
+    """
+    Receive messages from a queue until interrupted, drained or `max_messages` have arrived.
+
+    Parameters
+    ----------
+    queue_name: string
+        Queue to read. Declared if it does not exist.
+
+    url: string
+        Broker URL.
+
+    prefetch: int
+        Prefetch window.
+
+    drain: bool
+        Stop once the queue has been idle for `idle_timeout` seconds.
+
+    sample: int
+        Only output every Nth message.
+
+    count_only: bool
+        Do not output message bodies.
+
+    out: file object
+        Output for message lines.
+
+    batch_size: int
+        Messages per output write and per multiple-ack.
+
+    flush_interval: float
+        Seconds between flushes of a partial batch.
+
+    idle_timeout: float
+        Drain mode: seconds without messages before stopping.
+
+    max_messages: int
+        Stop after this many messages. Messages prefetched beyond the limit are requeued, not acked.
+
+    Return: dict
+        count, bytes, elapsed_s, msgs_per_s and mb_per_s.
     """
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host="localhost"))
-    channel = connection.channel()
+    connection = await Asyncio_rmq.openConnection(url)
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=prefetch)
+    queue = await channel.declare_queue(queue_name)
 
-    channel.queue_declare(queue="MsgQueue")
+    receiver = Receiver(None if count_only else out, sample, min(batch_size, prefetch), max_messages)
+    start = time.monotonic()
+    consumer_tag = await queue.consume(receiver.on_message)
+    try:
+        while not receiver.done.is_set():
+            try:
+                await asyncio.wait_for(receiver.done.wait(), flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await receiver.flush()
+            if drain and time.monotonic() - receiver.last_received >= idle_timeout:
+                break
+    finally:
+        await queue.cancel(consumer_tag)
+        await receiver.flush()
+        elapsed = time.monotonic() - start
+        await connection.close()
+
+    return {
+        "count": receiver.count,
+        "bytes": receiver.bytes,
+        "elapsed_s": elapsed,
+        "msgs_per_s": receiver.count / elapsed if elapsed else 0.0,
+        "mb_per_s": receiver.bytes / elapsed / 1e6 if elapsed else 0.0,
+    }
+
+
+def main():
+    """
+    Rabbitmq consume main body.
 
-    def callback(ch, method, properties, body):
-        print(" [x] Received %r" % body)
+    Parameters
+    ----------
+    None. This is simply a debug receiver. See the module docstring for the command line options.
 
-    channel.basic_consume(queue="MsgQueue", on_message_callback=callback, auto_ack=True)
+    Return: None
+    """
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-q", "--queue", type=str, default="MsgQueue", help="Queue to read")
+    ap.add_argument("-u", "--url", type=str, default=Asyncio_rmq.asyncio_rmq.RMQ_URL, help="Broker URL")
+    ap.add_argument("-p", "--prefetch", type=int, default=1000, help="Prefetch window")
+    ap.add_argument("--drain", action="store_true", help="Consume and ack in bulk, exit when idle")
+    ap.add_argument("-s", "--sample", type=int, default=1, help="Only output every Nth message")
+    ap.add_argument("--count-only", action="store_true", help="Only report message counts")
+    ap.add_argument("-o", "--output", type=str, default=None, help="Write output to this file")
+    ap.add_argument("-b", "--batch", type=int, default=500, help="Messages per write and per ack")
+    ap.add_argument("--idle-timeout", type=float, default=1.0, help="Drain: stop after this many idle seconds")
+    ap.add_argument("-n", "--max", type=int, default=None, help="Stop after this many messages")
+    ap.add_argument("-l", "--loop", choices=eventloop.LOOPS, default="auto", help="Event loop implementation")
+    args = ap.parse_args()
 
-    print(" [*] Waiting for messages. To exit press CTRL+C")
-    channel.start_consuming()
+    out = open(args.output, "w", buffering=1 << 20) if args.output else sys.stdout
+    print(" [*] Waiting for messages. To exit press CTRL+C", file=sys.stderr)
+    try:
+        stats = eventloop.run(
+            receive(
+                args.queue,
+                args.url,
+                args.prefetch,
+                args.drain,
+                args.sample,
+                args.count_only or (args.drain and args.output is None),
+                out,
+                args.batch,
+                idle_timeout=args.idle_timeout,
+                max_messages=args.max,
+            ),
+            args.loop,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(
+        " [*] %(count)d messages, %(bytes)d bytes in %(elapsed_s).2fs (%(msgs_per_s).0f msg/s, %(mb_per_s).2f MB/s)"
+        % stats,
+        file=sys.stderr,
+    )
 
 
 if __name__ == "__main__":
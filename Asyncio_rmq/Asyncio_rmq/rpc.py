@@ -0,0 +1,214 @@
+"""
+Request/reply RPC over RabbitMQ.
+
+Every request carries a `correlation_id` and a `reply_to` queue name. Each client owns a single exclusive
+reply queue which is multiplexed across all of its pending requests, so several requests can be in flight
+on one connection and replies may arrive in any order.
+"""
+import asyncio
+import itertools
+import uuid
+import aio_pika
+from Asyncio_rmq import metrics
+
+RPC_ERROR_HEADER = "x-rpc-error"
+
+
+class RPCError(Exception):
+    """Raised on the client when the server handler failed to process a request."""
+
+
+class RPCClient:
+    """
+    Asyncio RPC client.
+
+    Parameters
+    ----------
+    channel:
+        Declared channel for use.
+
+    routing_key: string
+        Name of the request queue the server is listening on.
+
+    timeout: float
+        Default time in seconds to wait for a reply before raising asyncio.TimeoutError.
+    """
+
+    def __init__(self, channel, routing_key, timeout=10):
+        self.channel = channel
+        self.routing_key = routing_key
+        self.timeout = timeout
+        self.callback_queue = None
+        self._consumer_tag = None
+        self._pending = {}
+        self._prefix = uuid.uuid4().hex
+        self._counter = itertools.count()
+
+    async def start(self):
+        """
+        Declare the exclusive reply queue and start consuming replies.
+
+        Return: RPCClient
+            The started client.
+        """
+        self.callback_queue = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+        self._consumer_tag = await self.callback_queue.consume(self._on_reply, no_ack=True)
+        return self
+
+    async def close(self):
+        """
+        Stop consuming replies and cancel any request that is still waiting.
+
+        Return: None
+        """
+        if self._consumer_tag is not None:
+            await self.callback_queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def pending(self):
+        """Number of requests still waiting on a reply."""
+        return len(self._pending)
+
+    async def call(self, body, routing_key=None, timeout=None, headers=None):
+        """
+        Publish a request and wait for the matching reply.
+
+        Parameters
+        ----------
+        body: bytes
+            Request payload.
+
+        routing_key: string
+            Request queue to use instead of the client default.
+
+        timeout: float
+            Time in seconds to wait instead of the client default.
+
+        headers: dict
+            Extra message headers to send with the request.
+
+        Return: bytes
+            Body of the reply.
+        """
+        if self._consumer_tag is None:
+            raise RuntimeError("RPCClient.start() must be awaited before call()")
+        timeout = self.timeout if timeout is None else timeout
+        correlation_id = "%s.%d" % (self._prefix, next(self._counter))
+        future = asyncio.get_running_loop().create_future()
+        self._pending[correlation_id] = future
+        routing_key = routing_key or self.routing_key
+        registry = metrics.get_metrics()
+        if registry.enabled:
+            headers = registry.stamp(dict(headers or {}))
+
+        message = aio_pika.Message(
+            body=body,
+            headers=headers,
+            correlation_id=correlation_id,
+            reply_to=self.callback_queue.name,
+            expiration=timeout,
+        )
+        try:
+            await self.channel.default_exchange.publish(message, routing_key=routing_key)
+            registry.record_publish(routing_key)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            # Late replies for a timed out request find no future and are dropped in _on_reply.
+            self._pending.pop(correlation_id, None)
+
+    async def _on_reply(self, message):
+        future = self._pending.pop(message.correlation_id, None)
+        if future is None or future.done():
+            return
+        headers = message.headers or {}
+        if RPC_ERROR_HEADER in headers:
+            future.set_exception(RPCError(message.body.decode()))
+        else:
+            future.set_result(message.body)
+
+
+class RPCServer:
+    """
+    Asyncio RPC server.
+
+    Parameters
+    ----------
+    channel:
+        Declared channel for use.
+
+    queue_name: string
+        Name of the request queue to declare and consume from.
+
+    handler: coroutine function
+        Called as `await handler(body)` for each request and must return the reply body as bytes.
+
+    prefetch: int
+        Maximum number of unacknowledged requests handled concurrently.
+    """
+
+    def __init__(self, channel, queue_name, handler, prefetch=32):
+        self.channel = channel
+        self.queue_name = queue_name
+        self.handler = handler
+        self.prefetch = prefetch
+        self.queue = None
+        self._consumer_tag = None
+
+    async def start(self):
+        """
+        Declare the request queue and start serving requests.
+
+        Return: RPCServer
+            The started server.
+        """
+        await self.channel.set_qos(prefetch_count=self.prefetch)
+        self.queue = await self.channel.declare_queue(self.queue_name, auto_delete=True)
+        self._consumer_tag = await self.queue.consume(self._on_request)
+        return self
+
+    async def close(self):
+        """
+        Stop serving requests.
+
+        Return: None
+        """
+        if self._consumer_tag is not None:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _on_request(self, message):
+        registry = metrics.get_metrics()
+        registry.record_consume(self.queue_name, message)
+        async with message.process(requeue=False):
+            if not message.reply_to:
+                return
+            headers = None
+            try:
+                with registry.time_handler(self.queue_name):
+                    body = await self.handler(message.body)
+            except Exception as e:
+                body = repr(e).encode()
+                headers = {RPC_ERROR_HEADER: type(e).__name__}
+
+            await self.channel.default_exchange.publish(
+                aio_pika.Message(body=body, headers=headers, correlation_id=message.correlation_id),
+                routing_key=message.reply_to,
+            )
+        registry.record_ack(self.queue_name)
@@ -0,0 +1,304 @@
+"""
+Pluggable message serialization.
+
+Serializers turn a Python object into a message body plus the message properties needed to turn it back.
+The serializer is recorded in the `content_type` property and any compression in `content_encoding`, so
+the consumer never has to know in advance what was sent.
+
+Available serializers
+---------------------
+raw: bytes, bytearray or memoryview, passed through untouched.
+text: str, UTF-8 encoded (what `_RMQPublish` used to do by hand).
+msgpack: Any msgpack-able object. Requires the optional `msgpack` package.
+numpy: np.ndarray. The dtype and shape travel in the headers. `encode` returns a memoryview over the array
+    buffer (no copy for a C-contiguous array) and `decode` is an `np.frombuffer` view onto the body. Building
+    an aio_pika.Message (`make_message`) still copies the body once, since aio_pika stores it as bytes.
+
+Compression
+-----------
+"zlib" (standard library) or "lz4" (optional `lz4` package). With compression="auto" a payload is only
+compressed once it reaches `compress_threshold` bytes, and the compressed body is only kept when it is
+meaningfully smaller. Large payloads are probed on a leading sample first, so noisy sample frames (which
+barely compress) are sent as-is without paying for a full compression pass.
+"""
+import zlib
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - optional dependency
+    lz4_frame = None
+
+import aio_pika
+
+DTYPE_HEADER = "x-dtype"
+SHAPE_HEADER = "x-shape"
+
+COMPRESS_THRESHOLD = 64 * 1024
+COMPRESS_MIN_SAVING = 0.1
+
+
+class RawSerializer:
+    """Pass bytes-like bodies through untouched."""
+
+    name = "raw"
+    content_type = "application/octet-stream"
+
+    def encode(self, obj):
+        if not isinstance(obj, (bytes, bytearray, memoryview)):
+            raise TypeError("raw serializer expects a bytes-like object, got %s" % type(obj).__name__)
+        return obj, {}
+
+    def decode(self, body, headers):
+        return body
+
+
+class TextSerializer:
+    """UTF-8 encoded strings."""
+
+    name = "text"
+    content_type = "text/plain"
+
+    def encode(self, obj):
+        return obj.encode(), {}
+
+    def decode(self, body, headers):
+        return bytes(body).decode()
+
+
+class MsgpackSerializer:
+    """msgpack encoded objects (optional `msgpack` dependency)."""
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def _check(self):
+        if msgpack is None:
+            raise ImportError("The msgpack serializer requires the 'msgpack' package")
+
+    def encode(self, obj):
+        self._check()
+        return msgpack.packb(obj, use_bin_type=True), {}
+
+    def decode(self, body, headers):
+        self._check()
+        return msgpack.unpackb(body, raw=False)
+
+
+class NumpySerializer:
+    """NumPy arrays with dtype and shape carried in the headers; encode and decode do not copy the data."""
+
+    name = "numpy"
+    content_type = "application/x-numpy"
+
+    def encode(self, obj):
+        # ascontiguousarray turns 0-d arrays into 1-d ones, so take the shape first.
+        shape = np.asarray(obj).shape
+        array = np.ascontiguousarray(obj)
+        headers = {DTYPE_HEADER: array.dtype.str, SHAPE_HEADER: list(shape)}
+        return memoryview(array.reshape(-1).view(np.uint8)), headers
+
+    def decode(self, body, headers):
+        # The returned array is a read-only view onto the message body.
+        return np.frombuffer(body, dtype=np.dtype(headers[DTYPE_HEADER])).reshape(headers[SHAPE_HEADER])
+
+
+_serializers = {}
+_compressors = {
+    "zlib": (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+if lz4_frame is not None:
+    _compressors["lz4"] = (lz4_frame.compress, lz4_frame.decompress)
+
+
+def register_serializer(serializer):
+    """
+    Register a serializer by name and content type.
+
+    Parameters
+    ----------
+    serializer: object
+        Object with `name` and `content_type` attributes and `encode(obj) -> (body, headers)` and
+        `decode(body, headers) -> obj` methods.
+
+    Return: None
+    """
+    _serializers[serializer.name] = serializer
+    _serializers[serializer.content_type] = serializer
+
+
+for _serializer in (RawSerializer(), TextSerializer(), MsgpackSerializer(), NumpySerializer()):
+    register_serializer(_serializer)
+
+
+def get_serializer(name):
+    """
+    Look up a serializer.
+
+    Parameters
+    ----------
+    name: string
+        Serializer name or content type.
+
+    Return: serializer object
+    """
+    try:
+        return _serializers[name]
+    except KeyError:
+        raise ValueError("Unknown serializer %r" % name) from None
+
+
+def serializer_for(obj):
+    """
+    Pick the default serializer for an object.
+
+    Parameters
+    ----------
+    obj: object
+        Object to be sent.
+
+    Return: serializer object
+    """
+    if isinstance(obj, np.ndarray):
+        return _serializers["numpy"]
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return _serializers["raw"]
+    if isinstance(obj, str):
+        return _serializers["text"]
+    return _serializers["msgpack"]
+
+
+def encode(obj, serializer=None, compression=None, compress_threshold=COMPRESS_THRESHOLD):
+    """
+    Serialize an object into a message body and message properties.
+
+    Parameters
+    ----------
+    obj: object
+        Object to send.
+
+    serializer: string
+        Serializer name. Chosen from the object type when None.
+
+    compression: string
+        None, "auto", "zlib" or "lz4". "auto" uses the fastest available codec for payloads of at least
+        `compress_threshold` bytes and keeps the result only if it saves at least 10%.
+
+    compress_threshold: int
+        Minimum payload size in bytes to consider compressing when compression="auto".
+
+    Return: [body, properties]
+    body: bytes-like
+        Message body. This may be a memoryview over the original object.
+
+    properties: dict
+        Keyword arguments for aio_pika.Message (content_type, content_encoding, headers).
+    """
+    codec = get_serializer(serializer) if serializer is not None else serializer_for(obj)
+    body, headers = codec.encode(obj)
+    properties = {"content_type": codec.content_type, "headers": headers}
+
+    if compression == "auto":
+        if len(body) < compress_threshold:
+            return body, properties
+        compression = "lz4" if "lz4" in _compressors else "zlib"
+        compress = _compressors[compression][0]
+        # Probe a leading sample first so incompressible (noisy) payloads only pay for the sample.
+        if len(body) >= 4 * compress_threshold:
+            sample = memoryview(body)[:compress_threshold]
+            if len(compress(sample)) > (1 - COMPRESS_MIN_SAVING) * len(sample):
+                return body, properties
+        compressed = compress(body)
+        if len(compressed) > (1 - COMPRESS_MIN_SAVING) * len(body):
+            return body, properties
+        body = compressed
+    elif compression is not None:
+        body = _get_compressor(compression)[0](body)
+
+    if compression is not None:
+        properties["content_encoding"] = compression
+    return body, properties
+
+
+def decode(body, content_type=None, content_encoding=None, headers=None, default="raw"):
+    """
+    Deserialize a message body.
+
+    Parameters
+    ----------
+    body: bytes
+        Message body.
+
+    content_type: string
+        Content type recorded by `encode`.
+
+    content_encoding: string
+        Compression recorded by `encode`, if any.
+
+    headers: dict
+        Message headers.
+
+    default: string
+        Serializer used for bodies that carry no content type.
+
+    Return: object
+        The decoded object.
+    """
+    if content_encoding:
+        body = _get_compressor(content_encoding)[1](body)
+    codec = get_serializer(content_type or default)
+    return codec.decode(body, headers or {})
+
+
+def make_message(obj, serializer=None, compression=None, compress_threshold=COMPRESS_THRESHOLD, **kwargs):
+    """
+    Build an aio_pika.Message for an object.
+
+    Parameters
+    ----------
+    obj: object
+        Object to send.
+
+    serializer, compression, compress_threshold:
+        See `encode`.
+
+    kwargs:
+        Other aio_pika.Message properties (correlation_id, reply_to, ...). Headers are merged.
+
+    Return: aio_pika.Message
+        The message. aio_pika copies the body into bytes here, even when `encode` did not copy it.
+    """
+    body, properties = encode(obj, serializer, compression, compress_threshold)
+    properties["headers"].update(kwargs.pop("headers", None) or {})
+    properties.update(kwargs)
+    return aio_pika.Message(body=body, **properties)
+
+
+def decode_message(message, default="raw"):
+    """
+    Decode the body of a received message.
+
+    Parameters
+    ----------
+    message: aio_pika.IncomingMessage
+        Message built with `make_message` (or any message with a known content type).
+
+    default: string
+        Serializer used when the message carries no content type.
+
+    Return: object
+        The decoded object.
+    """
+    return decode(message.body, message.content_type, message.content_encoding, message.headers, default)
+
+
+def _get_compressor(name):
+    try:
+        return _compressors[name]
+    except KeyError:
+        raise ValueError("Unknown or unavailable compression %r" % name) from None
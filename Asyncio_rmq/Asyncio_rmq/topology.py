@@ -0,0 +1,248 @@
+"""
+Declarative broker topology.
+
+A `Topology` lists the exchanges, queues and bindings a client needs. `declare()` sends the declarations
+concurrently (exchanges and queues together, then all bindings) instead of one round trip after another, and
+remembers per connection what has already been declared: declaring the same topology again on that
+connection, from any channel, costs no round trips, and only new or changed entities are sent.
+
+Auto-delete and exclusive entities are not remembered. They disappear with their last consumer, binding or
+connection, so they are declared again every time.
+
+Reconnects
+----------
+On a robust connection the remembered (persistent) entities are declared with `robust=False` so aio_pika does
+not restore them one by one per channel. Instead the registry replays them concurrently from its reconnect
+callback. Consumers started on such queue objects are not restored by aio_pika; the `Consumer` runtime
+declares its own queue and is unaffected. Auto-delete and exclusive entities stay robust, so aio_pika restores
+them, their bindings and their consumers itself.
+"""
+import asyncio
+import weakref
+import aio_pika
+
+_connections = weakref.WeakKeyDictionary()
+_MISSING = object()
+
+
+class _ConnectionState:
+    """What has been declared on one connection."""
+
+    def __init__(self):
+        self.exchanges = {}
+        self.queues = {}
+        self.bindings = {}
+        self.channel = None
+        self.lock = asyncio.Lock()
+        self.replays = 0
+
+
+def _state(connection):
+    state = _connections.get(connection)
+    if state is None:
+        state = _connections[connection] = _ConnectionState()
+        connection.reconnect_callbacks.add(_on_reconnect)
+    return state
+
+
+async def _on_reconnect(connection, *args):
+    state = _connections.get(connection)
+    if state is None or state.channel is None:
+        return
+    topology = Topology()
+    topology.exchanges, topology.queues, topology.bindings = state.exchanges, state.queues, state.bindings
+    async with state.lock:
+        if state.channel.is_closed:
+            # The channel the declarations were made on has since been closed by its owner.
+            state.channel = await connection.channel()
+        state.exchanges, state.queues, state.bindings = {}, {}, {}
+        await topology._declare(state, state.channel)
+        state.replays += 1
+
+
+def forget(connection):
+    """
+    Drop the cached declarations for a connection, e.g. after deleting entities behind the registry's back.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection.
+
+    Return: None
+    """
+    state = _connections.pop(connection, None)
+    if state is not None:
+        connection.reconnect_callbacks.discard(_on_reconnect)
+
+
+class Topology:
+    """
+    Exchanges, queues and bindings to declare.
+
+    The add_* methods return the topology so calls can be chained.
+    """
+
+    def __init__(self):
+        self.exchanges = {}
+        self.queues = {}
+        self.bindings = {}
+
+    def add_exchange(self, name, type="direct", durable=False, auto_delete=False, arguments=None):
+        """
+        Add an exchange.
+
+        Parameters
+        ----------
+        name: string
+            Exchange name.
+
+        type: string
+            Exchange type, e.g. "direct" or "fanout".
+
+        durable, auto_delete: bool
+            Declaration flags.
+
+        arguments: dict
+            Declaration arguments.
+
+        Return: Topology
+        """
+        self.exchanges[name] = (type, durable, auto_delete, _freeze(arguments))
+        return self
+
+    def add_queue(self, name, durable=False, exclusive=False, auto_delete=False, arguments=None):
+        """
+        Add a queue.
+
+        Parameters
+        ----------
+        name: string
+            Queue name.
+
+        durable, exclusive, auto_delete: bool
+            Declaration flags.
+
+        arguments: dict
+            Declaration arguments, e.g. {"x-message-ttl": 1000}.
+
+        Return: Topology
+        """
+        self.queues[name] = (durable, exclusive, auto_delete, _freeze(arguments))
+        return self
+
+    def add_binding(self, queue, exchange, routing_key=None, arguments=None):
+        """
+        Bind a queue to an exchange.
+
+        Parameters
+        ----------
+        queue: string
+            Queue name.
+
+        exchange: string
+            Exchange name.
+
+        routing_key: string
+            Routing key. Defaults to the queue name.
+
+        arguments: dict
+            Binding arguments.
+
+        Return: Topology
+        """
+        self.bindings[(queue, exchange, routing_key or queue)] = _freeze(arguments)
+        return self
+
+    async def declare(self, connection, channel=None):
+        """
+        Declare whatever the connection has not declared yet.
+
+        Parameters
+        ----------
+        connection:
+            RabbitMQ connection.
+
+        channel:
+            Channel to declare on and to bind the returned objects to. A new channel is opened when None.
+
+        Return: [channel, exchanges, queues]
+        channel:
+            The channel used.
+
+        exchanges: dict
+            Exchange objects by name.
+
+        queues: dict
+            Queue objects by name.
+        """
+        if channel is None:
+            channel = await connection.channel()
+        state = _state(connection)
+        async with state.lock:
+            if state.channel is None or state.channel.is_closed:
+                state.channel = channel
+            exchanges, queues = await self._declare(state, channel)
+        return [channel, exchanges, queues]
+
+    async def _declare(self, state, channel):
+        robust = isinstance(channel, aio_pika.abc.AbstractRobustChannel)
+        new_exchanges = [name for name, spec in self.exchanges.items() if state.exchanges.get(name, _MISSING) != spec]
+        new_queues = [name for name, spec in self.queues.items() if state.queues.get(name, _MISSING) != spec]
+
+        declared = await asyncio.gather(
+            *[self._declare_exchange(channel, name, robust) for name in new_exchanges],
+            *[self._declare_queue(channel, name, robust) for name in new_queues],
+        )
+        n_exchanges = len(new_exchanges)
+        exchanges = dict(zip(new_exchanges, declared[:n_exchanges]))
+        queues = dict(zip(new_queues, declared[n_exchanges:]))
+        for name in self.exchanges:
+            if name not in exchanges:
+                exchanges[name] = await channel.get_exchange(name, ensure=False)
+        for name in self.queues:
+            if name not in queues:
+                queues[name] = await channel.get_queue(name, ensure=False)
+
+        new_bindings = [key for key, spec in self.bindings.items() if state.bindings.get(key, _MISSING) != spec]
+        for queue_name, _, _ in new_bindings:
+            if queue_name not in queues:
+                queues[queue_name] = await channel.get_queue(queue_name, ensure=False)
+        await asyncio.gather(
+            *[queues[key[0]].bind(key[1], key[2], arguments=_thaw(self.bindings[key])) for key in new_bindings]
+        )
+
+        state.exchanges.update((name, self.exchanges[name]) for name in new_exchanges if self._persistent(name))
+        state.queues.update((name, self.queues[name]) for name in new_queues if self._persistent(queue=name))
+        state.bindings.update((key, self.bindings[key]) for key in new_bindings if self._persistent(key[1], key[0]))
+        return exchanges, queues
+
+    def _persistent(self, exchange=None, queue=None):
+        # Auto-delete and exclusive entities can vanish behind the registry's back, so they are never cached.
+        if exchange in self.exchanges and self.exchanges[exchange][2]:
+            return False
+        if queue in self.queues and (self.queues[queue][1] or self.queues[queue][2]):
+            return False
+        return True
+
+    async def _declare_exchange(self, channel, name, robust):
+        type, durable, auto_delete, arguments = self.exchanges[name]
+        options = {"robust": False} if robust and self._persistent(name) else {}
+        return await channel.declare_exchange(
+            name, type, durable=durable, auto_delete=auto_delete, arguments=_thaw(arguments), **options
+        )
+
+    async def _declare_queue(self, channel, name, robust):
+        durable, exclusive, auto_delete, arguments = self.queues[name]
+        options = {"robust": False} if robust and self._persistent(queue=name) else {}
+        return await channel.declare_queue(
+            name, durable=durable, exclusive=exclusive, auto_delete=auto_delete, arguments=_thaw(arguments), **options
+        )
+
+
+def _freeze(arguments):
+    return tuple(sorted(arguments.items())) if arguments else None
+
+
+def _thaw(arguments):
+    return dict(arguments) if arguments else None
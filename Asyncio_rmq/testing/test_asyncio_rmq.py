@@ -61,11 +61,8 @@ async def test_asyncio_rmq():
         "Fantastic!",
     ]
 
-    # Create asyncio event loop
-    loop = asyncio.get_event_loop()
-
-    # Create connection
-    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(Queue, routing_key, loop)
+    # Create connection on the running event loop
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(Queue, routing_key)
 
     for idx in range(len(TalkMsg)):
         task_Start = asyncio.create_task(
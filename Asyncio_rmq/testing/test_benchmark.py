@@ -0,0 +1,91 @@
+"""Unit test for the Asyncio RabbitMQ throughput benchmark."""
+from Asyncio_rmq import benchmark
+from Asyncio_rmq import metrics
+import asyncio
+import copy
+import json
+import pytest
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["consume", "get"])
+async def test_throughput_benchmark(monkeypatch, mode):
+    """
+    Test a small throughput run against the in-memory broker.
+
+    Test Overview:
+    --------------
+    Every message must be received once, the report must contain throughput and latency percentiles, and
+    the global metrics registry must be left as it was. The broker's get does not wait for messages (like
+    basic.get), so in "get" mode the getter starts on an empty queue and has to poll until the publishers catch up.
+    In "get" mode every message goes through _RMQConsume. The in-memory broker refuses to redeclare a queue
+    with other flags, like RabbitMQ, so the consumer must declare the createConnection queue as auto-delete.
+    """
+    consumed = []
+    original = benchmark.asyncio_rmq._RMQConsume
+
+    async def spy(*args, **kwargs):
+        body = await original(*args, **kwargs)
+        if body is not None:
+            consumed.append(body)
+        return body
+
+    monkeypatch.setattr(benchmark.asyncio_rmq, "_RMQConsume", spy)
+    result = await benchmark.throughput_benchmark(
+        count=500, size=256, concurrency=4, prefetch=64, mode=mode, url="memory:///test_benchmark"
+    )
+
+    assert result["count"] == 500
+    assert result["msgs_per_s"] > 0
+    assert result["mb_per_s"] == pytest.approx(result["msgs_per_s"] * 256 / benchmark.MB)
+    latency = result["latency_ms"]
+    assert 0 <= latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert not metrics.get_metrics().enabled
+    assert consumed == ([bytes(256)] * 500 if mode == "get" else [])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["consume", "get"])
+async def test_benchmark_gives_up_at_deadline(monkeypatch, mode):
+    """
+    Test a run stops at its deadline when messages never arrive.
+
+    Test Overview:
+    --------------
+    Publishing is replaced by a no-op, so no message ever arrives. The consumer wait and the backing-off
+    getter both give up after `timeout` with TimeoutError instead of waiting forever.
+    """
+
+    async def drop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(benchmark.asyncio_rmq, "_RMQPublish", drop)
+    with pytest.raises(asyncio.TimeoutError):
+        await benchmark.throughput_benchmark(
+            count=10, concurrency=1, mode=mode, url="memory:///test_benchmark_deadline", timeout=0.2, size=0
+        )
+    assert not metrics.get_metrics().enabled
+
+
+def test_baseline_comparison(tmp_path):
+    """
+    Test JSON baselines round-trip and regressions beyond the tolerance are reported.
+
+    Test Overview:
+    --------------
+    a) A result compared with itself has no regressions.
+    b) A 50% throughput drop and a tripled p99 latency are both reported with a 20% tolerance.
+    """
+    result = {"msgs_per_s": 1000.0, "mb_per_s": 1.0, "latency_ms": {"p50": 1.0, "p95": 2.0, "p99": 3.0}}
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps(result))
+    baseline = json.loads(path.read_text())
+
+    assert benchmark.compare_to_baseline(result, baseline) == []
+
+    slower = copy.deepcopy(result)
+    slower["msgs_per_s"] = 500.0
+    slower["latency_ms"]["p99"] = 9.0
+    regressions = benchmark.compare_to_baseline(slower, baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("msgs_per_s")
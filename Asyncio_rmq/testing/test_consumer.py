@@ -0,0 +1,132 @@
+"""Unit test for the concurrent consumer runtime."""
+import Asyncio_rmq
+from Asyncio_rmq import consumer
+import aio_pika
+import asyncio
+import time
+import pytest
+
+
+async def _publish(channel, queue_name, bodies, key_header=None):
+    for i, body in enumerate(bodies):
+        headers = {"key": key_header(i)} if key_header else None
+        await channel.default_exchange.publish(aio_pika.Message(body=body, headers=headers), routing_key=queue_name)
+
+
+async def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ack_mode", ["unordered", "ordered"])
+async def test_concurrent_handlers_ack_after_success(ack_mode):
+    """
+    Test handlers run concurrently and every message is acked only after it succeeds.
+
+    Test Overview:
+    --------------
+    40 messages with a 50ms async handler and a pool of 20 must finish in a fraction of the 2s a serial
+    consumer would take. Every message ends up acked and nothing is left unacked on the consumer channel.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///consumer_%s" % ack_mode)
+    channel = await connection.channel()
+    await channel.declare_queue("jobs")
+    seen = []
+
+    async def handler(message):
+        await asyncio.sleep(0.05)
+        seen.append(message.body)
+
+    await _publish(channel, "jobs", [b"%d" % i for i in range(40)])
+    start = time.perf_counter()
+    worker = await consumer.consume(connection, "jobs", handler, concurrency=20, ack_mode=ack_mode, ack_batch=8)
+    await _wait_for(lambda: worker.processed == 40)
+    elapsed = time.perf_counter() - start
+    await worker.close()
+
+    assert sorted(seen) == sorted(b"%d" % i for i in range(40))
+    assert elapsed < 1.0
+    assert not worker.channel.unacked
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_handler_is_not_acked():
+    """
+    Test a failing handler's message is rejected to the dead-letter exchange instead of being acked.
+
+    Test Overview:
+    --------------
+    Sync handlers run in the thread pool; message b"bad" raises and must arrive on the dead-letter queue.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///consumer_fail")
+    channel = await connection.channel()
+    dlx = await channel.declare_exchange("jobs.dlx")
+    dead = await channel.declare_queue("jobs.dead")
+    await dead.bind(dlx, "jobs")
+    await channel.declare_queue("jobs", arguments={"x-dead-letter-exchange": "jobs.dlx"})
+
+    def handler(message):
+        if message.body == b"bad":
+            raise ValueError("cannot process")
+
+    await _publish(channel, "jobs", [b"good", b"bad", b"good"])
+    worker = await consumer.consume(connection, "jobs", handler, concurrency=2)
+    await _wait_for(lambda: worker.processed + worker.failed == 3)
+    await worker.close()
+
+    assert (worker.processed, worker.failed) == (2, 1)
+    assert (await dead.get(timeout=1)).body == b"bad"
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_per_key_ordering_and_batched_acks():
+    """
+    Test per-key ordering and batched multiple-acks in ordered mode.
+
+    Test Overview:
+    --------------
+    Handlers sleep for a random-looking time so messages would finish out of order. Messages sharing a key
+    must still be handled in delivery order, and the acks must be batched (fewer ack calls than messages).
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///consumer_keys")
+    channel = await connection.channel()
+    await channel.declare_queue("jobs")
+    handled = {}
+
+    async def handler(message):
+        await asyncio.sleep(0.001 * ((int(message.body) * 7) % 5))
+        handled.setdefault(message.headers["key"], []).append(int(message.body))
+
+    await _publish(channel, "jobs", [b"%d" % i for i in range(60)], key_header=lambda i: "k%d" % (i % 3))
+    worker = await consumer.consume(
+        connection,
+        "jobs",
+        handler,
+        concurrency=8,
+        ack_mode="ordered",
+        ack_batch=10,
+        ordering_key=lambda message: message.headers["key"],
+    )
+    # Spy on the broker channel to count ack frames.
+    acks = []
+    settle = worker.channel.settle
+
+    def spy_settle(delivery_tag, multiple, requeue=None):
+        acks.append(multiple)
+        settle(delivery_tag, multiple, requeue)
+
+    worker.channel.settle = spy_settle
+    await _wait_for(lambda: worker.processed == 60)
+    await worker.close()
+
+    for key, bodies in handled.items():
+        assert bodies == sorted(bodies)
+    assert sum(len(bodies) for bodies in handled.values()) == 60
+    assert 0 < len(acks) < 60 and all(acks)
+    assert not worker.channel.unacked
+    await connection.close()
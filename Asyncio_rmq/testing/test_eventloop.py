@@ -0,0 +1,81 @@
+"""Unit test for event loop selection."""
+import Asyncio_rmq
+from Asyncio_rmq import benchmark
+from Asyncio_rmq import eventloop
+import asyncio
+import pytest
+
+needs_uvloop = pytest.mark.skipif(eventloop.uvloop is None, reason="uvloop is not installed")
+
+
+async def _loop_module():
+    return type(asyncio.get_running_loop()).__module__
+
+
+def test_run_on_default_loop():
+    """
+    Test run() uses the default asyncio loop when asked to, and rejects unknown loops.
+
+    Test Overview:
+    --------------
+    The coroutine reports the class of the running loop; it must come from asyncio.
+    """
+    assert eventloop.run(_loop_module(), "asyncio").startswith("asyncio")
+    with pytest.raises(ValueError):
+        eventloop.loop_name("tokio")
+
+
+@needs_uvloop
+def test_run_on_uvloop():
+    """
+    Test run() selects uvloop explicitly and for "auto" when it is installed.
+
+    Test Overview:
+    --------------
+    The running loop must come from uvloop in both cases, and the default policy must be left untouched.
+    """
+    assert eventloop.run(_loop_module(), "uvloop").startswith("uvloop")
+    assert eventloop.loop_name("auto") == "uvloop"
+    assert eventloop.run(_loop_module()).startswith("uvloop")
+    loop = asyncio.new_event_loop()
+    assert not type(loop).__module__.startswith("uvloop")
+    loop.close()
+
+
+def test_loop_argument_is_deprecated():
+    """
+    Test createConnection works without a loop and warns when one is still passed.
+
+    Test Overview:
+    --------------
+    Both calls run under run(); the explicit-loop call must raise a DeprecationWarning but still connect.
+    """
+
+    async def connect(loop):
+        [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(
+            ["LoopQueue"], ["LoopQueue"], loop, url="memory:///loops"
+        )
+        await Asyncio_rmq.closeConnection(connection)
+        return [q.name for q in queue]
+
+    assert eventloop.run(connect(None), "asyncio") == ["LoopQueue"]
+
+    async def connect_with_loop():
+        return await connect(asyncio.get_running_loop())
+
+    with pytest.warns(DeprecationWarning):
+        assert eventloop.run(connect_with_loop(), "asyncio") == ["LoopQueue"]
+
+
+def test_loop_benchmark():
+    """
+    Test the loop comparison benchmark reports one result per available loop.
+
+    Test Overview:
+    --------------
+    A short run records which loop produced each result.
+    """
+    results = benchmark.loop_benchmark(count=200, concurrency=2, url="memory:///loop_bench")
+    expected = ["asyncio"] + (["uvloop"] if eventloop.uvloop is not None else [])
+    assert [r["loop"] for r in results] == expected
+    assert all(r["msgs_per_s"] > 0 for r in results)
@@ -0,0 +1,240 @@
+"""Unit test for credit-based flow control and queue-depth throttling."""
+import Asyncio_rmq
+from Asyncio_rmq import asyncio_rmq
+from Asyncio_rmq import consumer
+from Asyncio_rmq import flowcontrol
+import aio_pika
+import asyncio
+import time
+import pytest
+
+
+async def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_credit_window():
+    """
+    Test the credit window suspends acquire while full and wakes it on release.
+
+    Test Overview:
+    --------------
+    A window of 2 admits two acquires; the third waits until a slot is released, and times out if none is.
+    Surplus credit never drives the in-flight count below zero.
+    """
+    window = flowcontrol.CreditWindow(2)
+    await window.acquire()
+    await window.acquire()
+    assert window.full
+
+    with pytest.raises(asyncio.TimeoutError):
+        await window.acquire(timeout=0.01)
+
+    waiter = asyncio.ensure_future(window.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    window.release()
+    await asyncio.wait_for(waiter, 1)
+    assert window.in_flight == 2
+
+    window.release(10)
+    assert window.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_publisher_bounded_by_slow_consumer():
+    """
+    Test a flow-controlled publisher never has more than `window` messages outstanding.
+
+    Test Overview:
+    --------------
+    200 messages are published to a consumer taking 1ms per message with a window of 16. The queue depth
+    plus the consumer's in-flight messages must stay within the window, and every message must arrive.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///flow_window")
+    channel = await connection.channel()
+    await channel.declare_queue("work")
+    granter = flowcontrol.CreditGranter(channel, batch=4, interval=0.01)
+    seen = []
+
+    async def handler(message):
+        await asyncio.sleep(0.001)
+        seen.append(int(message.body))
+
+    worker = await consumer.consume(connection, "work", handler, concurrency=4, credit=granter)
+    outstanding = []
+
+    async with flowcontrol.FlowControlledPublisher(channel, "work", window=16) as publisher:
+        for i in range(200):
+            await publisher.publish(aio_pika.Message(body=b"%d" % i))
+            outstanding.append(publisher.window.in_flight)
+            assert outstanding[-1] <= 16
+        await _wait_for(lambda: len(seen) == 200)
+        await _wait_for(lambda: publisher.window.in_flight == 0)
+
+    await worker.close()
+    await granter.close()
+    assert sorted(seen) == list(range(200))
+    assert max(outstanding) == 16
+    assert granter.granted == 200
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_requeued_message_returns_credit_once():
+    """
+    Test a requeued message only returns its credit when it is finally settled.
+
+    Test Overview:
+    --------------
+    The handler fails the first delivery of every message and the consumer requeues it (requeue_on_error).
+    Each message is granted credit once, after its redelivery succeeds, so the messages published but not yet
+    handled never exceed the window of 8. Closing the granter cancels its scheduled flush.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///flow_requeue")
+    channel = await connection.channel()
+    await channel.declare_queue("work")
+    granter = flowcontrol.CreditGranter(channel, batch=1, interval=0.01)
+    handled = []
+
+    async def handler(message):
+        if not message.redelivered:
+            raise RuntimeError("first delivery fails")
+        handled.append(int(message.body))
+
+    worker = await consumer.consume(connection, "work", handler, concurrency=4, requeue_on_error=True, credit=granter)
+    outstanding = []
+
+    async with flowcontrol.FlowControlledPublisher(channel, "work", window=8) as publisher:
+        for i in range(100):
+            await publisher.publish(aio_pika.Message(body=b"%d" % i))
+            outstanding.append(publisher.published - len(handled))
+            assert outstanding[-1] <= 8
+        await _wait_for(lambda: len(handled) == 100)
+        await _wait_for(lambda: publisher.window.in_flight == 0)
+
+    await worker.close()
+    await granter.close()
+    assert sorted(handled) == list(range(100))
+    assert worker.failed == 100
+    assert granter.granted == 100
+    assert not granter._flush_tasks and granter._flush_handle is None
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_talk_listen_with_flow_control():
+    """
+    Test TalkRole and ListenRole exchange messages through a credit window.
+
+    Test Overview:
+    --------------
+    Each node publishes through a window of one message, so a node can only talk again once the other side
+    has consumed its previous message and returned the credit.
+    """
+    Queue = ["FlowQueue1", "FlowQueue2"]
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(Queue, Queue, url="memory:///flow_talk")
+    talk = await flowcontrol.FlowControlledPublisher(channel, Queue[0], window=1, credit_timeout=5).start()
+    listen = await flowcontrol.FlowControlledPublisher(channel, Queue[1], window=1, credit_timeout=5).start()
+    credit = flowcontrol.CreditGranter(channel, batch=1)
+
+    TalkMsg = ["Hello?", "Still there?"]
+    ReplyMsg = ["Hello!", "Yes."]
+    for idx in range(len(TalkMsg)):
+        res = await asyncio.gather(
+            asyncio_rmq.TalkRole(connection, channel, queue, Queue, TalkMsg, idx, 0, flow=talk, credit=credit),
+            asyncio_rmq.ListenRole(connection, channel, queue, Queue, ReplyMsg, idx, 0, flow=listen, credit=credit),
+        )
+        assert [msg for msg in res[0] if msg is not None] == [TalkMsg[idx], ReplyMsg[idx]]
+        assert [msg for msg in res[1] if msg is not None] == [TalkMsg[idx], ReplyMsg[idx]]
+
+    await _wait_for(lambda: talk.window.in_flight == 0 and listen.window.in_flight == 0)
+    await credit.close()
+    await talk.close()
+    await listen.close()
+    await Asyncio_rmq.closeConnection(connection)
+
+
+@pytest.mark.asyncio
+async def test_depth_throttle():
+    """
+    Test the queue-depth throttle suspends publishing above the high watermark until the low watermark.
+
+    Test Overview:
+    --------------
+    Without a consumer, publishing stops once 20 messages are queued. After draining the queue down to 10
+    messages with basic.get, publishing resumes and completes.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///flow_depth")
+    channel = await connection.channel()
+    queue = await channel.declare_queue("deep")
+    throttle = flowcontrol.DepthThrottle(channel, "deep", high_watermark=20, low_watermark=10, poll_interval=0)
+    publisher = await flowcontrol.FlowControlledPublisher(channel, "deep", window=1000, throttle=throttle).start()
+
+    async def publish_all():
+        for i in range(30):
+            await publisher.publish(aio_pika.Message(body=b"%d" % i))
+
+    task = asyncio.ensure_future(publish_all())
+    await _wait_for(lambda: throttle.throttled_count == 1)
+    await asyncio.sleep(0.02)
+    assert not task.done()
+    assert publisher.published == 20
+
+    for _ in range(10):
+        await (await queue.get(timeout=1)).ack()
+    await asyncio.wait_for(task, 5)
+    assert publisher.published == 30
+
+    await publisher.close()
+    await connection.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("poll_interval", [0, 0.005])
+async def test_depth_throttle_concurrent_publishers(poll_interval):
+    """
+    Test the queue-depth throttle holds back every concurrent publisher, not only the one that sampled.
+
+    Test Overview:
+    --------------
+    8 tasks publish 50 messages each through one publisher and throttle (high watermark 20) while a slow
+    consumer drains the queue with basic.get. The depth seen after every publish must stay within the high
+    watermark plus the number of publishers, and every message must be published.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///flow_depth_concurrent")
+    channel = await connection.channel()
+    queue = await channel.declare_queue("deep")
+    state = Asyncio_rmq.memory_broker.get_broker("memory:///flow_depth_concurrent").queues["deep"]
+    throttle = flowcontrol.DepthThrottle(
+        channel, "deep", high_watermark=20, low_watermark=10, poll_interval=poll_interval
+    )
+    publisher = await flowcontrol.FlowControlledPublisher(channel, "deep", window=1000, throttle=throttle).start()
+    depths = []
+
+    async def publish_all(n):
+        for i in range(n):
+            await publisher.publish(aio_pika.Message(body=b"%d" % i))
+            depths.append(len(state.ready))
+
+    async def drain(n):
+        while n:
+            message = await queue.get(fail=False)
+            if message is None:
+                await asyncio.sleep(0.001)
+                continue
+            await message.ack()
+            n -= 1
+            await asyncio.sleep(0.0005)
+
+    await asyncio.wait_for(asyncio.gather(drain(400), *[publish_all(50) for _ in range(8)]), 30)
+
+    assert publisher.published == 400
+    assert max(depths) <= 20 + 8
+    assert throttle.throttled_count >= 1
+    await publisher.close()
+    await connection.close()
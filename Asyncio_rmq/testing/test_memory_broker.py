@@ -0,0 +1,146 @@
+"""Unit test for the in-memory stand-in broker."""
+import Asyncio_rmq
+import aio_pika
+import asyncio
+import time
+import pytest
+
+
+async def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_talk_listen_on_memory_broker():
+    """
+    Test the Talker and Listener exchange against the in-memory broker.
+
+    Test Overview:
+    --------------
+    This is the same four message dialogue as test_asyncio_rmq, but using a "memory://" URL so no RabbitMQ
+    broker is needed. Like basic.get on RabbitMQ, a poll of an empty queue returns None at once; those empty
+    polls are left out of the comparison.
+    """
+    Queue = ["Queue1", "Queue2"]
+    routing_key = Queue
+    TalkMsg = ["Hello?", "Nice! There is life out there!", "I like Easter Eggs!", "I like 77, 6F, 6E and 21!"]
+    ReplyMsg = ["Hello! It's good to hear from you!", "What do you like?", "Which are your favourite?", "Fantastic!"]
+
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(
+        Queue, routing_key, url="memory:///talk_listen"
+    )
+
+    for idx in range(len(TalkMsg)):
+        task_return = await asyncio.gather(
+            Asyncio_rmq.TalkRole(connection, channel, queue, routing_key, TalkMsg, idx, 0),
+            Asyncio_rmq.ListenRole(connection, channel, queue, routing_key, ReplyMsg, idx, 0),
+        )
+        assert [msg for msg in task_return[0] if msg is not None] == [TalkMsg[idx], ReplyMsg[idx]]
+        assert [msg for msg in task_return[1] if msg is not None] == [TalkMsg[idx], ReplyMsg[idx]]
+
+    await Asyncio_rmq.closeConnection(connection)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_redelivery_and_dead_lettering():
+    """
+    Test the broker semantics the rest of the package relies on.
+
+    Test Overview:
+    --------------
+    a) A consumer never holds more than `prefetch_count` unacknowledged messages.
+    b) Closing a channel requeues its unacknowledged messages, flagged as redelivered.
+    c) Rejected and expired messages are dead-lettered with an x-death header.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///semantics")
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=2)
+    queue = await channel.declare_queue("work")
+
+    received = []
+
+    async def on_message(message):
+        received.append(message)
+
+    for i in range(5):
+        await channel.default_exchange.publish(aio_pika.Message(body=b"%d" % i), routing_key="work")
+    await queue.consume(on_message)
+    await asyncio.sleep(0.01)
+    assert [m.body for m in received] == [b"0", b"1"]
+
+    await received[0].ack()
+    await asyncio.sleep(0.01)
+    assert [m.body for m in received] == [b"0", b"1", b"2"]
+
+    await channel.close()
+    other = await connection.channel()
+    redelivered = await (await other.declare_queue("work")).get(timeout=1)
+    assert redelivered.body == b"3"
+    assert (await (await other.declare_queue("work")).get(timeout=1)).body == b"4"
+    late = await (await other.declare_queue("work")).get(timeout=1)
+    assert late.body in (b"1", b"2") and late.redelivered
+
+    dlx = await other.declare_exchange("dlx", aio_pika.ExchangeType.DIRECT)
+    dead = await other.declare_queue("dead")
+    await dead.bind(dlx, "work-ttl")
+    short = await other.declare_queue("work-ttl", arguments={"x-message-ttl": 10, "x-dead-letter-exchange": "dlx"})
+    await other.default_exchange.publish(aio_pika.Message(body=b"expires"), routing_key="work-ttl")
+    await _wait_for(lambda: dead.declaration_result.message_count)
+    expired = await dead.get(timeout=1)
+    assert expired.body == b"expires"
+    assert expired.headers["x-death"][0]["reason"] == "expired"
+
+    await other.default_exchange.publish(aio_pika.Message(body=b"rejected"), routing_key="work-ttl")
+    await (await short.get(timeout=1)).reject(requeue=False)
+    assert (await dead.get(timeout=1)).headers["x-death"][0]["reason"] == "rejected"
+
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_get_on_empty_queue_does_not_wait():
+    """
+    Test get on an empty queue answers at once, like basic.get.
+
+    Test Overview:
+    --------------
+    `timeout` is only the RPC timeout: an empty queue raises QueueEmpty (or returns None with fail=False)
+    without waiting for it, and a message published afterwards is returned by the next get.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///empty_get")
+    channel = await connection.channel()
+    queue = await channel.declare_queue("empty")
+
+    start = time.monotonic()
+    with pytest.raises(aio_pika.exceptions.QueueEmpty):
+        await queue.get(timeout=5)
+    assert await queue.get(fail=False, timeout=5) is None
+    assert time.monotonic() - start < 1
+
+    await channel.default_exchange.publish(aio_pika.Message(body=b"later"), routing_key="empty")
+    assert (await queue.get(fail=False)).body == b"later"
+
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_redeclare_with_other_flags_fails():
+    """
+    Test redeclaring a queue with different flags fails like on RabbitMQ (406 PRECONDITION_FAILED).
+
+    Test Overview:
+    --------------
+    A queue declared auto-delete can be declared again with the same flags or passively, but not as a
+    regular queue.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///redeclare")
+    channel = await connection.channel()
+    await channel.declare_queue("flags", auto_delete=True)
+    await channel.declare_queue("flags", auto_delete=True)
+    await channel.declare_queue("flags", passive=True)
+    with pytest.raises(aio_pika.exceptions.ChannelPreconditionFailed):
+        await channel.declare_queue("flags")
+    await connection.close()
@@ -0,0 +1,88 @@
+"""Unit test for Asyncio RabbitMQ metrics."""
+import Asyncio_rmq
+from Asyncio_rmq import metrics
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.enable_metrics()
+    registry.reset()
+    yield registry
+    metrics.enable_metrics(False)
+    registry.reset()
+
+
+@pytest.mark.asyncio
+async def test_talk_listen_metrics(registry):
+    """
+    Test the talk/listen exchange is counted and timed.
+
+    Test Overview:
+    --------------
+    Two rounds of the talk/listen dialogue run against the in-memory broker with metrics enabled.
+    The test will look for the following:
+    a) Published, consumed and acked counts per queue.
+    b) A publish-to-consume latency observation for every consumed message.
+    c) Sampled queue depth and a Prometheus text export containing all of the above.
+    """
+    Queue = ["Queue1", "Queue2"]
+    TalkMsg = ["Hello?", "I like Easter Eggs!"]
+    ReplyMsg = ["Hello! It's good to hear from you!", "Fantastic!"]
+
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(Queue, Queue, url="memory:///metrics")
+    for idx in range(len(TalkMsg)):
+        await asyncio.gather(
+            Asyncio_rmq.TalkRole(connection, channel, queue, Queue, TalkMsg, idx, 0),
+            Asyncio_rmq.ListenRole(connection, channel, queue, Queue, ReplyMsg, idx, 0),
+        )
+    assert await registry.sample_queue_depth(channel, "Queue1") == 0
+    await Asyncio_rmq.closeConnection(connection)
+
+    snapshot = registry.snapshot()
+    for name in ("published", "consumed", "acked"):
+        assert snapshot["counters"][name] == {"Queue1": 2, "Queue2": 2}
+    assert snapshot["histograms"]["publish_to_consume_seconds"]["Queue1"]["count"] == 2
+
+    text = registry.prometheus_text()
+    assert 'rmq_messages_published_total{queue="Queue1"} 2' in text
+    assert 'rmq_publish_to_consume_seconds_bucket{queue="Queue2",le="+Inf"} 2' in text
+    assert 'rmq_queue_depth{queue="Queue1"} 0' in text
+
+
+def test_disabled_metrics_record_nothing():
+    """Test instrumented calls are no-ops while metrics are disabled."""
+    registry = metrics.Metrics(enabled=False)
+    registry.record_publish("Queue1")
+    registry.record_ack("Queue1")
+    with registry.time_handler("Queue1"):
+        pass
+    assert registry.stamp({}) == {}
+    assert registry.snapshot()["counters"]["published"] == {}
+    assert registry.snapshot()["histograms"]["handler_seconds"] == {}
+
+
+def test_prometheus_label_escaping():
+    """Test backslash, double quote and line feed in queue names are escaped in the Prometheus export."""
+    registry = metrics.Metrics()
+    registry.record_publish('odd\\queue "name"\nnext')
+    registry.observe("handler_seconds", 'a"b', 0.001)
+    registry.queue_depth["c\\d"] = 3
+
+    text = registry.prometheus_text()
+    assert 'rmq_messages_published_total{queue="odd\\\\queue \\"name\\"\\nnext"} 1' in text
+    assert 'rmq_handler_seconds_count{queue="a\\"b"} 1' in text
+    assert 'rmq_queue_depth{queue="c\\\\d"} 3' in text
+    assert all(line.startswith(("#", "rmq_")) for line in text.splitlines())
+
+
+def test_histogram_quantiles():
+    """Test histogram bucketing and quantile estimates."""
+    histogram = metrics.Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 0.5, 1.5, 4, 100):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.quantile(0.4) == 1
+    assert histogram.quantile(0.6) == 2
+    assert histogram.quantile(1.0) == float("inf")
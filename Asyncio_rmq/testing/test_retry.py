@@ -0,0 +1,152 @@
+"""Unit test for delayed retries and dead-lettering."""
+import Asyncio_rmq
+from Asyncio_rmq import asyncio_rmq
+from Asyncio_rmq import consumer
+from Asyncio_rmq import metrics
+from Asyncio_rmq import retry
+import aio_pika
+import asyncio
+import time
+import pytest
+
+
+async def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+@pytest.fixture
+def registry():
+    registry = metrics.enable_metrics()
+    registry.reset()
+    yield registry
+    metrics.enable_metrics(False)
+    registry.reset()
+
+
+def test_backoff_schedule():
+    """
+    Test the exponential backoff delays and the retry queue names.
+
+    Test Overview:
+    --------------
+    Delays double from the base delay and are capped at max_delay; one retry queue is declared per attempt
+    that can still be retried, each with its delay as message TTL.
+    """
+    policy = retry.RetryPolicy("jobs", max_attempts=6, base_delay=0.5, multiplier=2, max_delay=3)
+    assert [policy.delay(a) for a in range(1, 6)] == [0.5, 1, 2, 3, 3]
+    assert policy.retry_queue(1) == "jobs.retry.500"
+
+    topo = policy.topology()
+    assert sorted(topo.queues) == [
+        "jobs.dead",
+        "jobs.retry.1000",
+        "jobs.retry.2000",
+        "jobs.retry.3000",
+        "jobs.retry.500",
+    ]
+    assert dict(topo.queues["jobs.retry.500"][3])["x-message-ttl"] == 500
+    assert ("jobs.dead", "jobs.dlx", "jobs") in topo.bindings
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_then_dead_letter(registry):
+    """
+    Test a failing message is retried with growing delays and then dead-lettered.
+
+    Test Overview:
+    --------------
+    The handler always fails for b"poison" and fails once for b"flaky". The poison message must be handled
+    exactly max_attempts (3) times with at least the backoff delay between attempts, then arrive on the dead
+    queue with its attempt count and last error. The flaky message succeeds on its second attempt. Failures
+    are counted as retried or dead-lettered (the policy acks them), not as nacked, and the retry topology is
+    declared on the consumer's own channel.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///retry_consumer")
+    channel = await connection.channel()
+    await channel.declare_queue("jobs")
+    policy = retry.RetryPolicy("jobs", max_attempts=3, base_delay=0.05, multiplier=2)
+    attempts = {}
+
+    async def handler(message):
+        attempts.setdefault(message.body, []).append(time.monotonic())
+        if message.body == b"poison" or len(attempts[message.body]) == 1:
+            raise ValueError("cannot process %r" % message.body)
+
+    worker = await consumer.consume(connection, "jobs", handler, concurrency=4, retry=policy)
+    assert connection.channels == [channel, worker.channel]
+    for body in (b"poison", b"flaky"):
+        await channel.default_exchange.publish(aio_pika.Message(body=body), routing_key="jobs")
+
+    await _wait_for(lambda: policy.dead_lettered == 1 and worker.processed == 1)
+    await worker.close()
+
+    poison = attempts[b"poison"]
+    assert len(poison) == 3
+    assert poison[1] - poison[0] >= 0.045 and poison[2] - poison[1] >= 0.095
+    assert len(attempts[b"flaky"]) == 2
+    assert policy.retried == 3
+    counters = registry.snapshot()["counters"]
+    assert (counters["retried"], counters["dead_lettered"]) == ({"jobs": 3}, {"jobs": 1})
+    assert counters["nacked"] == {}
+
+    dead = await (await channel.get_queue("jobs.dead")).get(timeout=1)
+    assert dead.body == b"poison"
+    assert dead.headers[retry.ATTEMPT_HEADER] == 3
+    assert dead.headers[retry.ERROR_HEADER].startswith("ValueError")
+    assert not worker.channel.unacked
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_exhausted_message_skips_handler():
+    """
+    Test a message that already used up its attempts is dead-lettered without running the handler.
+
+    Test Overview:
+    --------------
+    A quorum-queue style x-delivery-count of 5 (from repeated consumer crashes) exceeds max_attempts.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///retry_exhausted")
+    channel = await connection.channel()
+    await channel.declare_queue("jobs")
+    policy = retry.RetryPolicy("jobs", max_attempts=3)
+    calls = []
+
+    worker = await consumer.consume(connection, "jobs", calls.append, retry=policy)
+    headers = {retry.DELIVERY_COUNT_HEADER: 5}
+    await channel.default_exchange.publish(aio_pika.Message(body=b"crash", headers=headers), routing_key="jobs")
+    await _wait_for(lambda: policy.dead_lettered == 1)
+    await worker.close()
+
+    assert calls == []
+    assert (worker.processed, worker.failed) == (0, 1)
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_undecodable_message_is_retried():
+    """
+    Test _RMQConsume hands an undecodable message to the retry policy instead of raising.
+
+    Test Overview:
+    --------------
+    A body that claims zlib encoding but is not compressed cannot be decoded. _RMQConsume must declare the
+    retry queues, return None, ack the message and move it to the first retry queue with its attempt count.
+    """
+    Queue = ["RetryQueue"]
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection(Queue, Queue, url="memory:///retry_rmq")
+    policy = retry.RetryPolicy("RetryQueue", max_attempts=2, base_delay=10)
+
+    bad = aio_pika.Message(body=b"not zlib", content_type="text/plain", content_encoding="zlib")
+    await channel.default_exchange.publish(bad, routing_key="RetryQueue")
+    assert await asyncio_rmq._RMQConsume(connection, channel, queue[0], Queue[0], retry=policy) is None
+
+    retried = await (await channel.get_queue(policy.retry_queue(1))).get(timeout=1)
+    assert retried.body == b"not zlib"
+    assert retried.headers[retry.ATTEMPT_HEADER] == 1
+    await retried.ack()
+    assert not channel.unacked
+    await Asyncio_rmq.closeConnection(connection)
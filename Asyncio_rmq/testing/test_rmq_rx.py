@@ -0,0 +1,76 @@
+"""Unit test for the asyncio debug receiver."""
+from Asyncio_rmq import rmq_rx
+import Asyncio_rmq
+import aio_pika
+import io
+import pytest
+
+
+async def _fill(url, queue_name, count):
+    connection = await Asyncio_rmq.openConnection(url)
+    channel = await connection.channel()
+    await channel.declare_queue(queue_name)
+    for i in range(count):
+        await channel.default_exchange.publish(aio_pika.Message(body=b"msg %d" % i), routing_key=queue_name)
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_drain_mode():
+    """
+    Test drain mode consumes and acks a backlog, then stops once the queue is idle.
+
+    Test Overview:
+    --------------
+    A 5000 message backlog is drained with a prefetch window of 256 and nothing is left on the queue.
+    """
+    url = "memory:///rx_drain"
+    await _fill(url, "MsgQueue", 5000)
+
+    out = io.StringIO()
+    stats = await rmq_rx.receive(
+        "MsgQueue", url, prefetch=256, drain=True, count_only=True, out=out, flush_interval=0.01, idle_timeout=0.05
+    )
+
+    assert stats["count"] == 5000
+    assert stats["bytes"] == sum(len(b"msg %d" % i) for i in range(5000))
+    assert out.getvalue() == ""
+    assert not Asyncio_rmq.memory_broker.get_broker(url).queues["MsgQueue"].ready
+
+
+@pytest.mark.asyncio
+async def test_sampled_output():
+    """Test every Nth message is written in the original " [x] Received" format."""
+    url = "memory:///rx_sample"
+    await _fill(url, "MsgQueue", 100)
+
+    out = io.StringIO()
+    stats = await rmq_rx.receive(
+        "MsgQueue", url, prefetch=32, sample=10, out=out, flush_interval=0.01, max_messages=100
+    )
+
+    assert stats["count"] == 100
+    assert out.getvalue().splitlines() == [" [x] Received %r" % (b"msg %d" % i) for i in range(9, 100, 10)]
+
+
+@pytest.mark.asyncio
+async def test_max_messages_leaves_the_rest_queued():
+    """
+    Test a message limit only consumes (and acks) that many messages.
+
+    Test Overview:
+    --------------
+    With 300 messages queued, a prefetch window of 50 and max_messages=10, exactly the first 10 messages are
+    received and acked. The prefetched extras are nacked back, so the other 290 stay on the queue.
+    """
+    url = "memory:///rx_max"
+    await _fill(url, "MsgQueue", 300)
+
+    out = io.StringIO()
+    stats = await rmq_rx.receive("MsgQueue", url, prefetch=50, out=out, flush_interval=0.01, max_messages=10)
+
+    assert stats["count"] == 10
+    assert out.getvalue().splitlines() == [" [x] Received %r" % (b"msg %d" % i) for i in range(10)]
+    queue = Asyncio_rmq.memory_broker.get_broker(url).queues["MsgQueue"]
+    assert len(queue.ready) == 290
+    assert sorted(item[0].body for item in queue.ready) == sorted(b"msg %d" % i for i in range(10, 300))
@@ -0,0 +1,68 @@
+"""Unit test for Asyncio RabbitMQ RPC."""
+import Asyncio_rmq
+import asyncio
+import pytest
+
+
+async def _echo_upper(body):
+    # Reply out of order: shorter requests are answered first.
+    await asyncio.sleep(0.001 * len(body))
+    return body.upper()
+
+
+async def _fail(body):
+    raise ValueError("bad request")
+
+
+@pytest.mark.asyncio
+async def test_rpc_pipelined_requests():
+    """
+    Test pipelined RPC requests on a single connection.
+
+    Test Overview:
+    --------------
+    Many requests are sent concurrently from one client. The server answers them out of order, so the
+    correlation ID is the only thing pairing a reply with its request.
+    This runs against the in-memory stand-in broker.
+
+    Parameters
+    ----------
+    requests: List[bytes]
+        Request bodies, each expected back in upper case.
+    """
+    requests = [("message %d " % i).encode() * (20 - i) for i in range(20)]
+
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection([], [], url="memory://")
+
+    async with Asyncio_rmq.RPCServer(channel, "rpc_test_queue", _echo_upper):
+        async with Asyncio_rmq.RPCClient(channel, "rpc_test_queue", timeout=5) as client:
+            replies = await asyncio.gather(*[client.call(body) for body in requests])
+            assert client.pending == 0
+
+    assert replies == [body.upper() for body in requests]
+    await Asyncio_rmq.closeConnection(connection)
+
+
+@pytest.mark.asyncio
+async def test_rpc_errors_and_timeouts():
+    """
+    Test RPC handler errors and timeouts.
+
+    Test Overview:
+    --------------
+    A failing handler must surface as RPCError on the client, and a request to a queue nobody serves must
+    raise asyncio.TimeoutError without leaving a pending future behind.
+    This runs against the in-memory stand-in broker.
+    """
+    [connection, channel, exchange, queue] = await Asyncio_rmq.createConnection([], [], url="memory://")
+
+    async with Asyncio_rmq.RPCServer(channel, "rpc_fail_queue", _fail):
+        async with Asyncio_rmq.RPCClient(channel, "rpc_fail_queue", timeout=5) as client:
+            with pytest.raises(Asyncio_rmq.RPCError):
+                await client.call(b"anything")
+
+            with pytest.raises(asyncio.TimeoutError):
+                await client.call(b"anything", routing_key="rpc_nobody_home", timeout=0.2)
+            assert client.pending == 0
+
+    await Asyncio_rmq.closeConnection(connection)
@@ -0,0 +1,78 @@
+"""Unit test for Asyncio RabbitMQ message serialization."""
+from Asyncio_rmq import serializers
+from Asyncio_rmq import benchmark
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "auto"])
+@pytest.mark.parametrize(
+    "payload",
+    [
+        "I like 77, 6F, 6E and 21!",
+        b"\x00\x01binary\xff",
+        {"frame": 3, "samples": [1.5, -2.0]},
+        np.arange(24, dtype=np.complex64).reshape(4, 6),
+        np.zeros((512, 256), dtype=np.float64),
+        np.array(2.5),
+    ],
+)
+def test_serializer_round_trip(payload, compression):
+    """
+    Test every serializer round-trips its payload, with and without compression.
+
+    Test Overview:
+    --------------
+    The payload is turned into an aio_pika.Message and decoded again using only the message properties.
+    Arrays keep their dtype and shape, including 0-d arrays.
+    """
+    if isinstance(payload, dict):
+        pytest.importorskip("msgpack")
+
+    message = serializers.make_message(payload, compression=compression, compress_threshold=1024)
+    decoded = serializers.decode_message(message)
+
+    if isinstance(payload, np.ndarray):
+        assert decoded.dtype == payload.dtype
+        assert decoded.shape == payload.shape
+        np.testing.assert_array_equal(decoded, payload)
+    else:
+        assert decoded == payload
+
+
+def test_numpy_zero_copy_and_auto_compression():
+    """
+    Test the numpy serializer avoids copies and "auto" only compresses when it pays.
+
+    Test Overview:
+    --------------
+    a) Encoding a contiguous array returns a view on the array and decoding returns a view on the body.
+    b) A noisy frame is left uncompressed by "auto", while a zero frame above the threshold is compressed.
+    c) Frames below the threshold are never compressed.
+    """
+    frame = np.random.default_rng(1).normal(0, 0.4, 65536)
+
+    body, properties = serializers.encode(frame)
+    assert isinstance(body, memoryview)
+    assert np.shares_memory(np.asarray(body), frame)
+    assert np.shares_memory(serializers.decode(body, **properties), frame)
+
+    _, properties = serializers.encode(frame, compression="auto")
+    assert "content_encoding" not in properties
+
+    body, properties = serializers.encode(np.zeros_like(frame), compression="auto")
+    assert properties["content_encoding"] in ("zlib", "lz4")
+    assert len(body) < frame.nbytes / 10
+
+    _, properties = serializers.encode(np.zeros(16), compression="auto")
+    assert "content_encoding" not in properties
+
+
+def test_serializer_benchmark():
+    """Test the serializer benchmark reports a cost per MB for every case."""
+    results = benchmark.serializer_benchmark(sizes_mb=[0.0625], repeat=1)
+
+    assert {"numpy-noise", "numpy-zeros", "raw-noise"} <= {r["payload"] for r in results}
+    for r in results:
+        assert r["encode_ms_per_mb"] > 0
+        assert r["decode_ms_per_mb"] > 0
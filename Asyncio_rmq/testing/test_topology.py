@@ -0,0 +1,209 @@
+"""Unit test for the declarative topology registry."""
+import Asyncio_rmq
+from Asyncio_rmq import memory_broker
+from Asyncio_rmq import topology
+import aio_pika
+import asyncio
+import time
+import pytest
+
+
+def _spy(channel, delay=0):
+    """Count (and optionally slow down) declarations made on a channel."""
+    calls = []
+    declare_exchange, declare_queue = channel.declare_exchange, channel.declare_queue
+
+    async def spy_exchange(name, *args, **kwargs):
+        calls.append(("exchange", name))
+        await asyncio.sleep(delay)
+        return await declare_exchange(name, *args, **kwargs)
+
+    async def spy_queue(name=None, *args, **kwargs):
+        calls.append(("queue", name))
+        await asyncio.sleep(delay)
+        return await declare_queue(name, *args, **kwargs)
+
+    channel.declare_exchange, channel.declare_queue = spy_exchange, spy_queue
+    return calls
+
+
+def _topology(n_queues, ttl=None):
+    topo = topology.Topology().add_exchange("events", "direct")
+    for i in range(n_queues):
+        name = "events.%d" % i
+        topo.add_queue(name, arguments={"x-message-ttl": ttl} if ttl else None).add_binding(name, "events", name)
+    return topo
+
+
+@pytest.mark.asyncio
+async def test_declarations_are_concurrent_and_cached():
+    """
+    Test declarations are sent concurrently and skipped once the connection has made them.
+
+    Test Overview:
+    --------------
+    With each declaration taking 50ms, 1 exchange and 8 queues must take far less than the 450ms a sequential
+    declaration would. Declaring again (on another channel of the same connection) sends nothing, and
+    changing one queue's arguments sends only that queue.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///topology_cache")
+    channel = await connection.channel()
+    calls = _spy(channel, delay=0.05)
+
+    start = time.perf_counter()
+    [_, exchanges, queues] = await _topology(8).declare(connection, channel)
+    assert time.perf_counter() - start < 0.2
+    assert len(calls) == 9
+    assert sorted(queues) == ["events.%d" % i for i in range(8)]
+
+    other = await connection.channel()
+    other_calls = _spy(other)
+    [_, exchanges, queues] = await _topology(8).declare(connection, other)
+    assert other_calls == []
+
+    # The cached objects still route messages.
+    await exchanges["events"].publish(aio_pika.Message(body=b"hello"), routing_key="events.3")
+    assert (await queues["events.3"].get(timeout=1)).body == b"hello"
+
+    topo = _topology(8)
+    topo.add_queue("events.0", arguments={"x-message-ttl": 1000})
+    await topo.declare(connection, other)
+    assert other_calls == [("queue", "events.0")]
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_replay_on_reconnect():
+    """
+    Test the declared topology is replayed when the connection reconnects.
+
+    Test Overview:
+    --------------
+    The broker loses a queue (as after a broker restart) and the connection reconnects. The registry must
+    re-declare the queue and its binding so publishing through the exchange reaches it again.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///topology_reconnect")
+    await _topology(2).declare(connection)
+    connection.broker.delete_queue("events.1")
+
+    await connection.reconnect()
+    state = topology._connections[connection]
+    deadline = time.monotonic() + 5
+    while state.replays == 0:
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+    channel = await connection.channel()
+    exchange = await channel.get_exchange("events")
+    await exchange.publish(aio_pika.Message(body=b"again"), routing_key="events.1")
+    queue = await channel.get_queue("events.1")
+    assert (await queue.get(timeout=1)).body == b"again"
+    await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_auto_delete_entities_are_not_cached():
+    """
+    Test auto-delete entities are declared again instead of being taken from the cache.
+
+    Test Overview:
+    --------------
+    createConnection declares an auto-delete exchange and queues, which the broker drops once they are unused.
+    A second createConnection on the same connection must declare them again, so a queue deleted in between
+    is recreated and its binding works.
+    """
+    Queue = ["TopoQueue1", "TopoQueue2"]
+    [connection, channel, exchange, queueList] = await Asyncio_rmq.createConnection(
+        Queue, Queue, url="memory:///topology_create"
+    )
+    assert [q.name for q in queueList] == Queue
+    state = topology._connections[connection]
+    assert (state.exchanges, state.queues, state.bindings) == ({}, {}, {})
+    connection.broker.delete_queue("TopoQueue2")
+
+    original = connection.channel
+
+    async def spied_channel(*args, **kwargs):
+        spied = await original(*args, **kwargs)
+        calls.append(_spy(spied))
+        return spied
+
+    calls = []
+    connection.channel = spied_channel
+    [_, channel2, exchange2, queueList2] = await Asyncio_rmq.createConnection(Queue, Queue, connection=connection)
+    assert sorted(calls[0]) == [("exchange", "direct"), ("queue", "TopoQueue1"), ("queue", "TopoQueue2")]
+
+    await exchange2.publish(aio_pika.Message(body=b"x"), routing_key="TopoQueue2")
+    assert (await queueList2[1].get(timeout=1)).body == b"x"
+    await Asyncio_rmq.closeConnection(connection)
+
+
+@pytest.mark.asyncio
+async def test_replay_after_declaring_channel_closed():
+    """
+    Test a reconnect replays the topology even when the channel it was declared on has been closed.
+
+    Test Overview:
+    --------------
+    The declaring channel is closed by its owner before the reconnect. The registry must open a new channel
+    for the replay instead of using the closed one.
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///topology_closed_channel")
+    channel = await connection.channel()
+    await _topology(1).declare(connection, channel)
+    await channel.close()
+    connection.broker.delete_queue("events.0")
+
+    await connection.reconnect()
+    state = topology._connections[connection]
+    deadline = time.monotonic() + 5
+    while state.replays == 0:
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+    assert state.channel is not channel and not state.channel.is_closed
+
+    other = await connection.channel()
+    await (await other.get_exchange("events")).publish(aio_pika.Message(body=b"again"), routing_key="events.0")
+    assert (await (await other.get_queue("events.0")).get(timeout=1)).body == b"again"
+    await connection.close()
+
+
+class _RobustChannel(memory_broker.MemoryChannel):
+    """In-memory channel that passes for an aio_pika robust channel."""
+
+
+aio_pika.abc.AbstractRobustChannel.register(_RobustChannel)
+
+
+@pytest.mark.asyncio
+async def test_only_persistent_entities_opt_out_of_robust():
+    """
+    Test only the entities the registry replays itself are declared with robust=False.
+
+    Test Overview:
+    --------------
+    On a robust channel the durable exchange and queue are declared with robust=False, while the auto-delete
+    and exclusive queues keep aio_pika's robust restore (and with it their consumers).
+    """
+    connection = await Asyncio_rmq.openConnection("memory:///topology_robust")
+    channel = _RobustChannel(connection)
+    connection.channels.append(channel)
+    robust = {}
+    declare_exchange, declare_queue = channel.declare_exchange, channel.declare_queue
+
+    async def spy_exchange(name, *args, **kwargs):
+        robust[name] = kwargs.get("robust", True)
+        return await declare_exchange(name, *args, **kwargs)
+
+    async def spy_queue(name=None, *args, **kwargs):
+        robust[name] = kwargs.get("robust", True)
+        return await declare_queue(name, *args, **kwargs)
+
+    channel.declare_exchange, channel.declare_queue = spy_exchange, spy_queue
+    topo = topology.Topology().add_exchange("jobs", durable=True).add_queue("work", durable=True)
+    topo.add_queue("replies", auto_delete=True).add_queue("private", exclusive=True)
+    await topo.declare(connection, channel)
+
+    assert robust == {"jobs": False, "work": False, "replies": True, "private": True}
+    assert sorted(topology._connections[connection].queues) == ["work"]
+    await connection.close()
@@ -1,5 +1,46 @@
 """Import the following modules for the Lucas number generator package."""
 from .lucas import lucas_number_generator
 from .lucas import golden_ratio_calc
+from .lucas import lucas
+from .lucas import lucas_pair
+from .bulk import lucas_array
+from .bulk import lucas_bulk
+from .bulk import golden_ratios
+from .cache import LucasCache
+from .cache import get_cache
+from .cache import lucas_range
+from .generalised import lucas_sequence
+from .generalised import lucas_sequence_batch
+from .generalised import is_strong_lucas_prp
+from .generalised import strong_lucas_prp_batch
+from .convergence import golden_ratio
+from .convergence import convergent
+from .convergence import convergents
+from .convergence import ratio_error
+from .convergence import first_index_for_precision
+from .sharded import ShardedSequence
+from .sharded import sharded_terms
 
-__all__ = ["lucas_number_generator", "golden_ratio_calc"]
+__all__ = [
+    "lucas_number_generator",
+    "golden_ratio_calc",
+    "lucas",
+    "lucas_pair",
+    "lucas_array",
+    "lucas_bulk",
+    "golden_ratios",
+    "LucasCache",
+    "get_cache",
+    "lucas_range",
+    "lucas_sequence",
+    "lucas_sequence_batch",
+    "is_strong_lucas_prp",
+    "strong_lucas_prp_batch",
+    "golden_ratio",
+    "convergent",
+    "convergents",
+    "ratio_error",
+    "first_index_for_precision",
+    "ShardedSequence",
+    "sharded_terms",
+]
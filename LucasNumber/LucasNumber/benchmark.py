@@ -0,0 +1,601 @@
+"""
+Benchmarks for the Lucas number package.
+
+Parameters
+----------
+benchmark: string
+    Benchmark to run.
+    Option 1: "random-access" (time to reach L(n) with the generator and with lucas(n))
+    Option 2: "bulk" (time per term of the generator vs lucas_bulk, lucas_array and lucas_array with mod)
+    Option 3: "cache" (overlapping range queries recomputed from the seed vs served by LucasCache)
+    Option 4: "prp" (strong Lucas probable-prime candidates per second, one at a time vs batched)
+    Option 5: "sharded" (terms/s overall and per core of sharded generation for several process counts)
+    Option 6: "suite" (time per term, peak memory and big-int size of every path across scales 1e2..1e7)
+
+index (-index or -n): integer
+    Indices n to measure. Several can be given.
+
+count (-count or -c): integer
+    bulk: number of terms to generate. Several can be given.
+
+queries (-queries or -q): integer
+    cache: number of overlapping range queries.
+
+processes (-processes or -j): integer
+    sharded: worker process counts. Several can be given.
+
+bits (-bits or -b): integer
+    prp: candidate sizes in bits. Several can be given.
+
+scale (-scale or -s): integer
+    suite: scales n to run. Several can be given.
+
+case (--case): string
+    suite: cases to run (see CASES). Several can be given.
+
+exact-limit (--exact-limit): integer
+    suite: largest scale for cases that produce every exact term. The terms grow by 0.69 bits per index, so
+    all terms up to 1e7 would take O(n^2) work and ~4e12 bytes; 1e5 terms already take ~400 MB.
+
+save / compare: string
+    suite: write the results as a JSON baseline, or compare against one and exit with status 1 when time per
+    term or peak memory regress by more than --tolerance / --memory-tolerance.
+
+mod (-mod or -m): integer
+    random-access: also time lucas(n, mod).
+    bulk: also time lucas_array(count, mod=mod).
+
+generator-limit (--generator-limit): integer
+    random-access: largest index driven through the generator (it takes n send() round trips).
+
+Return: None
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+import LucasNumber
+from LucasNumber import sharded
+
+
+def _best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def generator_term(n):
+    """
+    L(n) by driving lucas_number_generator one send() at a time, as callers do today.
+
+    Parameters
+    ----------
+    n: int
+        Index (n >= 2).
+
+    Return: int
+        L(n)
+    """
+    lng = LucasNumber.lucas_number_generator([2, 1])
+    term = next(lng)
+    for _ in range(n - 2):
+        term = lng.send(term[0])
+    lng.close()
+    return term[0]
+
+
+def random_access_benchmark(
+    indices=(10**2, 10**3, 10**4, 10**5, 10**6), mod=10**9 + 7, generator_limit=10**5, repeat=3
+):
+    """
+    Compare the generator with fast-doubling random access.
+
+    Parameters
+    ----------
+    indices: List[int]
+        Indices n to reach.
+
+    mod: int
+        Modulus for the modular timing. None to skip it.
+
+    generator_limit: int
+        Indices above this are not driven through the generator.
+
+    repeat: int
+        Number of timed repetitions. The best time is kept.
+
+    Return: List[dict]
+        One result per index with the generator, lucas(n) and lucas(n, mod) times in seconds, the speedup over
+        the generator and the bit length of L(n).
+    """
+    results = []
+    for n in indices:
+        result = {"n": n, "bits": LucasNumber.lucas(n).bit_length()}
+        result["lucas_s"] = _best_time(lambda: LucasNumber.lucas(n), repeat)
+        result["lucas_mod_s"] = _best_time(lambda: LucasNumber.lucas(n, mod), repeat) if mod else None
+        if n <= generator_limit:
+            result["generator_s"] = _best_time(lambda: generator_term(n), 1)
+            result["speedup"] = result["generator_s"] / result["lucas_s"]
+        else:
+            result["generator_s"] = result["speedup"] = None
+        results.append(result)
+    return results
+
+
+def bulk_benchmark(counts=(10**2, 10**3, 10**4, 10**5), mod=10**9 + 7, mod_counts=(10**6, 10**7), repeat=3):
+    """
+    Compare the time per term of the generator with bulk generation.
+
+    Parameters
+    ----------
+    counts: List[int]
+        Numbers of terms to generate exactly (the terms grow by 0.69 bits each, so 1e5 terms already take
+        about 400 MB).
+
+    mod: int
+        Modulus for the modular timing. None to skip it.
+
+    mod_counts: List[int]
+        Additional, larger counts timed only with `mod`.
+
+    repeat: int
+        Number of timed repetitions. The best time is kept.
+
+    Return: List[dict]
+        One result per count with the generator, lucas_bulk, lucas_array and lucas_array(mod) time per term in
+        seconds (None where not measured) and the speedup of lucas_bulk over the generator.
+    """
+    results = []
+    for count in sorted(set(counts) | set(mod_counts if mod else ())):
+        result = {"count": count, "generator_s": None, "bulk_s": None, "array_s": None, "array_mod_s": None}
+        if count in counts:
+            result["generator_s"] = _best_time(lambda: generator_term(count + 1), 1) / count
+            result["bulk_s"] = _best_time(lambda: LucasNumber.lucas_bulk(count), repeat) / count
+            result["array_s"] = _best_time(lambda: LucasNumber.lucas_array(count), repeat) / count
+        if mod:
+            result["array_mod_s"] = _best_time(lambda: LucasNumber.lucas_array(count, mod=mod), repeat) / count
+        result["speedup"] = result["generator_s"] / result["bulk_s"] if result["bulk_s"] else None
+        results.append(result)
+    return results
+
+
+def _print_bulk_results(results):
+    print("%10s %14s %14s %14s %14s %10s" % ("count", "generator s/t", "bulk s/t", "array s/t", "mod s/t", "speedup"))
+    for r in results:
+        cells = ["-" if r[k] is None else "%.3e" % r[k] for k in ("generator_s", "bulk_s", "array_s", "array_mod_s")]
+        speedup = "-" if r["speedup"] is None else "%.1fx" % r["speedup"]
+        print("%10d %14s %14s %14s %14s %10s" % tuple([r["count"]] + cells + [speedup]))
+
+
+def cache_benchmark(start=10**4, width=10**4, step=10**3, queries=20, mod=None):
+    """
+    Time a sliding window of overlapping range queries with and without LucasCache.
+
+    Parameters
+    ----------
+    start: int
+        First index of the first query.
+
+    width: int
+        Number of terms per query.
+
+    step: int
+        Offset between consecutive queries.
+
+    queries: int
+        Number of queries.
+
+    mod: int
+        Optional modulus.
+
+    Return: dict
+        Total seconds recomputing each query from the seed (lucas_array) and through a cache, the speedup and the
+        cache hit/miss counts and memory.
+    """
+    windows = [(start + i * step, start + i * step + width) for i in range(queries)]
+
+    begin = time.perf_counter()
+    for first, stop in windows:
+        LucasNumber.lucas_array(stop, mod=mod)[first:]
+    recompute_s = time.perf_counter() - begin
+
+    lucas_cache = LucasNumber.LucasCache(memory_budget=2**31, mod=mod)
+    begin = time.perf_counter()
+    for first, stop in windows:
+        lucas_cache.terms(first, stop)
+    cache_s = time.perf_counter() - begin
+
+    return {
+        "queries": queries,
+        "width": width,
+        "recompute_s": recompute_s,
+        "cache_s": cache_s,
+        "speedup": recompute_s / cache_s,
+        "hits": lucas_cache.hits,
+        "misses": lucas_cache.misses,
+        "memory_bytes": lucas_cache.memory,
+    }
+
+
+def prp_benchmark(bits=(30, 64, 128), count=10**4):
+    """
+    Strong Lucas probable-prime test throughput on odd candidates.
+
+    Parameters
+    ----------
+    bits: List[int]
+        Candidate sizes in bits. Up to 31 bits the batch runs on int64 arrays, above on object arrays.
+
+    count: int
+        Number of consecutive odd candidates per size.
+
+    Return: List[dict]
+        One result per size with candidates/s one at a time (is_strong_lucas_prp) and batched
+        (strong_lucas_prp_batch), and the number of probable primes found.
+    """
+    results = []
+    for size in bits:
+        first = (1 << (size - 1)) + 1
+        candidates = list(range(first, first + 2 * count, 2))
+        begin = time.perf_counter()
+        found = sum(LucasNumber.is_strong_lucas_prp(n) for n in candidates)
+        single_s = time.perf_counter() - begin
+        begin = time.perf_counter()
+        batch_found = int(LucasNumber.strong_lucas_prp_batch(candidates).sum())
+        batch_s = time.perf_counter() - begin
+        assert batch_found == found
+        results.append(
+            {
+                "bits": size,
+                "candidates": count,
+                "single_per_s": count / single_s,
+                "batch_per_s": count / batch_s,
+                "speedup": single_s / batch_s,
+                "prp_found": found,
+            }
+        )
+    return results
+
+
+def sharded_benchmark(stop=10**7, mod=10**9 + 7, processes=(1, 2, 4), shard_size=10**6):
+    """
+    Sharded generation of L(0), ..., L(stop - 1) reduced to last-digit counts, for several process counts.
+
+    Parameters
+    ----------
+    stop: int
+        Number of terms.
+
+    mod: int
+        Modulus. None generates exact terms (keep `stop` small, they grow by 0.69 bits per index).
+
+    processes: List[int]
+        Worker process counts.
+
+    shard_size: int
+        Terms per shard.
+
+    Return: List[dict]
+        ShardedSequence.throughput() per process count.
+    """
+    results = []
+    for count in processes:
+        run = LucasNumber.ShardedSequence(
+            0, stop, func=sharded.last_digit_counts, mod=mod, shard_size=shard_size, processes=count
+        )
+        sum(run)
+        results.append(run.throughput())
+    return results
+
+
+SCALES = (10**2, 10**3, 10**4, 10**5, 10**6, 10**7)
+SUITE_MOD = 10**9 + 7
+
+
+def _generator_case(n):
+    return lambda: generator_term(n)
+
+
+def _golden_ratio_case(n):
+    terms = LucasNumber.lucas_array(n + 1).tolist()
+
+    def run():
+        for i in range(n):
+            LucasNumber.golden_ratio_calc((terms[i], terms[i + 1]))
+        return terms[n]
+
+    return run
+
+
+def _lucas_array_case(n):
+    return lambda: LucasNumber.lucas_array(n)[-1]
+
+
+def _lucas_array_mod_case(n):
+    return lambda: LucasNumber.lucas_array(n, mod=SUITE_MOD)[-1]
+
+
+def _lucas_bulk_case(n):
+    return lambda: LucasNumber.lucas_bulk(n)[0][-1]
+
+
+def _lucas_case(n):
+    return lambda: LucasNumber.lucas(n)
+
+
+def _lucas_mod_case(n):
+    return lambda: LucasNumber.lucas(n, SUITE_MOD)
+
+
+# name: (factory(n) -> run() returning the largest term produced, produces every exact term (bounded by
+# exact_limit), random access (one term per run instead of n))
+CASES = {
+    "generator": (_generator_case, True, False),
+    "golden_ratio_calc": (_golden_ratio_case, True, False),
+    "lucas_array": (_lucas_array_case, True, False),
+    "lucas_bulk": (_lucas_bulk_case, True, False),
+    "lucas_array_mod": (_lucas_array_mod_case, False, False),
+    "lucas": (_lucas_case, False, True),
+    "lucas_mod": (_lucas_mod_case, False, True),
+}
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def suite_benchmark(scales=SCALES, cases=None, exact_limit=10**5, repeat=3):
+    """
+    Time per term, peak memory and big-int size of each code path across index scales.
+
+    Parameters
+    ----------
+    scales: List[int]
+        Scales n: the number of terms produced, or the index reached by random access.
+
+    cases: List[string]
+        Names from CASES. All when None.
+
+    exact_limit: int
+        Largest scale for the exact cases that produce every term.
+
+    repeat: int
+        Number of timed repetitions. The best time is kept; peak memory is traced in one more, untimed run.
+
+    Return: List[dict]
+        One result per case and scale with the terms produced, seconds, seconds per term, peak traced bytes and
+        the bit length of the largest term.
+    """
+    results = []
+    for name in cases or CASES:
+        factory, exact, random_access = CASES[name]
+        for n in scales:
+            if exact and n > exact_limit:
+                continue
+            run = factory(n)
+            seconds = _best_time(run, repeat)
+            terms = 1 if random_access else n
+            results.append(
+                {
+                    "case": name,
+                    "n": n,
+                    "terms": terms,
+                    "seconds": seconds,
+                    "per_term_s": seconds / terms,
+                    "peak_bytes": _peak_memory(run),
+                    "bits": int(run()).bit_length(),
+                }
+            )
+    return results
+
+
+def compare_suite_to_baseline(results, baseline, tolerance=0.2, memory_tolerance=None):
+    """
+    Compare suite results against a stored baseline.
+
+    Parameters
+    ----------
+    results: List[dict]
+        Results of `suite_benchmark`.
+
+    baseline: List[dict]
+        Earlier results. Cases and scales missing from either side are skipped.
+
+    tolerance: float
+        Allowed relative increase of the time per term, e.g. 0.2 for 20%.
+
+    memory_tolerance: float
+        Allowed relative increase of the peak memory. Defaults to `tolerance`.
+
+    Return: List[string]
+        Description of each regression. Empty when within tolerance.
+    """
+    if memory_tolerance is None:
+        memory_tolerance = tolerance
+    reference = {(r["case"], r["n"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = reference.get((r["case"], r["n"]))
+        if base is None:
+            continue
+        if r["per_term_s"] > (1 + tolerance) * base["per_term_s"]:
+            regressions.append(
+                "%s n=%d: %.3e s/term > %.3e (baseline)" % (r["case"], r["n"], r["per_term_s"], base["per_term_s"])
+            )
+        if r["peak_bytes"] > (1 + memory_tolerance) * base["peak_bytes"]:
+            regressions.append(
+                "%s n=%d: peak %d bytes > %d (baseline)" % (r["case"], r["n"], r["peak_bytes"], base["peak_bytes"])
+            )
+    return regressions
+
+
+def _print_suite_results(results):
+    print("%18s %10s %12s %14s %14s %12s" % ("case", "n", "seconds", "s/term", "peak bytes", "bits"))
+    for r in results:
+        print(
+            "%18s %10d %12.6f %14.3e %14d %12d"
+            % (r["case"], r["n"], r["seconds"], r["per_term_s"], r["peak_bytes"], r["bits"])
+        )
+
+
+def _print_random_access_results(results):
+    print("%10s %10s %12s %12s %12s %10s" % ("n", "bits", "generator s", "lucas s", "lucas mod s", "speedup"))
+    for r in results:
+        print(
+            "%10d %10d %12s %12.6f %12s %10s"
+            % (
+                r["n"],
+                r["bits"],
+                "-" if r["generator_s"] is None else "%.6f" % r["generator_s"],
+                r["lucas_s"],
+                "-" if r["lucas_mod_s"] is None else "%.6f" % r["lucas_mod_s"],
+                "-" if r["speedup"] is None else "%.0fx" % r["speedup"],
+            )
+        )
+
+
+def _print_prp_results(results):
+    print("%6s %12s %14s %14s %8s %8s" % ("bits", "candidates", "single /s", "batch /s", "speedup", "prp"))
+    for r in results:
+        print(
+            "%6d %12d %14.0f %14.0f %7.1fx %8d"
+            % (r["bits"], r["candidates"], r["single_per_s"], r["batch_per_s"], r["speedup"], r["prp_found"])
+        )
+
+
+def _print_sharded_results(results):
+    print("%10s %10s %10s %16s %16s" % ("processes", "shards", "wall s", "terms/s", "terms/s/core"))
+    for r in results:
+        print(
+            "%10d %10d %10.3f %16.0f %16.0f"
+            % (r["processes"], r["shards"], r["wall_s"], r["terms_per_s"], r["terms_per_core_s"])
+        )
+
+
+def _report(results, args, printer):
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        printer(results)
+
+
+def _cmd_random_access(args):
+    _report(
+        random_access_benchmark(args.index, args.mod or None, args.generator_limit), args, _print_random_access_results
+    )
+
+
+def _cmd_bulk(args):
+    _report(bulk_benchmark(args.count, args.mod or None, args.mod_count), args, _print_bulk_results)
+
+
+def _cmd_prp(args):
+    _report(prp_benchmark(args.bits, args.count), args, _print_prp_results)
+
+
+def _cmd_sharded(args):
+    results = sharded_benchmark(args.count, args.mod or None, args.processes, args.shard_size)
+    _report(results, args, _print_sharded_results)
+
+
+def _cmd_suite(args):
+    results = suite_benchmark(args.scale, args.case, args.exact_limit, args.repeat)
+    _report(results, args, _print_suite_results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_suite_to_baseline(results, json.load(f), args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+def _cmd_cache(args):
+    print(json.dumps(cache_benchmark(args.start, args.width, args.step, args.queries, args.mod or None), indent=2))
+
+
+# Subcommand name -> handler(args).
+_COMMANDS = {
+    "random-access": _cmd_random_access,
+    "bulk": _cmd_bulk,
+    "prp": _cmd_prp,
+    "sharded": _cmd_sharded,
+    "suite": _cmd_suite,
+    "cache": _cmd_cache,
+}
+
+
+def main(argv=None):
+    """
+    Benchmark command line entry point.
+
+    Parameters
+    ----------
+    argv: List[string]
+        Command line arguments. sys.argv is used when None.
+
+    Return: None
+    """
+    ap = argparse.ArgumentParser(description="Lucas number benchmarks")
+    sub = ap.add_subparsers(dest="benchmark", required=True)
+
+    ap_ra = sub.add_parser("random-access", help="Generator vs fast-doubling lucas(n)")
+    ap_ra.add_argument("-n", "--index", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5, 10**6])
+    ap_ra.add_argument("-m", "--mod", type=int, default=10**9 + 7, help="Modulus for lucas(n, mod), 0 to skip")
+    ap_ra.add_argument("--generator-limit", type=int, default=10**5, help="Largest index run through the generator")
+    ap_ra.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_bulk = sub.add_parser("bulk", help="Generator vs vectorized bulk generation, per term")
+    ap_bulk.add_argument("-c", "--count", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5])
+    ap_bulk.add_argument("-m", "--mod", type=int, default=10**9 + 7, help="Modulus for lucas_array, 0 to skip")
+    ap_bulk.add_argument("--mod-count", type=int, nargs="+", default=[10**6, 10**7], help="Counts timed with mod only")
+    ap_bulk.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_cache = sub.add_parser("cache", help="Overlapping range queries with and without LucasCache")
+    ap_cache.add_argument("-s", "--start", type=int, default=10**4, help="First index of the first query")
+    ap_cache.add_argument("-w", "--width", type=int, default=10**4, help="Terms per query")
+    ap_cache.add_argument("--step", type=int, default=10**3, help="Offset between queries")
+    ap_cache.add_argument("-q", "--queries", type=int, default=20)
+    ap_cache.add_argument("-m", "--mod", type=int, default=0, help="Optional modulus")
+
+    ap_prp = sub.add_parser("prp", help="Strong Lucas probable-prime candidates per second")
+    ap_prp.add_argument("-b", "--bits", type=int, nargs="+", default=[30, 64, 128])
+    ap_prp.add_argument("-c", "--count", type=int, default=10**4, help="Candidates per size")
+    ap_prp.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_sharded = sub.add_parser("sharded", help="Sharded generation throughput per process count")
+    ap_sharded.add_argument("-c", "--count", type=int, default=10**7, help="Number of terms")
+    ap_sharded.add_argument("-m", "--mod", type=int, default=10**9 + 7, help="Modulus, 0 for exact terms")
+    ap_sharded.add_argument("-j", "--processes", type=int, nargs="+", default=[1, 2, 4])
+    ap_sharded.add_argument("--shard-size", type=int, default=10**6)
+    ap_sharded.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    ap_suite = sub.add_parser("suite", help="Time per term, peak memory and big-int size across scales")
+    ap_suite.add_argument("-s", "--scale", type=int, nargs="+", default=list(SCALES))
+    ap_suite.add_argument("--case", choices=list(CASES), nargs="+", default=None, help="Cases to run (all)")
+    ap_suite.add_argument("--exact-limit", type=int, default=10**5, help="Largest scale for exact-term cases")
+    ap_suite.add_argument("-r", "--repeat", type=int, default=3, help="Timed repetitions per case")
+    ap_suite.add_argument("--save", type=str, default=None, help="Write the results as a JSON baseline")
+    ap_suite.add_argument("--compare", type=str, default=None, help="Compare against a JSON baseline")
+    ap_suite.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative time regression")
+    ap_suite.add_argument("--memory-tolerance", type=float, default=None, help="Allowed relative memory regression")
+    ap_suite.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    args = ap.parse_args(argv)
+    _COMMANDS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Bulk Lucas sequences and golden-ratio convergents as NumPy arrays.
+
+`lucas_array` returns many terms at once. Terms are produced by a tight `a, b = b, a + b` loop into a
+preallocated list, with no generator round trip, ratio calculation or list per term. The result is int64
+while every term fits (up to L(90) for the default seed) and an object array of Python ints beyond that. With
+`mod` the residues are computed with whole-array NumPy operations via the block identity
+G(j + k) = F(k-1)G(j) + F(k)G(j+1), doubling the filled length each pass.
+
+`golden_ratios` turns a whole sequence into its convergents in one vectorized division, and `lucas_bulk`
+reproduces what `lucas_number_generator` yields, for a whole run at once.
+"""
+import math
+import numpy as np
+
+# Vectorized modular products must fit int64: both factors are reduced below `mod`.
+MAX_VECTOR_MOD = 2**31
+
+
+def _sequence(count, a, b):
+    terms = [0] * count
+    for i in range(count):
+        terms[i] = a
+        a, b = b, a + b
+    return terms
+
+
+def _to_array(terms, out):
+    if out is not None:
+        if len(out) != len(terms):
+            raise ValueError("out must have %d elements, not %d" % (len(terms), len(out)))
+        out[:] = terms
+        return out
+    try:
+        return np.array(terms, dtype=np.int64)
+    except OverflowError:
+        pass
+    array = np.empty(len(terms), dtype=object)
+    array[:] = terms
+    return array
+
+
+def _fibonacci_pair(n, mod):
+    """(F(n-1), F(n)) mod `mod` by fast doubling."""
+    f0, f1 = 0, 1
+    for bit in bin(n)[2:]:
+        f0, f1 = (f0 * (2 * f1 - f0)) % mod, (f0 * f0 + f1 * f1) % mod
+        if bit == "1":
+            f0, f1 = f1, (f0 + f1) % mod
+    # f0 = F(n), f1 = F(n+1)
+    return (f1 - f0) % mod, f0
+
+
+def _modular_sequence(count, a, b, mod, out):
+    if out is None:
+        out = np.empty(count, dtype=np.int64)
+    elif len(out) != count:
+        raise ValueError("out must have %d elements, not %d" % (count, len(out)))
+    if count == 0:
+        return out
+    out[0] = a % mod
+    if count == 1:
+        return out
+    out[1] = b % mod
+    k = 1
+    # out[0:k+1] is filled; fill out[k:2k] from it, then step once to out[2k].
+    while k + 1 < count:
+        f_prev, f_k = _fibonacci_pair(k, mod)
+        stop = min(2 * k, count)
+        n = stop - k
+        out[k:stop] = (f_prev * out[:n] + f_k * out[1:][:n]) % mod
+        if 2 * k < count:
+            out[2 * k] = (out[2 * k - 1] + out[2 * k - 2]) % mod
+        k *= 2
+    return out
+
+
+def _divide(numerators, divisors):
+    # float64 quotients; a zero divisor gives +-inf (nan for 0/0) on the int64 and object paths alike.
+    if divisors.dtype != object:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return numerators / divisors
+    zero = np.asarray(divisors == 0, dtype=bool)
+    if not zero.any():
+        return np.true_divide(numerators, divisors).astype(np.float64)
+    ratios = np.empty(len(divisors), dtype=np.float64)
+    ratios[~zero] = np.true_divide(numerators[~zero], divisors[~zero]).astype(np.float64)
+    ratios[zero] = [math.copysign(math.inf, n) if n else math.nan for n in numerators[zero]]
+    return ratios
+
+
+def lucas_array(count, seed=(2, 1), mod=None, out=None):
+    """
+    First `count` terms of the sequence G(0) = seed[0], G(1) = seed[1], G(n) = G(n-1) + G(n-2).
+
+    Parameters
+    ----------
+    count: int
+        Number of terms.
+
+    seed: tuple[int, int]
+        First two terms. The default gives the Lucas numbers L(0), L(1), ...
+
+    mod: int
+        Optional modulus. Residues are computed with vectorized NumPy operations when mod <= 2**31.
+
+    out: np.ndarray
+        Optional preallocated array of `count` elements to fill. An int64 array raises OverflowError once the
+        terms no longer fit.
+
+    Return: np.ndarray
+        The terms: int64 when they fit (and always with `mod`), otherwise an object array of Python ints.
+    """
+    a, b = seed
+    if mod is not None:
+        if mod <= MAX_VECTOR_MOD:
+            return _modular_sequence(count, a, b, mod, out)
+        terms = [0] * count
+        a, b = a % mod, b % mod
+        for i in range(count):
+            terms[i] = a
+            a, b = b, (a + b) % mod
+        return _to_array(terms, out)
+    return _to_array(_sequence(count, a, b), out)
+
+
+def golden_ratios(terms):
+    """
+    Golden-ratio convergents G(i+1)/G(i) of a whole sequence in one vectorized pass.
+
+    Parameters
+    ----------
+    terms: np.ndarray
+        Sequence terms, int64 or object (Python ints). Object terms are divided exactly (correctly rounded,
+        no float overflow however large the terms get).
+
+    Return: np.ndarray
+        float64 array of len(terms) - 1 ratios. A zero term gives an inf ratio (nan for 0/0) whatever the dtype.
+    """
+    return _divide(terms[1:], terms[:-1])
+
+
+def lucas_bulk(count, seed=(2, 1)):
+    """
+    The first `count` values `lucas_number_generator(seed)` yields, computed in bulk.
+
+    The generator yields [G(i+2), (G(i) + G(i+1)) / max(G(i), G(i+1))] for i = 0, 1, ... when it is sent back
+    each new term.
+
+    Parameters
+    ----------
+    count: int
+        Number of values.
+
+    seed: tuple[int, int]
+        Generator seed.
+
+    Return: [terms, ratios]
+    terms: np.ndarray
+        The Lucas numbers (int64 or object array).
+
+    ratios: np.ndarray
+        float64 golden-ratio estimates. Where the generator would raise ZeroDivisionError the estimate is inf
+        (nan for 0/0), as in golden_ratios.
+    """
+    sequence = lucas_array(count + 2, seed)
+    terms = sequence[2:]
+    divisors = np.maximum(sequence[:-2], sequence[1:-1])
+    return [terms, _divide(terms, divisors)]
@@ -0,0 +1,291 @@
+"""
+Memoized Lucas numbers with bounded memory and checkpointed on-disk tables.
+
+The index line is cut into blocks of `interval` terms. A block is computed in bulk (bulk.lucas_array) from the
+checkpoint (L(k), L(k+1)) at its first index k and kept in an LRU table; computing it also records the checkpoint
+of the next block, so a range extends block by block without going back to the seed. Checkpoints are only two
+numbers per block, so they outlive the blocks: when the memory budget is exceeded, least recently used blocks
+are evicted first and checkpoints only after that. A block with no checkpoint of its own steps from the nearest
+lower checkpoint when it is close (STEP_BLOCKS) and jumps there with fast doubling (lucas_pair) otherwise.
+
+`save` writes the checkpoints as a compact table (a directory with index.npy, data.npy and meta.json) and
+`LucasCache.load` memory-maps it, decoding a checkpoint only when a query first needs it, so a large table costs
+nothing at startup.
+"""
+from collections import OrderedDict
+import json
+import os
+import sys
+import numpy as np
+from .bulk import lucas_array
+from .lucas import lucas_pair
+
+# Step from a checkpoint at most this many blocks back; further away, jump with lucas_pair.
+STEP_BLOCKS = 4
+
+_caches = {}
+
+
+def _array_size(values):
+    if values.dtype == object:
+        return values.nbytes + sum(sys.getsizeof(value) for value in values)
+    return values.nbytes
+
+
+def _pair_size(pair):
+    return sys.getsizeof(pair[0]) + sys.getsizeof(pair[1])
+
+
+def _to_bytes(value):
+    return value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+
+
+def _from_bytes(buffer):
+    return int.from_bytes(buffer.tobytes(), "little", signed=True)
+
+
+class LucasCache:
+    """
+    Cache of Lucas numbers L(0) = 2, L(1) = 1, ... for repeated and overlapping range queries.
+
+    Parameters
+    ----------
+    memory_budget: int
+        Approximate upper bound (bytes) on the memory held by cached blocks and checkpoints.
+
+    interval: int
+        Number of terms per block, i.e. the spacing of the checkpoints.
+
+    mod: int
+        Optional modulus. Terms are cached reduced mod `mod`.
+    """
+
+    def __init__(self, memory_budget=64 * 2**20, interval=1024, mod=None):
+        if interval < 2:
+            raise ValueError("interval must be at least 2, not %d" % interval)
+        self.memory_budget = memory_budget
+        self.interval = interval
+        self.mod = mod
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blocks = OrderedDict()
+        self._checkpoints = OrderedDict()
+        self._table = None
+        self._data = None
+        self._add(self._checkpoints, 0, lucas_pair(0, mod), None)
+
+    def _add(self, entries, key, value, size):
+        if size is None:
+            size = _pair_size(value)
+        entries[key] = (value, size)
+        self.memory += size
+
+    def _evict(self, keep):
+        for entries in (self._blocks, self._checkpoints):
+            for key in list(entries):
+                if self.memory <= self.memory_budget:
+                    return
+                if entries is self._blocks and key == keep:
+                    continue
+                self.memory -= entries.pop(key)[1]
+                self.evictions += 1
+
+    def _stored_checkpoint(self, block):
+        if self._table is None or not len(self._table):
+            return None
+        row = int(np.searchsorted(self._table[:, 0], block, side="right")) - 1
+        if row < 0:
+            return None
+        [key, start, split, stop] = [int(value) for value in self._table[row]]
+        return key, (_from_bytes(self._data[start:split]), _from_bytes(self._data[split:stop]))
+
+    def _checkpoint(self, block):
+        if block in self._checkpoints:
+            self._checkpoints.move_to_end(block)
+            return self._checkpoints[block][0]
+
+        nearest = max((key for key in self._checkpoints if key < block), default=None)
+        stored = self._stored_checkpoint(block)
+        if stored is not None and (nearest is None or stored[0] > nearest):
+            self._add(self._checkpoints, stored[0], stored[1], None)
+            nearest = stored[0]
+            if nearest == block:
+                return stored[1]
+
+        if nearest is not None and block - nearest <= STEP_BLOCKS:
+            a, b = self._checkpoints[nearest][0]
+            for _ in range((block - nearest) * self.interval):
+                a, b = b, a + b
+                if self.mod is not None:
+                    b %= self.mod
+            pair = (a, b)
+        else:
+            pair = lucas_pair(block * self.interval, self.mod)
+        self._add(self._checkpoints, block, pair, None)
+        return pair
+
+    def _block(self, block):
+        if block in self._blocks:
+            self.hits += 1
+            self._blocks.move_to_end(block)
+            return self._blocks[block][0]
+
+        self.misses += 1
+        values = lucas_array(self.interval + 2, seed=self._checkpoint(block), mod=self.mod)
+        terms = values[:-2]
+        self._add(self._blocks, block, terms, _array_size(terms))
+        if block + 1 not in self._checkpoints:
+            self._add(self._checkpoints, block + 1, (int(values[-2]), int(values[-1])), None)
+        self._evict(block)
+        return terms
+
+    def terms(self, start, stop):
+        """
+        Lucas numbers L(start), ..., L(stop - 1).
+
+        Parameters
+        ----------
+        start: int
+            First index (start >= 0).
+
+        stop: int
+            End index, exclusive.
+
+        Return: np.ndarray
+            The terms, int64 when they fit (always with a modulus up to 2**31), otherwise an object array.
+        """
+        if start < 0 or stop < start:
+            raise ValueError("invalid range [%d, %d)" % (start, stop))
+        if start == stop:
+            return lucas_array(0, mod=self.mod)
+        parts = []
+        for block in range(start // self.interval, (stop - 1) // self.interval + 1):
+            first = max(start - block * self.interval, 0)
+            last = min(stop - block * self.interval, self.interval)
+            parts.append(self._block(block)[first:last])
+        return np.concatenate(parts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.stop is None or (index.step or 1) < 1:
+                raise IndexError("Lucas slices need a stop and a positive step")
+            return self.terms(index.start or 0, index.stop)[slice(None, None, index.step)]
+        if index < 0:
+            raise IndexError("negative Lucas index %d, use lucas(n)" % index)
+        return int(self._block(index // self.interval)[index % self.interval])
+
+    def clear(self):
+        """
+        Drop all cached blocks and checkpoints (a loaded table stays mapped).
+
+        Return: None
+        """
+        self._blocks.clear()
+        self._checkpoints.clear()
+        self.memory = 0
+        self._add(self._checkpoints, 0, lucas_pair(0, self.mod), None)
+
+    def save(self, directory):
+        """
+        Write all checkpoints (cached and from a loaded table) as a compact table.
+
+        The directory holds index.npy, an int64 table of [block, start, split, stop] rows sorted by block, data.npy,
+        the checkpoints' two's-complement little-endian bytes (pair = data[start:split], data[split:stop]), and
+        meta.json with the interval and modulus.
+
+        Parameters
+        ----------
+        directory: string
+            Output directory, created when missing.
+
+        Return: int
+            Number of checkpoints written.
+        """
+        pairs = {}
+        if self._table is not None:
+            for row in range(len(self._table)):
+                [key, start, split, stop] = [int(value) for value in self._table[row]]
+                pairs[key] = (_from_bytes(self._data[start:split]), _from_bytes(self._data[split:stop]))
+        pairs.update((key, value[0]) for key, value in self._checkpoints.items())
+        pairs.update((key, (int(value[0][0]), int(value[0][1]))) for key, value in self._blocks.items())
+
+        table = np.empty((len(pairs), 4), dtype=np.int64)
+        chunks = []
+        offset = 0
+        for row, key in enumerate(sorted(pairs)):
+            first, second = _to_bytes(pairs[key][0]), _to_bytes(pairs[key][1])
+            table[row] = [key, offset, offset + len(first), offset + len(first) + len(second)]
+            chunks += [first, second]
+            offset = int(table[row, 3])
+
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "index.npy"), table)
+        np.save(os.path.join(directory, "data.npy"), np.frombuffer(b"".join(chunks), dtype=np.uint8))
+        with open(os.path.join(directory, "meta.json"), "w") as meta:
+            json.dump({"interval": self.interval, "mod": self.mod}, meta)
+        return len(pairs)
+
+    @classmethod
+    def load(cls, directory, memory_budget=64 * 2**20, mmap=True):
+        """
+        Open a table written by save.
+
+        Parameters
+        ----------
+        directory: string
+            Directory written by save.
+
+        memory_budget: int
+            Memory budget of the new cache.
+
+        mmap: bool
+            Memory-map the table (checkpoints are read on first use) instead of reading it into memory.
+
+        Return: LucasCache
+            A cache with the table's interval and modulus.
+        """
+        with open(os.path.join(directory, "meta.json")) as meta:
+            meta = json.load(meta)
+        cache = cls(memory_budget, meta["interval"], meta["mod"])
+        mmap_mode = "r" if mmap else None
+        cache._table = np.load(os.path.join(directory, "index.npy"), mmap_mode=mmap_mode)
+        cache._data = np.load(os.path.join(directory, "data.npy"), mmap_mode=mmap_mode)
+        return cache
+
+
+def get_cache(mod=None):
+    """
+    Shared cache for a modulus, created on first use.
+
+    Parameters
+    ----------
+    mod: int
+        Modulus, None for exact terms.
+
+    Return: LucasCache
+    """
+    if mod not in _caches:
+        _caches[mod] = LucasCache(mod=mod)
+    return _caches[mod]
+
+
+def lucas_range(start, stop, mod=None):
+    """
+    Lucas numbers L(start), ..., L(stop - 1) from the shared cache (see LucasCache.terms).
+
+    Parameters
+    ----------
+    start: int
+        First index.
+
+    stop: int
+        End index, exclusive.
+
+    mod: int
+        Optional modulus.
+
+    Return: np.ndarray
+    """
+    return get_cache(mod).terms(start, stop)
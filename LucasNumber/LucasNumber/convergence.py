@@ -0,0 +1,156 @@
+"""
+Exact and high-precision golden-ratio convergence of r_n = L(n+1) / L(n).
+
+With L(n) = phi^n + psi^n and psi = -1/phi, the error of a convergent is known exactly from its index:
+
+    r_n - phi = -sqrt(5) psi^n / L(n) = (-1)^(n+1) sqrt(5) / (phi^(2n) + (-1)^n),   |r_n - phi| ~ sqrt(5) phi^(-2n)
+
+so it needs neither L(n) nor a float, and the first index reaching a target precision can be found by a doubling
+search over n. Ratios are returned as exact `Fraction`s or as `Decimal`s with a chosen number of significant
+digits, accurate to within 1 ulp. The Decimal division only uses the leading bits of the terms, so its cost
+does not grow with n.
+"""
+import decimal
+from decimal import Decimal
+from fractions import Fraction
+from .lucas import lucas_pair
+
+# Extra significant digits used when comparing errors against a target precision.
+GUARD_DIGITS = 30
+
+
+def _context(precision):
+    return decimal.Context(prec=precision, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+
+def _decimal_ratio(numerator, denominator, precision):
+    # Truncating both terms to their leading bits perturbs the ratio by far less than GUARD_DIGITS digits, so
+    # dividing with the guard digits and rounding once is within 1 ulp: it is the correctly rounded result
+    # unless the exact ratio lies within that perturbation of a rounding boundary.
+    shift = max(denominator.bit_length() - (precision + GUARD_DIGITS) * 10 // 3 - 64, 0)
+    quotient = _context(precision + GUARD_DIGITS).divide(Decimal(numerator >> shift), Decimal(denominator >> shift))
+    return _context(precision).plus(quotient)
+
+
+def golden_ratio(precision=50):
+    """
+    The golden ratio phi = (1 + sqrt(5)) / 2.
+
+    Parameters
+    ----------
+    precision: int
+        Significant digits.
+
+    Return: Decimal
+    """
+    context = _context(precision + 2)
+    value = context.divide(context.add(1, context.sqrt(Decimal(5))), 2)
+    return _context(precision).plus(value)
+
+
+def convergent(n, precision=None):
+    """
+    The convergent r_n = L(n+1) / L(n).
+
+    Parameters
+    ----------
+    n: int
+        Index (n >= 0).
+
+    precision: int
+        Significant digits of a Decimal result (within 1 ulp). None for an exact Fraction.
+
+    Return: Fraction or Decimal
+    """
+    a, b = lucas_pair(n)
+    if precision is None:
+        return Fraction(b, a)
+    return _decimal_ratio(b, a, precision)
+
+
+def convergents(start=0, stop=None, precision=None):
+    """
+    Generate the convergents r_n = L(n+1) / L(n) for a range of indices.
+
+    The starting pair is reached by fast doubling; every next term is a single big-int addition, so the terms
+    can grow without bound (no float overflow, no NumPy scalar dispatch).
+
+    Parameters
+    ----------
+    start: int
+        First index.
+
+    stop: int
+        End index, exclusive. None to run forever.
+
+    precision: int
+        Significant digits of Decimal ratios (within 1 ulp). None for exact Fractions.
+
+    Return: list[int, Fraction or Decimal]
+        Yields [n, r_n].
+    """
+    a, b = lucas_pair(start)
+    n = start
+    while stop is None or n < stop:
+        yield [n, Fraction(b, a) if precision is None else _decimal_ratio(b, a, precision)]
+        a, b = b, a + b
+        n += 1
+
+
+def ratio_error(n, precision=50):
+    """
+    Signed error r_n - phi of a convergent, from the index alone.
+
+    Parameters
+    ----------
+    n: int
+        Index (n >= 0).
+
+    precision: int
+        Significant digits.
+
+    Return: Decimal
+        (-1)^(n+1) sqrt(5) / (phi^(2n) + (-1)^n), correct to about `precision` digits.
+    """
+    # phi^(2n) amplifies the relative error of phi about 2n times: carry as many extra digits as n has.
+    context = _context(precision + len(str(n)) + 5)
+    sign = 1 if n % 2 else -1
+    phi_2n = context.power(golden_ratio(context.prec), 2 * n)
+    value = context.divide(context.multiply(sign, context.sqrt(5)), context.add(phi_2n, -sign))
+    return _context(precision).plus(value)
+
+
+def first_index_for_precision(digits):
+    """
+    First index n whose convergent r_n is within 10^-digits of phi.
+
+    The largest error is at n = 1 (|r_1 - phi| = 1.38 against |r_0 - phi| = 1.12) and |r_n - phi| decreases from
+    there on, so a doubling search followed by bisection needs O(log n) evaluations of ratio_error.
+
+    Parameters
+    ----------
+    digits: int
+        Target number of correct decimal places (|r_n - phi| < 10^-digits).
+
+    Return: int
+    """
+    context = _context(GUARD_DIGITS)
+    target = context.scaleb(1, -digits)
+
+    def reached(n):
+        return context.compare(context.abs(ratio_error(n, GUARD_DIGITS)), target) < 0
+
+    if reached(0):
+        return 0
+    low, high = 1, 2
+    while not reached(high):
+        low, high = high, 2 * high
+    # reached(high) holds and reached(low) does not: r_1 has the largest error, so reached(1) fails along with
+    # reached(0), and the doubling only moves low to indices that failed.
+    while high - low > 1:
+        middle = (low + high) // 2
+        if reached(middle):
+            high = middle
+        else:
+            low = middle
+    return high
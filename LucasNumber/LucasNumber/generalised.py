@@ -0,0 +1,296 @@
+"""
+Generalised Lucas sequences U_n(P, Q), V_n(P, Q) and the strong Lucas probable-prime test.
+
+U_0 = 0, U_1 = 1, V_0 = 2, V_1 = P and X_n = P X_(n-1) - Q X_(n-2); U_n(1, -1) are the Fibonacci and
+V_n(1, -1) the Lucas numbers. U_n is computed with a binary ladder over the bits of n on (U_k, U_(k+1)):
+
+    U_2k = U_k (2 U_(k+1) - P U_k),  U_(2k+1) = U_(k+1)^2 - Q U_k^2,  U_(2k+2) = P U_(2k+1) - Q U_2k
+
+and V_n = 2 U_(n+1) - P U_n. The ladder needs no division, so it works for any modulus (even ones too).
+
+The batched functions run the same ladder over NumPy arrays of moduli (and per-modulus n, P and Q), one array
+operation per step for all candidates, when every modulus is at most bulk.MAX_VECTOR_MOD (int64 products stay
+below 2**62). Larger moduli need Python ints; for those the scalar ladder runs per modulus and the results are
+returned as object arrays.
+"""
+import numpy as np
+from .bulk import MAX_VECTOR_MOD
+
+
+def _reduce(value, mod):
+    return value if mod is None else value % mod
+
+
+def _ladder(n, P, Q, mod):
+    u0, u1, qk = 0, 1, 1
+    for bit in bin(n)[2:]:
+        u2k = _reduce(u0 * _reduce(2 * u1 - P * u0, mod), mod)
+        u2k1 = _reduce(u1 * u1 - Q * _reduce(u0 * u0, mod), mod)
+        qk = _reduce(qk * qk, mod)
+        if bit == "1":
+            u0, u1 = u2k1, _reduce(P * u2k1 - Q * u2k, mod)
+            qk = _reduce(qk * Q, mod)
+        else:
+            u0, u1 = u2k, u2k1
+    return u0, u1, qk
+
+
+def lucas_sequence(n, P, Q, mod=None):
+    """
+    U_n(P, Q) and V_n(P, Q) by a binary ladder in O(log n) multiplications.
+
+    Parameters
+    ----------
+    n: int
+        Index (n >= 0).
+
+    P: int
+        First recurrence parameter.
+
+    Q: int
+        Second recurrence parameter.
+
+    mod: int
+        Optional modulus (any positive integer).
+
+    Return: tuple[int, int]
+        (U_n, V_n), reduced mod `mod` when given.
+    """
+    if n < 0:
+        raise ValueError("n must be non-negative, not %d" % n)
+    if mod is not None:
+        P, Q = P % mod, Q % mod
+    u0, u1, _ = _ladder(n, P, Q, mod)
+    return u0, _reduce(2 * u1 - P * u0, mod)
+
+
+def _batch_arrays(moduli, *values):
+    moduli = np.asarray(moduli)
+    vector = moduli.dtype != object and int(moduli.max(initial=0)) <= MAX_VECTOR_MOD
+    moduli = moduli.astype(np.int64 if vector else object)
+    arrays = []
+    for value in values:
+        value = np.asarray(value)
+        if not vector or value.dtype.kind not in "iub" or value.dtype == np.uint64:
+            value = value.astype(object)
+        arrays.append(value)
+    return np.broadcast_arrays(np.atleast_1d(moduli), *arrays)
+
+
+def _ladder_batch(n, P, Q, moduli):
+    if moduli.dtype == object:
+        # Element-wise object array operations cost more than the scalar ladder itself.
+        ladders = [_ladder(int(k), p, q, m) for k, p, q, m in zip(n.flat, P.flat, Q.flat, moduli.flat)]
+        return [np.array([ladder[i] for ladder in ladders], dtype=object) for i in range(3)]
+    u0, u1, qk = np.zeros_like(moduli), np.ones_like(moduli) % moduli, np.ones_like(moduli) % moduli
+    bits = max(int(value) for value in n.flat).bit_length() if n.size else 0
+    # Leading zero bits leave (U_0, U_1, Q^0) unchanged, so shorter indices need no masking.
+    for shift in range(bits - 1, -1, -1):
+        u2k = u0 * ((2 * u1 - P * u0) % moduli) % moduli
+        u2k1 = (u1 * u1 - Q * (u0 * u0 % moduli)) % moduli
+        qk = qk * qk % moduli
+        bit = ((n >> shift) & 1).astype(bool)
+        u0, u1 = np.where(bit, u2k1, u2k), np.where(bit, (P * u2k1 - Q * u2k) % moduli, u2k1)
+        qk = np.where(bit, qk * Q % moduli, qk)
+    return u0, u1, qk
+
+
+def lucas_sequence_batch(n, P, Q, moduli):
+    """
+    U_n(P, Q) and V_n(P, Q) mod N for many moduli at once (see lucas_sequence).
+
+    Parameters
+    ----------
+    n: int or array_like
+        Index, or one index per modulus.
+
+    P: int or array_like
+        First recurrence parameter, or one per modulus.
+
+    Q: int or array_like
+        Second recurrence parameter, or one per modulus.
+
+    moduli: array_like
+        Moduli N (N >= 1).
+
+    Return: [U, V]
+    U: np.ndarray
+        U_n mod N per modulus (int64, or object when a modulus exceeds bulk.MAX_VECTOR_MOD).
+
+    V: np.ndarray
+        V_n mod N per modulus.
+    """
+    [moduli, n, P, Q] = _batch_arrays(moduli, n, P, Q)
+    if (n < 0).any():
+        raise ValueError("n must be non-negative")
+    P, Q = (P % moduli).astype(moduli.dtype), (Q % moduli).astype(moduli.dtype)
+    u0, u1, _ = _ladder_batch(n, P, Q, moduli)
+    return [u0, (2 * u1 - P * u0) % moduli]
+
+
+def jacobi(a, n):
+    """
+    Jacobi symbol (a / n).
+
+    Parameters
+    ----------
+    a: int
+
+    n: int
+        Odd positive integer.
+
+    Return: int
+        -1, 0 or 1.
+    """
+    if n <= 0 or n % 2 == 0:
+        raise ValueError("n must be odd and positive, not %d" % n)
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+def _is_square(n):
+    if n < 0:
+        return False
+    root = n
+    guess = (root + 1) // 2
+    while guess < root:
+        root = guess
+        guess = (root + n // root) // 2
+    return root * root == n
+
+
+def selfridge_parameters(n):
+    """
+    Selfridge's method A parameters for the strong Lucas test.
+
+    D is the first of 5, -7, 9, -11, ... with Jacobi symbol (D / n) = -1, P = 1 and Q = (1 - D) / 4.
+
+    Parameters
+    ----------
+    n: int
+        Odd integer > 2 that is not a perfect square.
+
+    Return: tuple[int, int, int]
+        (D, P, Q), or None when a D shares a factor with n (n is composite).
+    """
+    D = 5
+    while True:
+        symbol = jacobi(D, n)
+        if symbol == -1:
+            return D, 1, (1 - D) // 4
+        if symbol == 0 and abs(D) != n:
+            return None
+        D = -D - 2 if D > 0 else -D + 2
+        if D == 13 and _is_square(n):
+            raise ValueError("%d is a perfect square" % n)
+
+
+def _trivial(n):
+    """True/False for inputs decided without the Lucas test, None otherwise."""
+    if n < 2:
+        return False
+    if n in (2, 3, 5):
+        return True
+    if n % 2 == 0 or _is_square(n):
+        return False
+    return None
+
+
+def is_strong_lucas_prp(n):
+    """
+    Strong Lucas probable-prime test with Selfridge parameters.
+
+    With n + 1 = d 2^s (d odd), n passes when U_d = 0 or V_(d 2^r) = 0 mod n for some 0 <= r < s. Every prime
+    passes; combined with a base-2 strong Fermat test this is the Baillie-PSW test.
+
+    Parameters
+    ----------
+    n: int
+        Candidate.
+
+    Return: bool
+        False when n is composite, True when n is prime or a strong Lucas pseudoprime.
+    """
+    trivial = _trivial(n)
+    if trivial is not None:
+        return trivial
+    parameters = selfridge_parameters(n)
+    if parameters is None:
+        return False
+    _, P, Q = parameters
+    d, s = n + 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+
+    P, Q = P % n, Q % n
+    u0, u1, qk = _ladder(d, P, Q, n)
+    v = (2 * u1 - P * u0) % n
+    if u0 == 0 or v == 0:
+        return True
+    for _ in range(1, s):
+        v = (v * v - 2 * qk) % n
+        qk = qk * qk % n
+        if v == 0:
+            return True
+    return False
+
+
+def strong_lucas_prp_batch(candidates):
+    """
+    Strong Lucas probable-prime test of many candidates at once (see is_strong_lucas_prp).
+
+    Selfridge parameters are found per candidate; the ladders and the squaring steps run on arrays.
+
+    Parameters
+    ----------
+    candidates: array_like
+        Candidates (integers).
+
+    Return: np.ndarray
+        Boolean array, True where the candidate is prime or a strong Lucas pseudoprime.
+    """
+    candidates = [int(n) for n in np.asarray(candidates, dtype=object).flat]
+    result = np.zeros(len(candidates), dtype=bool)
+    rows, moduli, Ps, Qs, ds, ss = [], [], [], [], [], []
+    for row, n in enumerate(candidates):
+        trivial = _trivial(n)
+        if trivial is not None:
+            result[row] = trivial
+            continue
+        parameters = selfridge_parameters(n)
+        if parameters is None:
+            continue
+        d, s = n + 1, 0
+        while d % 2 == 0:
+            d, s = d // 2, s + 1
+        rows.append(row)
+        moduli.append(n)
+        Ps.append(parameters[1])
+        Qs.append(parameters[2])
+        ds.append(d)
+        ss.append(s)
+    if not rows:
+        return result
+
+    [moduli, d, P, Q] = _batch_arrays(moduli, ds, Ps, Qs)
+    P, Q = (P % moduli).astype(moduli.dtype), (Q % moduli).astype(moduli.dtype)
+    u0, u1, qk = _ladder_batch(d, P, Q, moduli)
+    v = (2 * u1 - P * u0) % moduli
+    passed = (u0 == 0) | (v == 0)
+    s = np.array(ss)
+    for r in range(1, int(s.max())):
+        v = (v * v - 2 * qk) % moduli
+        qk = qk * qk % moduli
+        passed |= (v == 0) & (r < s)
+    result[rows] = passed
+    return result
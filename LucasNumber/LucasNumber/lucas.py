@@ -1,6 +1,5 @@
 """Lucas Number Generator.(EE7:65)."""
 from collections import deque
-import numpy as np
 
 
 def golden_ratio_calc(sequence):
@@ -13,13 +12,10 @@ def golden_ratio_calc(sequence):
         Two most recent values from Lucas Number sequence.
 
     Return: float
-        Calculated golden ratio
+        Calculated golden ratio. Python int terms are divided exactly, so this stays correct however large they
+        get; see convergence.py for exact and high-precision ratios.
     """
-    if np.max(sequence[0]) > np.max(sequence[1]):
-        max_value = sequence[0]
-    else:
-        max_value = sequence[1]
-    return (sequence[0] + sequence[1]) / max_value
+    return (sequence[0] + sequence[1]) / max(sequence[0], sequence[1])
 
 
 def lucas_number_generator(seed):
@@ -42,3 +38,61 @@ def lucas_number_generator(seed):
         if next_ln is not None:
             sequence.append(next_ln)
             sequence.popleft()
+
+
+def lucas_pair(n, mod=None):
+    """
+    Random-access Lucas numbers by fast doubling.
+
+    Uses L(2k) = L(k)^2 - 2(-1)^k, L(2k+1) = L(k)L(k+1) - (-1)^k and L(2k+2) = L(k+1)^2 + 2(-1)^k, one bit of
+    n at a time, so only O(log n) big-int multiplications are needed. Indexing is L(0) = 2, L(1) = 1, i.e. the
+    generator seeded with [2, 1] first yields L(2).
+
+    Parameters
+    ----------
+    n: int
+        Index (n >= 0).
+
+    mod: int
+        Optional modulus. All arithmetic is done mod `mod`, which keeps huge indices cheap.
+
+    Return: tuple[int, int]
+        (L(n), L(n+1)), reduced mod `mod` when given.
+    """
+    if n < 0:
+        raise ValueError("n must be non-negative, not %d" % n)
+    a, b = 2, 1
+    if mod is not None:
+        a, b = a % mod, b % mod
+    sign = 1
+    for bit in bin(n)[2:]:
+        if bit == "1":
+            a, b = a * b - sign, b * b + 2 * sign
+            sign = -1
+        else:
+            a, b = a * a - 2 * sign, a * b - sign
+            sign = 1
+        if mod is not None:
+            a, b = a % mod, b % mod
+    return a, b
+
+
+def lucas(n, mod=None):
+    """
+    Random-access Lucas number L(n) in O(log n) multiplications (see lucas_pair).
+
+    Parameters
+    ----------
+    n: int
+        Index. Negative indices follow L(-n) = (-1)^n L(n).
+
+    mod: int
+        Optional modulus.
+
+    Return: int
+        L(n), reduced mod `mod` when given.
+    """
+    value = lucas_pair(abs(n), mod)[0]
+    if n < 0 and n % 2:
+        value = -value if mod is None else (-value) % mod
+    return value
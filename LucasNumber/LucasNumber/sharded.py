@@ -0,0 +1,178 @@
+"""
+Sharded Lucas sequence generation across a process pool.
+
+An index range is cut into shards of `shard_size` terms. Every shard jumps straight to its first pair
+(L(k), L(k+1)) with fast doubling (lucas_pair), so shards need no serial hand-off, and then fills its terms in
+bulk (bulk.lucas_array). A picklable `func(start, terms)` can reduce each shard in the worker (digit statistics,
+residues, ...) so only the reduced result travels back to the caller. Results stream back in index order, with
+at most two shards per process in flight.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+import numpy as np
+from .bulk import lucas_array
+from .lucas import lucas_pair
+
+
+def shard_bounds(start, stop, shard_size):
+    """
+    Split [start, stop) into consecutive shards.
+
+    Parameters
+    ----------
+    start: int
+        First index.
+
+    stop: int
+        End index, exclusive.
+
+    shard_size: int
+        Terms per shard (the last shard may be shorter).
+
+    Return: List[tuple[int, int]]
+        (first, end) index pairs.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be positive, not %d" % shard_size)
+    return [(first, min(first + shard_size, stop)) for first in range(start, stop, shard_size)]
+
+
+def last_digit_counts(start, terms):
+    """
+    Shard reducer: how often each last decimal digit 0-9 occurs.
+
+    Parameters
+    ----------
+    start: int
+        Index of the first term (unused).
+
+    terms: np.ndarray
+        Shard terms.
+
+    Return: np.ndarray
+        int64 counts of length 10.
+    """
+    return np.bincount((terms % 10).astype(np.int64), minlength=10)
+
+
+def _run_shard(first, end, mod, func):
+    begin = time.process_time()
+    terms = lucas_array(end - first, seed=lucas_pair(first, mod), mod=mod)
+    result = terms if func is None else func(first, terms)
+    return result, time.process_time() - begin
+
+
+class ShardedSequence:
+    """
+    Lucas numbers L(start), ..., L(stop - 1) generated in parallel shards.
+
+    Iterating yields one result per shard, in order: the shard's terms (see bulk.lucas_array) or func(first,
+    terms). Throughput is available once iteration finishes.
+
+    Parameters
+    ----------
+    start: int
+        First index (start >= 0).
+
+    stop: int
+        End index, exclusive.
+
+    func: callable
+        Optional module-level function (start, terms) -> result run in the worker on each shard.
+
+    mod: int
+        Optional modulus.
+
+    shard_size: int
+        Terms per shard.
+
+    processes: int
+        Worker processes. Defaults to os.cpu_count().
+    """
+
+    def __init__(self, start, stop, func=None, mod=None, shard_size=10**5, processes=None):
+        if start < 0 or stop < start:
+            raise ValueError("invalid range [%d, %d)" % (start, stop))
+        self.start = start
+        self.stop = stop
+        self.func = func
+        self.mod = mod
+        self.shard_size = shard_size
+        self.processes = processes or os.cpu_count() or 1
+        self.terms = 0
+        self.shards = 0
+        self.cpu_s = 0.0
+        self.wall_s = 0.0
+
+    def __iter__(self):
+        bounds = shard_bounds(self.start, self.stop, self.shard_size)
+        begin = time.perf_counter()
+        pending = deque()
+        with ProcessPoolExecutor(self.processes) as executor:
+            try:
+                for first, end in bounds:
+                    pending.append((end - first, executor.submit(_run_shard, first, end, self.mod, self.func)))
+                    if len(pending) >= 2 * self.processes:
+                        yield self._collect(*pending.popleft())
+                while pending:
+                    yield self._collect(*pending.popleft())
+            finally:
+                for _, future in pending:
+                    future.cancel()
+                self.wall_s = time.perf_counter() - begin
+
+    def _collect(self, count, future):
+        result, elapsed = future.result()
+        self.terms += count
+        self.shards += 1
+        self.cpu_s += elapsed
+        return result
+
+    def throughput(self):
+        """
+        Throughput of the finished run.
+
+        Return: dict
+            Terms, shards, processes, wall seconds, summed worker CPU seconds, terms/s overall and terms/s per
+            core (terms over worker CPU seconds, i.e. what one busy core sustains).
+        """
+        return {
+            "terms": self.terms,
+            "shards": self.shards,
+            "processes": self.processes,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "terms_per_s": self.terms / self.wall_s if self.wall_s else None,
+            "terms_per_core_s": self.terms / self.cpu_s if self.cpu_s else None,
+        }
+
+
+def sharded_terms(start, stop, mod=None, shard_size=10**5, processes=None):
+    """
+    Generate L(start), ..., L(stop - 1) one by one from parallel shards, in order.
+
+    Parameters
+    ----------
+    start: int
+        First index.
+
+    stop: int
+        End index, exclusive.
+
+    mod: int
+        Optional modulus.
+
+    shard_size: int
+        Terms per shard.
+
+    processes: int
+        Worker processes. Defaults to os.cpu_count().
+
+    Return: int
+        Yields the terms.
+    """
+    for terms in ShardedSequence(start, stop, mod=mod, shard_size=shard_size, processes=processes):
+        for term in terms:
+            yield int(term)
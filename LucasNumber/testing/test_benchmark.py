@@ -0,0 +1,59 @@
+"""Unit test for the Lucas number benchmark suite."""
+from LucasNumber import benchmark
+import copy
+import json
+import pytest
+
+
+def test_suite_benchmark():
+    """
+    Test a small suite run.
+
+    Test Overview:
+    --------------
+    Every case runs at each scale, exact-term cases are skipped above the exact limit, and each result records
+    time per term, peak memory and the bit length of the largest term (L(1000) has 695 bits).
+    """
+    results = benchmark.suite_benchmark(scales=(100, 1000), exact_limit=100, repeat=1)
+    runs = {(r["case"], r["n"]): r for r in results}
+
+    assert set(name for name, _ in runs) == set(benchmark.CASES)
+    assert ("generator", 1000) not in runs and ("lucas_array_mod", 1000) in runs
+    assert runs[("lucas", 1000)]["bits"] == 695 and runs[("lucas", 1000)]["terms"] == 1
+    assert runs[("lucas_mod", 1000)]["bits"] <= 30
+    for r in results:
+        assert r["per_term_s"] == pytest.approx(r["seconds"] / r["terms"])
+        assert r["peak_bytes"] >= 0
+
+
+def test_suite_baseline(tmp_path, capsys):
+    """
+    Test JSON baselines round-trip and regressions beyond the tolerances are reported.
+
+    Test Overview:
+    --------------
+    a) Results compared with themselves have no regressions, also through the command line.
+    b) A doubled time per term and a doubled peak memory are both reported with a 20% tolerance; a separate
+       memory tolerance can allow the memory increase.
+    c) The command line exits with status 1 on a regression.
+    """
+    path = tmp_path / "baseline.json"
+    benchmark.main(["suite", "-s", "100", "--case", "lucas", "lucas_mod", "-r", "1", "--save", str(path)])
+    baseline = json.loads(path.read_text())
+    assert [r["case"] for r in baseline] == ["lucas", "lucas_mod"]
+    assert benchmark.compare_suite_to_baseline(baseline, baseline) == []
+
+    slower = copy.deepcopy(baseline)
+    slower[0]["per_term_s"] *= 2
+    slower[0]["peak_bytes"] *= 2
+    regressions = benchmark.compare_suite_to_baseline(slower, baseline, tolerance=0.2)
+    assert len(regressions) == 2 and regressions[0].startswith("lucas n=100")
+    assert len(benchmark.compare_suite_to_baseline(slower, baseline, 0.2, memory_tolerance=1.5)) == 1
+
+    for r in baseline:
+        r["per_term_s"] /= 1000
+    path.write_text(json.dumps(baseline))
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark.main(["suite", "-s", "100", "--case", "lucas", "-r", "1", "--compare", str(path)])
+    assert exit_info.value.code == 1
+    assert "REGRESSION lucas n=100" in capsys.readouterr().out
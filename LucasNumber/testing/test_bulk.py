@@ -0,0 +1,95 @@
+"""Unit test for bulk Lucas sequences."""
+import LucasNumber
+import numpy as np
+import pytest
+
+
+def _recurrence(count, a=2, b=1):
+    sequence = []
+    for _ in range(count):
+        sequence.append(a)
+        a, b = b, a + b
+    return sequence
+
+
+def test_lucas_array():
+    """
+    Test bulk terms against the recurrence (Simple Test).
+
+    Test Overview:
+    --------------
+    a) The terms are int64 while they fit (L(0)..L(90)) and an object array of exact Python ints beyond.
+    b) Modular residues (vectorized for mod <= 2**31, looped above) match the reduced terms for lengths around
+       the doubling boundaries.
+    c) Other seeds and a preallocated `out` array are honoured, and an `out` of the wrong length is refused.
+    """
+    sequence = _recurrence(1000)
+
+    assert LucasNumber.lucas_array(91).dtype == np.int64
+    assert list(LucasNumber.lucas_array(91)) == sequence[:91]
+    assert LucasNumber.lucas_array(92).dtype == object
+    assert list(LucasNumber.lucas_array(1000)) == sequence
+
+    for mod in (7, 10**9 + 7, 2**31, 2**61 - 1):
+        for count in (0, 1, 2, 3, 4, 5, 17, 64, 65, 1000):
+            residues = LucasNumber.lucas_array(count, mod=mod)
+            assert list(residues) == [value % mod for value in sequence[:count]]
+
+    assert list(LucasNumber.lucas_array(6, seed=(0, 1))) == [0, 1, 1, 2, 3, 5]
+    out = np.zeros(100, dtype=np.int64)
+    assert LucasNumber.lucas_array(100, mod=97, out=out) is out
+    assert out[99] == sequence[99] % 97
+    for mod in (97, 2**61 - 1, None):
+        with pytest.raises(ValueError):
+            LucasNumber.lucas_array(99, mod=mod, out=out)
+
+
+def test_lucas_bulk():
+    """
+    Test lucas_bulk reproduces the generator (Simple Test).
+
+    Test Overview:
+    --------------
+    The terms and golden-ratio estimates must equal what lucas_number_generator yields when each term is sent
+    back, including past the int64 range, and golden_ratios must converge to the golden ratio.
+    """
+    lng = LucasNumber.lucas_number_generator([2, 1])
+    yielded = [next(lng)]
+    for _ in range(199):
+        yielded.append(lng.send(yielded[-1][0]))
+    lng.close()
+
+    [terms, ratios] = LucasNumber.lucas_bulk(200)
+    assert list(terms) == [value[0] for value in yielded]
+    assert list(ratios) == [value[1] for value in yielded]
+
+    ratios = LucasNumber.golden_ratios(LucasNumber.lucas_array(2000))
+    assert ratios.dtype == np.float64
+    assert abs(ratios[-1] - (1 + 5**0.5) / 2) < 1e-15
+
+
+def test_zero_divisor():
+    """
+    Test a zero divisor gives the same ratio on the int64 and object paths (Simple Test).
+
+    Test Overview:
+    --------------
+    The Fibonacci sequence starts with F(0) = 0. Its first convergent F(1)/F(0) is inf, and a zero sequence gives
+    nan, both with a short (int64) sequence and with one long enough to be an object array, without raising
+    or warning.
+    """
+    for count in (10, 200):
+        fibonacci = LucasNumber.lucas_array(count, seed=(0, 1))
+        assert fibonacci.dtype == (np.int64 if count <= 91 else object)
+        with np.errstate(all="raise"):
+            ratios = LucasNumber.golden_ratios(fibonacci)
+        assert ratios[0] == np.inf
+        assert ratios[1:].tolist() == [fibonacci[i + 1] / fibonacci[i] for i in range(1, count - 1)]
+
+    zeros = np.zeros(4, dtype=np.int64)
+    assert np.isnan(LucasNumber.golden_ratios(zeros)).all()
+    assert np.isnan(LucasNumber.golden_ratios(zeros.astype(object))).all()
+
+    [terms, ratios] = LucasNumber.lucas_bulk(3, seed=(0, 0))
+    assert list(terms) == [0, 0, 0]
+    assert np.isnan(ratios).all()
@@ -0,0 +1,84 @@
+"""Unit test for the memoized Lucas number cache."""
+import LucasNumber
+from LucasNumber import cache
+import numpy as np
+
+
+def _recurrence(count):
+    sequence = [2, 1]
+    while len(sequence) < count:
+        sequence.append(sequence[-1] + sequence[-2])
+    return sequence[:count]
+
+
+def test_cache_range_queries():
+    """
+    Test range queries across block boundaries (Simple Test).
+
+    Test Overview:
+    --------------
+    a) Ranges and single indices match the recurrence; a repeated, overlapping query is served from the
+       cached blocks (hits, no new misses).
+    b) Modular caches jump to far blocks with fast doubling and match lucas(n, mod).
+    c) lucas_range uses one shared cache per modulus.
+    """
+    sequence = _recurrence(3000)
+    lucas_cache = cache.LucasCache(interval=64)
+    assert list(lucas_cache.terms(0, 3000)) == sequence
+    misses = lucas_cache.misses
+    assert list(lucas_cache.terms(1000, 1500)) == sequence[1000:1500]
+    assert (lucas_cache.misses, lucas_cache.hits) == (misses, 9)
+    assert lucas_cache[2999] == sequence[2999]
+    assert list(lucas_cache[10:100:7]) == sequence[10:100:7]
+    assert len(lucas_cache.terms(5, 5)) == 0
+
+    mod = 10**9 + 7
+    residues = cache.LucasCache(interval=100, mod=mod).terms(10**6, 10**6 + 150)
+    assert residues.dtype == np.int64
+    assert list(residues) == [LucasNumber.lucas(n, mod) for n in range(10**6, 10**6 + 150)]
+
+    assert LucasNumber.get_cache(97) is LucasNumber.get_cache(97)
+    assert list(LucasNumber.lucas_range(40, 50, 97)) == [value % 97 for value in sequence[40:50]]
+
+
+def test_cache_memory_budget():
+    """
+    Test eviction under a small memory budget (Simple Test).
+
+    Test Overview:
+    --------------
+    Blocks are evicted (least recently used first) to stay within the budget while the checkpoints survive,
+    so evicted ranges are recomputed correctly from the nearest checkpoint.
+    """
+    sequence = _recurrence(4000)
+    lucas_cache = cache.LucasCache(memory_budget=100000, interval=64)
+    assert list(lucas_cache.terms(2000, 4000)) == sequence[2000:4000]
+    assert lucas_cache.memory <= lucas_cache.memory_budget
+    assert lucas_cache.evictions > 0
+    assert len(lucas_cache._checkpoints) > len(lucas_cache._blocks)
+    assert list(lucas_cache.terms(2100, 2200)) == sequence[2100:2200]
+
+
+def test_cache_persistence(tmp_path, monkeypatch):
+    """
+    Test saving checkpoints and memory-mapping them at startup (Simple Test).
+
+    Test Overview:
+    --------------
+    A loaded cache must memory-map the table and extend from its stored checkpoints: fast doubling is disabled
+    during the query to prove no checkpoint is recomputed.
+    """
+    sequence = _recurrence(2600)
+    lucas_cache = cache.LucasCache(interval=128)
+    lucas_cache.terms(0, 2600)
+    assert lucas_cache.save(str(tmp_path)) == 22
+
+    loaded = cache.LucasCache.load(str(tmp_path))
+    assert isinstance(loaded._table, np.memmap)
+    assert loaded.interval == 128 and loaded.memory < 1000
+
+    def no_jump(*args):
+        raise AssertionError("checkpoint recomputed")
+
+    monkeypatch.setattr(cache, "lucas_pair", no_jump)
+    assert list(loaded.terms(2000, 2600)) == sequence[2000:2600]
@@ -0,0 +1,62 @@
+"""Unit test for exact and high-precision golden-ratio convergence."""
+import LucasNumber
+from decimal import Decimal
+from decimal import localcontext
+from fractions import Fraction
+
+
+def _exact_error(n, precision=300):
+    with localcontext() as context:
+        context.prec = precision
+        a, b = LucasNumber.lucas_pair(n)
+        return Decimal(b) / Decimal(a) - LucasNumber.golden_ratio(precision)
+
+
+def test_convergents():
+    """
+    Test exact and Decimal convergents (Simple Test).
+
+    Test Overview:
+    --------------
+    a) Fractions are exact L(n+1)/L(n) and agree with the generator's float estimates.
+    b) Decimal convergents equal the correctly rounded quotient far past the float range (they are guaranteed
+       within 1 ulp and only differ next to a rounding boundary).
+    c) golden_ratio_calc no longer depends on NumPy scalars and stays exact for huge terms.
+    """
+    exact = list(LucasNumber.convergents(0, 10))
+    assert exact[:4] == [[0, Fraction(1, 2)], [1, Fraction(3)], [2, Fraction(4, 3)], [3, Fraction(7, 4)]]
+    assert LucasNumber.convergent(40) == Fraction(LucasNumber.lucas(41), LucasNumber.lucas(40))
+
+    n = 5000
+    a, b = LucasNumber.lucas_pair(n)
+    [[index, ratio]] = list(LucasNumber.convergents(n, n + 1, precision=60))
+    with localcontext() as context:
+        context.prec = 60
+        assert index == n and ratio == Decimal(b) / Decimal(a)
+    assert LucasNumber.convergent(n, 60) == ratio
+    assert str(LucasNumber.golden_ratio(20)) == "1.6180339887498948482"
+    assert LucasNumber.golden_ratio_calc([a, b]) == float(Fraction(a + b, b))
+
+
+def test_ratio_error():
+    """
+    Test the analytic error and the precision search (Simple Test).
+
+    Test Overview:
+    --------------
+    a) ratio_error(n) matches r_n - phi computed from the terms to the requested digits, including its sign.
+    b) first_index_for_precision(d) is the smallest index whose error is below 10^-d.
+    c) The search handles targets far beyond float range quickly.
+    """
+    for n in list(range(0, 60, 7)) + [400]:
+        exact = _exact_error(n)
+        assert abs((LucasNumber.ratio_error(n, 40) - exact) / exact) < Decimal("1e-38")
+
+    for digits in range(40):
+        n = LucasNumber.first_index_for_precision(digits)
+        target = Decimal(1).scaleb(-digits)
+        assert abs(_exact_error(n)) < target
+        assert all(abs(_exact_error(k)) >= target for k in range(n))
+
+    n = LucasNumber.first_index_for_precision(10**9)
+    assert LucasNumber.ratio_error(n, 10).adjusted() < -(10**9) <= LucasNumber.ratio_error(n - 1, 10).adjusted() + 1
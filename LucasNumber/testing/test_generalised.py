@@ -0,0 +1,69 @@
+"""Unit test for generalised Lucas sequences and the strong Lucas probable-prime test."""
+import LucasNumber
+from LucasNumber import generalised
+import numpy as np
+
+
+def _recurrence(n, P, Q):
+    u, v = [0, 1], [2, P]
+    for _ in range(n):
+        u.append(P * u[-1] - Q * u[-2])
+        v.append(P * v[-1] - Q * v[-2])
+    return u[n], v[n]
+
+
+def _is_prime(n):
+    return n > 1 and all(n % d for d in range(2, int(n**0.5) + 1))
+
+
+def test_lucas_sequence():
+    """
+    Test U_n(P, Q) and V_n(P, Q) against the recurrence (Simple Test).
+
+    Test Overview:
+    --------------
+    a) Exact and modular values (including even moduli) match the recurrence for several (P, Q).
+    b) V_n(1, -1) are the Lucas numbers.
+    c) The batched mode matches the scalar one on int64 moduli, on per-modulus indices and on moduli above
+       2**31 (object arrays).
+    """
+    for P, Q in ((1, -1), (3, 2), (-2, 7)):
+        for n in range(30):
+            u, v = _recurrence(n, P, Q)
+            assert LucasNumber.lucas_sequence(n, P, Q) == (u, v)
+            assert LucasNumber.lucas_sequence(n, P, Q, 10) == (u % 10, v % 10)
+    assert LucasNumber.lucas_sequence(500, 1, -1)[1] == LucasNumber.lucas(500)
+
+    moduli = np.arange(1, 300)
+    [U, V] = LucasNumber.lucas_sequence_batch(77, 3, -5, moduli)
+    assert U.dtype == np.int64
+    assert [(int(a), int(b)) for a, b in zip(U, V)] == [LucasNumber.lucas_sequence(77, 3, -5, m) for m in range(1, 300)]
+
+    [U, V] = LucasNumber.lucas_sequence_batch(np.arange(40), 2, 7, 10**9 + 7)
+    assert list(V) == [LucasNumber.lucas_sequence(n, 2, 7, 10**9 + 7)[1] for n in range(40)]
+
+    big = [2**64 + 13, 2**89 - 1]
+    [U, V] = LucasNumber.lucas_sequence_batch(10**20, 1, -1, big)
+    assert U.dtype == object
+    assert list(V) == [LucasNumber.lucas(10**20, m) for m in big]
+
+
+def test_strong_lucas_prp():
+    """
+    Test the strong Lucas probable-prime test (Simple Test).
+
+    Test Overview:
+    --------------
+    Below 30000 the test must agree with trial division except at the known strong Lucas pseudoprimes
+    (OEIS A217255), batched and one at a time; large Mersenne primes pass and their products fail.
+    """
+    pseudoprimes = [5459, 5777, 10877, 16109, 18971, 22499, 24569, 25199]
+    single = [n for n in range(30000) if LucasNumber.is_strong_lucas_prp(n) != _is_prime(n)]
+    assert single == pseudoprimes
+    batch = LucasNumber.strong_lucas_prp_batch(range(30000))
+    assert [n for n in range(30000) if batch[n] != _is_prime(n)] == pseudoprimes
+
+    mersenne = [2**89 - 1, 2**127 - 1]
+    assert all(LucasNumber.is_strong_lucas_prp(p) for p in mersenne)
+    assert list(LucasNumber.strong_lucas_prp_batch(mersenne + [mersenne[0] * mersenne[1]])) == [True, True, False]
+    assert generalised.jacobi(5, 21) == 1 and generalised.selfridge_parameters(19) == (-7, 1, 2)
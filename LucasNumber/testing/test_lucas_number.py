@@ -1,4 +1,4 @@
-"""Unit test for signal averager."""
+"""Unit test for the Lucas number generator."""
 import LucasNumber
 
 
@@ -45,5 +45,28 @@ def test_lucas_number_generator():
         assert generated_sequence[i][0] == expected_lucas_sequence[i]
 
 
-""" Debug: Uncomment to run individual methods"""
-test = test_lucas_number_generator()
+def test_lucas_random_access():
+    """
+    Test fast-doubling random access against the generator (Simple Test).
+
+    Test Overview:
+    --------------
+    a) lucas(n) and lucas_pair(n) must match the recurrence for the first 300 indices (L(0) = 2, L(1) = 1).
+    b) The modular versions must match the reduced values, including for a huge index checked through
+       L(2n) = L(n)^2 - 2(-1)^n.
+    c) Negative indices follow L(-n) = (-1)^n L(n).
+    """
+    sequence = [2, 1]
+    for _ in range(300):
+        sequence.append(sequence[-1] + sequence[-2])
+
+    assert [LucasNumber.lucas(n) for n in range(300)] == sequence[:300]
+    assert [LucasNumber.lucas_pair(n) for n in range(299)] == list(zip(sequence[:299], sequence[1:300]))
+
+    mod = 10**9 + 7
+    assert [LucasNumber.lucas(n, mod) for n in range(300)] == [value % mod for value in sequence[:300]]
+    n = 10**50 + 3
+    assert LucasNumber.lucas(2 * n, mod) == (LucasNumber.lucas(n, mod) ** 2 + 2) % mod
+
+    assert [LucasNumber.lucas(-n) for n in range(5)] == [2, -1, 3, -4, 7]
+    assert LucasNumber.lucas(-3, 7) == (-4) % 7
@@ -0,0 +1,37 @@
+"""Unit test for sharded Lucas sequence generation."""
+import LucasNumber
+from LucasNumber import sharded
+import numpy as np
+
+
+def test_sharded_sequence():
+    """
+    Test shards are generated independently and streamed back in order (Simple Test).
+
+    Test Overview:
+    --------------
+    a) Terms from two worker processes, with shard sizes that do not divide the range, equal bulk generation,
+       both modular and exact (past the int64 range).
+    b) A reducer runs in the workers and only its results come back.
+    c) Throughput is reported once the run has finished, and closing the stream early stops the run.
+    """
+    mod = 10**9 + 7
+    expected = LucasNumber.lucas_array(20000, mod=mod)
+    assert list(LucasNumber.sharded_terms(0, 20000, mod=mod, shard_size=3001, processes=2)) == list(expected)
+
+    expected = LucasNumber.lucas_array(1500)
+    run = LucasNumber.ShardedSequence(500, 1500, shard_size=128, processes=2)
+    assert [int(term) for terms in run for term in terms] == list(expected[500:1500])
+    throughput = run.throughput()
+    assert (throughput["terms"], throughput["shards"], throughput["processes"]) == (1000, 8, 2)
+    assert throughput["terms_per_s"] > 0
+
+    run = LucasNumber.ShardedSequence(0, 1500, func=sharded.last_digit_counts, shard_size=400, processes=2)
+    counts = list(run)
+    assert len(counts) == 4
+    assert list(sum(counts)) == list(np.bincount([int(term) % 10 for term in expected], minlength=10))
+
+    stream = iter(LucasNumber.ShardedSequence(0, 10**6, mod=mod, shard_size=1000, processes=2))
+    assert list(next(stream)) == list(LucasNumber.lucas_array(1000, mod=mod))
+    stream.close()
+    assert sharded.shard_bounds(0, 10, 4) == [(0, 4), (4, 8), (8, 10)]
@@ -0,0 +1,425 @@
+"""
+Distributed signal averaging over RabbitMQ.
+
+The producer publishes batches of CW+AWGN frames, serialized with the Asyncio_rmq numpy serializer (raw array
+bytes, dtype and shape in the headers). A pool of worker processes consume FrameQueue, each accumulating a
+partial sum of the batches it receives, and a reducer merges the partial sums into the final average.
+
+    producer --(frame batches)--> FrameQueue --> worker 1..N --(partial sums)--> PartialQueue --> reducer
+
+Backpressure: the producer stops publishing while FrameQueue holds more than `max_queued` batches (checking the
+depth with an increasing back-off), and each worker holds at most `prefetch` unacknowledged batches. Batches
+are acknowledged only once they have been added to a partial sum, so a crashed worker's batches are
+redelivered to the others.
+
+Workers run in separate processes when the broker can be shared between processes (any URL but memory://),
+and as tasks of the calling process otherwise. `scaling_benchmark` measures the throughput for several
+worker counts.
+
+Parameters
+----------
+role (-role or -r): string
+    Role for the instance to play.
+    Option 1: "local" (producer, workers and reducer started from one process)
+    Option 2: "producer"
+    Option 3: "worker"
+    Option 4: "reducer"
+    Option 5: "scaling" (throughput for 1 to `workers` workers)
+
+url (-url or -u): string
+    Broker URL. Defaults to the in-memory broker for "local" and "scaling", and to a local RabbitMQ otherwise.
+
+frames (-frames or -f): integer
+    Total number of frames to average.
+
+workers (-workers or -w): integer
+    Number of workers.
+
+Return: None
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import multiprocessing
+import time
+import numpy as np
+import aio_pika
+import Asyncio_rmq
+from Asyncio_rmq import serializers
+import SigAverager.cwg
+
+FRAME_QUEUE = "FrameQueue"
+PARTIAL_QUEUE = "PartialQueue"
+EOS_HEADER = "x-end-of-stream"
+COUNT_HEADER = "x-frame-count"
+
+# First and longest wait (seconds) between frame queue depth checks while the queue is full.
+DEPTH_BACKOFF = (0.001, 0.1)
+
+
+def generate_frame_batch(batch_size, cw_scale, cw_freq, sampling_frequency, noise_scale, num_samples):
+    """
+    Generate a batch of real-valued CW+AWGN frames.
+
+    Parameters
+    ----------
+    batch_size: int
+        Number of frames in the batch.
+
+    cw_scale, cw_freq, sampling_frequency, noise_scale, num_samples:
+        See SigAverager.cwg.generate_carrier_wave.
+
+    Return: np.ndarray of type float
+        Array of shape (batch_size, num_samples).
+    """
+    batch = np.empty((batch_size, num_samples), dtype=np.float64)
+    for i in range(batch_size):
+        batch[i] = SigAverager.cwg.generate_carrier_wave(
+            cw_scale=cw_scale,
+            freq=cw_freq,
+            sampling_frequency=sampling_frequency,
+            num_samples=num_samples,
+            noise_scale=noise_scale,
+            complex=False,
+        )
+    return batch
+
+
+async def _declare(channel):
+    frame_queue = await channel.declare_queue(FRAME_QUEUE, auto_delete=False)
+    partial_queue = await channel.declare_queue(PARTIAL_QUEUE, auto_delete=False)
+    return frame_queue, partial_queue
+
+
+async def _queue_depth(channel, name):
+    # A passive declare returns the current message count without changing the queue.
+    queue = await channel.declare_queue(name, passive=True)
+    return queue.declaration_result.message_count
+
+
+async def produce(
+    connection,
+    n_frames,
+    n_workers,
+    batch_size=16,
+    max_queued=8,
+    cw_scale=0.01,
+    cw_freq=75e6,
+    sampling_frequency=1712e6,
+    noise_scale=0.4,
+    num_samples=8192,
+    replay=False,
+):
+    """
+    Publish frame batches followed by one end-of-stream marker per worker.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection.
+
+    n_frames: int
+        Total number of frames to publish.
+
+    n_workers: int
+        Number of workers to send an end-of-stream marker to.
+
+    batch_size: int
+        Frames per message.
+
+    max_queued: int
+        Publishing pauses while the frame queue holds more than this many batches.
+
+    cw_scale, cw_freq, sampling_frequency, noise_scale, num_samples:
+        See SigAverager.cwg.generate_carrier_wave.
+
+    replay: bool
+        Generate one batch and publish it repeatedly instead of generating every frame. Frame generation
+        costs far more than summing, so this is how the workers' throughput is measured.
+
+    Return: int
+        Number of frames published.
+    """
+    loop = asyncio.get_running_loop()
+    channel = await connection.channel()
+    await _declare(channel)
+    cw = (cw_scale, cw_freq, sampling_frequency, noise_scale, num_samples)
+
+    batch = None
+    sent = 0
+    while sent < n_frames:
+        count = min(batch_size, n_frames - sent)
+        if batch is None or not replay:
+            # Frame generation is numpy/scipy bound: keep it off the event loop.
+            batch = await loop.run_in_executor(None, generate_frame_batch, count, *cw)
+        delay = DEPTH_BACKOFF[0]
+        while await _queue_depth(channel, FRAME_QUEUE) >= max_queued:
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, DEPTH_BACKOFF[1])
+        await channel.default_exchange.publish(
+            serializers.make_message(batch[:count], serializer="numpy"), routing_key=FRAME_QUEUE
+        )
+        sent += count
+
+    for _ in range(n_workers):
+        await channel.default_exchange.publish(
+            aio_pika.Message(body=b"", headers={EOS_HEADER: True}), routing_key=FRAME_QUEUE
+        )
+    await channel.close()
+    return sent
+
+
+async def work(connection, prefetch=4):
+    """
+    Accumulate a partial sum of frame batches until an end-of-stream marker arrives, then publish it.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection.
+
+    prefetch: int
+        Maximum number of unacknowledged batches held by this worker.
+
+    Return: int
+        Number of frames accumulated.
+    """
+    channel = await connection.channel()
+    await channel.set_qos(prefetch_count=prefetch)
+    frame_queue, _ = await _declare(channel)
+
+    partial = None
+    count = 0
+    async with frame_queue.iterator() as queue_iter:
+        async for message in queue_iter:
+            if (message.headers or {}).get(EOS_HEADER):
+                await message.ack()
+                break
+            # A read-only view of the message body: summing it copies nothing.
+            batch = serializers.decode_message(message)
+            batch_sum = np.sum(batch, 0)
+            partial = batch_sum if partial is None else partial + batch_sum
+            count += batch.shape[0]
+            await message.ack()
+
+    if partial is None:
+        partial = np.zeros(0)
+    await channel.default_exchange.publish(
+        serializers.make_message(partial, headers={COUNT_HEADER: count}), routing_key=PARTIAL_QUEUE
+    )
+    # Closing the channel requeues anything still prefetched (e.g. another worker's end-of-stream marker).
+    await channel.close()
+    return count
+
+
+def _work_process(url, prefetch):
+    # Entry point of a worker process: it needs its own event loop and connection.
+    async def run():
+        connection = await Asyncio_rmq.openConnection(url)
+        try:
+            return await work(connection, prefetch)
+        finally:
+            await connection.close()
+
+    return asyncio.run(run())
+
+
+async def reduce(connection, n_workers):
+    """
+    Merge the partial sums of all workers into the final average.
+
+    Parameters
+    ----------
+    connection:
+        RabbitMQ connection.
+
+    n_workers: int
+        Number of partial sums to wait for.
+
+    Return: [average, count]
+    average: np.ndarray of type float
+        Averaged signal. Empty when no frames were averaged.
+
+    count: int
+        Total number of frames averaged.
+    """
+    channel = await connection.channel()
+    _, partial_queue = await _declare(channel)
+
+    total = None
+    count = 0
+    received = 0
+    async with partial_queue.iterator() as queue_iter:
+        async for message in queue_iter:
+            partial = serializers.decode_message(message)
+            if partial.size:
+                total = partial.copy() if total is None else total + partial
+            count += message.headers[COUNT_HEADER]
+            await message.ack()
+            received += 1
+            if received == n_workers:
+                break
+    await channel.close()
+    if not count:
+        return np.zeros(0), 0
+    return total / count, count
+
+
+async def distributed_signal_averager(
+    n_frames,
+    n_workers=4,
+    url="memory:///averager",
+    batch_size=16,
+    prefetch=4,
+    max_queued=8,
+    processes=None,
+    replay=False,
+    **cw_kwargs
+):
+    """
+    Run producer, workers and reducer against one broker and return the averaged signal.
+
+    Parameters
+    ----------
+    n_frames: int
+        Total number of frames to average.
+
+    n_workers: int
+        Number of workers.
+
+    url: string
+        Broker URL. Defaults to the in-memory broker.
+
+    batch_size, prefetch, max_queued, replay:
+        See `produce` and `work`.
+
+    processes: bool
+        Run each worker in its own process. Defaults to True unless `url` is an in-memory broker, which only
+        exists inside the calling process.
+
+    cw_kwargs:
+        CW parameters forwarded to `produce`.
+
+    Return: [average, stats]
+    average: np.ndarray of type float
+        Averaged signal.
+
+    stats: dict
+        Frames averaged, frames per worker, elapsed time and frames per second.
+    """
+    in_memory = url.startswith("memory://")
+    if processes is None:
+        processes = not in_memory
+    if processes and in_memory:
+        raise ValueError("the in-memory broker cannot be shared with worker processes")
+
+    loop = asyncio.get_running_loop()
+    connection = await Asyncio_rmq.openConnection(url)
+    executor = None
+    start = time.perf_counter()
+
+    if processes:
+        # Spawned, not forked: the children must not inherit this process's event loop and connection.
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max(n_workers, 1), mp_context=multiprocessing.get_context("spawn")
+        )
+        workers = [loop.run_in_executor(executor, _work_process, url, prefetch) for _ in range(n_workers)]
+    else:
+        workers = [asyncio.ensure_future(work(connection, prefetch)) for _ in range(n_workers)]
+    reducer = asyncio.ensure_future(reduce(connection, n_workers))
+    try:
+        await produce(connection, n_frames, n_workers, batch_size, max_queued, replay=replay, **cw_kwargs)
+        per_worker = list(await asyncio.gather(*workers))
+        average, count = await reducer
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        await connection.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {"frames": count, "per_worker": per_worker, "elapsed_s": elapsed, "frames_per_s": count / elapsed}
+    return average, stats
+
+
+async def scaling_benchmark(n_frames, worker_counts=(1, 2, 4), url="memory:///averager", replay=True, **kwargs):
+    """
+    Measure how the averaging throughput changes with the number of workers.
+
+    Parameters
+    ----------
+    n_frames: int
+        Number of frames averaged at every worker count.
+
+    worker_counts: sequence of int
+        Worker counts to measure, in order.
+
+    url: string
+        Broker URL. Workers run in separate processes unless it is an in-memory broker.
+
+    replay: bool
+        Publish one generated batch repeatedly (see `produce`), so that frame generation in the single
+        producer does not cap the throughput of the workers.
+
+    kwargs:
+        Forwarded to `distributed_signal_averager`.
+
+    Return: list of dict
+        One entry per worker count with the number of workers, frames per second and the speedup over the
+        first worker count.
+    """
+    results = []
+    for n_workers in worker_counts:
+        _, stats = await distributed_signal_averager(n_frames, n_workers, url=url, replay=replay, **kwargs)
+        speedup = stats["frames_per_s"] / results[0]["frames_per_s"] if results else 1.0
+        results.append({"workers": n_workers, "frames_per_s": stats["frames_per_s"], "speedup": speedup})
+    return results
+
+
+async def main(args):
+    """
+    Distributed averager main body.
+
+    Parameters
+    ----------
+    args: dict
+        Parsed command line arguments.
+
+    Return: None
+    """
+    if args["role"] == "local":
+        average, stats = await distributed_signal_averager(
+            args["frames"], args["workers"], url=args["url"] or "memory:///averager"
+        )
+        print(stats)
+        return
+    if args["role"] == "scaling":
+        worker_counts = range(1, args["workers"] + 1)
+        for result in await scaling_benchmark(args["frames"], worker_counts, url=args["url"] or "memory:///averager"):
+            print("%(workers)d workers: %(frames_per_s).1f frames/s (x%(speedup).2f)" % result)
+        return
+
+    connection = await Asyncio_rmq.openConnection(args["url"] or Asyncio_rmq.asyncio_rmq.RMQ_URL)
+    if args["role"] == "producer":
+        print("Published %d frames" % await produce(connection, args["frames"], args["workers"]))
+    elif args["role"] == "worker":
+        print("Accumulated %d frames" % await work(connection))
+    elif args["role"] == "reducer":
+        average, count = await reduce(connection, args["workers"])
+        print("Averaged %d frames" % count)
+    await connection.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "-r",
+        "--role",
+        type=str,
+        default="local",
+        choices=["local", "producer", "worker", "reducer", "scaling"],
+        help="Role",
+    )
+    ap.add_argument("-u", "--url", type=str, default=None, help="Broker URL")
+    ap.add_argument("-f", "--frames", type=int, default=2048, help="# frames to average")
+    ap.add_argument("-w", "--workers", type=int, default=4, help="# workers")
+    asyncio.run(main(vars(ap.parse_args())))
@@ -0,0 +1,109 @@
+"""Unit test for the distributed signal averager."""
+import SigAverager.distributed
+import asyncio
+import numpy as np
+import pytest
+
+
+def test_distributed_signal_averaging():
+    """
+    Test distributed signal averaging over the in-memory broker.
+
+    Test Overview:
+    --------------
+    Frame batches are spread over several workers and their partial sums merged by the reducer.
+    The test will look for the following:
+    a) Is every frame averaged exactly once, and is the work shared between the workers?
+    b) Does the averaged CW tone (75MHz, EE3:75) appear in the expected FFT channel?
+
+    Parameters
+    ----------
+    n_frames: int
+        Number of frames to average. Deliberately not a multiple of the batch size.
+    n_workers: int
+        Number of workers.
+    """
+    n_frames = 100
+    n_workers = 3
+    num_samples = 8192
+    sampling_frequency = 1712e6
+    cw_freq = 75e6
+
+    average, stats = asyncio.run(
+        SigAverager.distributed.distributed_signal_averager(
+            n_frames,
+            n_workers,
+            url="memory:///test_distributed",
+            batch_size=8,
+            prefetch=2,
+            num_samples=num_samples,
+            cw_freq=cw_freq,
+            sampling_frequency=sampling_frequency,
+        )
+    )
+
+    assert stats["frames"] == n_frames
+    assert sum(stats["per_worker"]) == n_frames
+    assert all(count > 0 for count in stats["per_worker"])
+    assert average.shape == (num_samples,)
+
+    channel_resolution = sampling_frequency / num_samples
+    ave_sig_fft = np.abs(np.fft.rfft(average))
+    assert abs(np.argmax(ave_sig_fft) - cw_freq / channel_resolution) <= 1
+
+
+def test_distributed_signal_averaging_without_frames():
+    """
+    Test averaging zero frames.
+
+    Test Overview:
+    --------------
+    Every worker only receives its end-of-stream marker. The reducer must return an empty average and a
+    count of 0 instead of dividing by zero.
+    """
+    average, stats = asyncio.run(
+        SigAverager.distributed.distributed_signal_averager(0, 2, url="memory:///test_distributed_empty")
+    )
+
+    assert stats["frames"] == 0
+    assert stats["per_worker"] == [0, 0]
+    assert average.shape == (0,)
+
+
+def test_in_memory_broker_rejects_worker_processes():
+    """
+    Test worker processes are refused for the in-memory broker.
+
+    Test Overview:
+    --------------
+    The in-memory broker only exists inside the calling process, so spawned workers would never see the
+    frames. Asking for processes with a memory:// URL must raise ValueError before anything is published.
+    """
+    with pytest.raises(ValueError):
+        asyncio.run(
+            SigAverager.distributed.distributed_signal_averager(
+                16, 2, url="memory:///test_distributed_processes", processes=True
+            )
+        )
+
+
+def test_scaling_benchmark():
+    """
+    Test the worker scaling measurement.
+
+    Test Overview:
+    --------------
+    Every requested worker count is measured in order with a positive throughput, and the speedups are
+    relative to the first worker count.
+    """
+    results = asyncio.run(
+        SigAverager.distributed.scaling_benchmark(
+            64, (1, 2, 3), url="memory:///test_distributed_scaling", batch_size=8, num_samples=1024
+        )
+    )
+
+    assert [result["workers"] for result in results] == [1, 2, 3]
+    assert all(result["frames_per_s"] > 0 for result in results)
+    assert results[0]["speedup"] == 1.0
+    for result in results[1:]:
+        assert result["speedup"] == pytest.approx(result["frames_per_s"] / results[0]["frames_per_s"])